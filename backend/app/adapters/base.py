@@ -12,6 +12,15 @@ class BaseLLM(ABC):
         """Assign speakers to text segments."""
         pass
 
+    @abstractmethod
+    async def attribute_speakers(self, excerpt: str, characters: List[Dict]) -> Dict[str, str]:
+        """Name the speaker of each quote marked [#id] in the excerpt, keyed by id."""
+        pass
+
+    async def close(self):
+        """Release pooled connections; called once when the process shuts down."""
+        pass
+
 class BaseTTS(ABC):
     @abstractmethod
     async def list_voices(self) -> List[Dict[str, str]]:
@@ -22,3 +31,7 @@ class BaseTTS(ABC):
     async def generate_audio(self, text: str, voice_id: str, output_path: str) -> str:
         """Generate audio file from text."""
         pass
+
+    async def close(self):
+        """Stop worker processes and connections; called once when the process shuts down."""
+        pass
@@ -0,0 +1,58 @@
+from typing import List, Dict, Any
+from .base import BaseLLM
+from ..services.llm_cache import LLMResponseCache
+
+
+class CachedLLMAdapter(BaseLLM):
+    """Wraps any BaseLLM with the persistent LLMResponseCache.
+
+    Keys include the adapter, its model name and its PROMPT_VERSION, so
+    changing any of them (or the character list passed to assign_roles)
+    never returns a stale response. The adapters' error fallbacks are not
+    cached, since they only stand in for a failed call.
+    """
+
+    def __init__(self, inner: BaseLLM, cache: LLMResponseCache):
+        self.inner = inner
+        self.cache = cache
+        self.adapter_name = type(inner).__name__
+        self.model_name = str(getattr(inner, "model_name", ""))
+        self.prompt_version = str(getattr(inner, "PROMPT_VERSION", "1"))
+
+    async def _cached(self, method: str, text: str, context: Any, call, is_fallback):
+        key = LLMResponseCache.make_key(self.adapter_name, self.model_name, self.prompt_version, method, text, context)
+        cached = self.cache.get(key)
+        if cached is not None:
+            print(f"[LLM CACHE] Hit for {method} ({len(text)} chars)")
+            return cached
+
+        result = await call()
+        if not is_fallback(result):
+            self.cache.put(key, self.adapter_name, self.model_name, self.prompt_version, method, result)
+        return result
+
+    async def analyze_text(self, text: str) -> Dict[str, Any]:
+        return await self._cached(
+            "analyze_text", text, None,
+            lambda: self.inner.analyze_text(text),
+            lambda result: not result or not result.get("characters"),
+        )
+
+    async def assign_roles(self, text: str, characters: List[Dict]) -> List[Dict]:
+        context = sorted((c.get("name"), c.get("gender")) for c in characters)
+        return await self._cached(
+            "assign_roles", text, context,
+            lambda: self.inner.assign_roles(text, characters),
+            lambda result: not result or (len(result) == 1 and result[0].get("text") == text),
+        )
+
+    async def attribute_speakers(self, excerpt: str, characters: List[Dict]) -> Dict[str, str]:
+        context = sorted((c.get("name"), c.get("gender")) for c in characters)
+        return await self._cached(
+            "attribute_speakers", excerpt, context,
+            lambda: self.inner.attribute_speakers(excerpt, characters),
+            lambda result: not result,
+        )
+
+    async def close(self):
+        await self.inner.close()
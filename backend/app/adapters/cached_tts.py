@@ -0,0 +1,34 @@
+from typing import List, Dict
+from .base import BaseTTS
+from ..services.audio_cache import AudioCache
+
+
+class CachedTTSAdapter(BaseTTS):
+    """Wraps any BaseTTS with the content-addressed AudioCache.
+
+    The cache key uses the wrapped engine's class name (looking through other
+    wrappers), so switching between EdgeTTS and XTTS never serves audio
+    produced by the other engine.
+    """
+
+    def __init__(self, inner: BaseTTS, cache: AudioCache):
+        self.inner = inner
+        self.cache = cache
+        self.adapter_name = getattr(inner, "adapter_name", type(inner).__name__)
+
+    async def close(self):
+        await self.inner.close()
+
+    async def list_voices(self) -> List[Dict[str, str]]:
+        return await self.inner.list_voices()
+
+    async def generate_audio(self, text: str, voice_id: str, output_path: str) -> str:
+        key = AudioCache.make_key(self.adapter_name, voice_id, text)
+
+        async def produce(tmp_path: str):
+            await self.inner.generate_audio(text, voice_id, tmp_path)
+
+        hit = await self.cache.fetch(key, output_path, produce)
+        if hit:
+            print(f"[TTS CACHE] Hit for {output_path} ({voice_id})")
+        return output_path
@@ -0,0 +1,52 @@
+from typing import Tuple
+from .base import BaseTTS, BaseLLM
+from .tts_adapters import EdgeTTSAdapter, XTTSAdapter
+from .llm_adapters import GeminiLLMAdapter, OllamaLLMAdapter
+from .cached_tts import CachedTTSAdapter
+from .resilient_tts import ResilientTTSAdapter
+from .cached_llm import CachedLLMAdapter
+from ..core.config import settings
+from ..services.audio_cache import AudioCache
+from ..services.llm_cache import LLMResponseCache
+
+def create_services() -> Tuple[BaseTTS, BaseLLM]:
+    """Build the TTS and LLM adapters for the configured APP_MODE.
+
+    Shared by the API process and standalone workers so both run the same stack.
+    """
+    print(f"Initializing in {settings.APP_MODE} mode...")
+    
+    if settings.APP_MODE == "CLOUD":
+        tts_service = EdgeTTSAdapter()
+        if settings.GEMINI_API_KEY:
+            llm_service = GeminiLLMAdapter(api_key=settings.GEMINI_API_KEY)
+        else:
+            print("WARNING: GEMINI_API_KEY not set. LLM features will fail.")
+            llm_service = GeminiLLMAdapter(api_key="dummy_key")
+            
+    elif settings.APP_MODE == "LOCAL":
+        tts_service = XTTSAdapter()
+        llm_service = OllamaLLMAdapter()
+    else:
+        raise ValueError(f"Unknown APP_MODE: {settings.APP_MODE}")
+
+    # Retries sit under the cache so cache hits never wait on a tripped circuit
+    tts_service = ResilientTTSAdapter(tts_service)
+
+    if settings.TTS_CACHE_ENABLED:
+        audio_cache = AudioCache(
+            settings.TTS_CACHE_DIR,
+            settings.TTS_CACHE_MAX_MB * 1024 * 1024,
+            materialize=settings.TTS_CACHE_MATERIALIZE
+        )
+        tts_service = CachedTTSAdapter(tts_service, audio_cache)
+
+    if settings.LLM_CACHE_ENABLED:
+        llm_cache = LLMResponseCache(
+            settings.LLM_CACHE_PATH,
+            ttl_seconds=settings.LLM_CACHE_TTL_DAYS * 86400,
+            max_entries=settings.LLM_CACHE_MAX_ENTRIES
+        )
+        llm_service = CachedLLMAdapter(llm_service, llm_cache)
+
+    return tts_service, llm_service
@@ -0,0 +1,87 @@
+import json
+from typing import Any, List, Optional
+
+
+class JsonArrayStream:
+    """Incrementally parses the first JSON array in a streamed LLM response.
+
+    Feed text fragments as they arrive; ``feed`` returns the array elements
+    that became complete with that fragment. The array may be the whole
+    response or nested in an object (``{"segments": [...]}``); text before it,
+    such as a markdown fence, is skipped. ``finish`` returns the fully parsed
+    response for callers that need to fall back when no array was streamed.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._array_depth: Optional[int] = None  # nesting depth of the streamed array
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._element_start: Optional[int] = None
+        self.done = False
+        self.count = 0
+
+    def feed(self, fragment: str) -> List[Any]:
+        self.text += fragment
+        items = []
+        text = self.text
+        while self._pos < len(text) and not self.done:
+            ch = text[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+                if self._element_start is None and self._array_depth is not None and self._depth == self._array_depth:
+                    self._element_start = self._pos
+            elif ch in "{[":
+                self._depth += 1
+                if self._array_depth is None and ch == "[":
+                    self._array_depth = self._depth
+                elif self._array_depth is not None and self._depth == self._array_depth + 1 and self._element_start is None:
+                    self._element_start = self._pos
+            elif ch in "}]":
+                if self._array_depth is not None and self._depth == self._array_depth and ch == "]":
+                    self._emit_scalar(items)
+                    self.done = True
+                self._depth -= 1
+                if self._array_depth is not None and self._depth == self._array_depth and self._element_start is not None:
+                    self._emit(items, self._pos + 1)
+            elif ch == "," and self._array_depth is not None and self._depth == self._array_depth:
+                self._emit_scalar(items)
+            elif (not ch.isspace() and self._element_start is None
+                  and self._array_depth is not None and self._depth == self._array_depth):
+                # Start of a number/true/false/null element
+                self._element_start = self._pos
+            self._pos += 1
+        return items
+
+    def _emit(self, items: List[Any], end: int):
+        raw = self.text[self._element_start:end]
+        self._element_start = None
+        try:
+            items.append(json.loads(raw))
+            self.count += 1
+        except json.JSONDecodeError:
+            print(f"[WARN] Skipping malformed streamed JSON element: {raw[:200]}")
+
+    def _emit_scalar(self, items: List[Any]):
+        if self._element_start is not None:
+            self._emit(items, self._pos)
+
+    def finish(self) -> Any:
+        """Parse the complete response text (markdown fences removed)."""
+        content = self.text.strip()
+        if content.startswith("```json"):
+            content = content[7:]
+        if content.startswith("```"):
+            content = content[3:]
+        if content.endswith("```"):
+            content = content[:-3]
+        return json.loads(content.strip())
@@ -1,12 +1,66 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator, Optional
 from .base import BaseLLM
+from .json_stream import JsonArrayStream
+from ..core.config import settings
+from ..services.llm_scheduler import LLMRateLimitError, get_llm_scheduler, estimate_tokens
 import google.generativeai as genai
 import os
 
+def _attribution_prompt(excerpt: str, characters: List[Dict]) -> str:
+    char_list_str = ", ".join([f"{c['name']} ({c['gender']})" for c in characters])
+    return f"""You are adapting a novel for audiobook narration.
+In the excerpt below, some lines of dialogue are preceded by a marker like [#12].
+Decide which character speaks each marked line.
+
+Available speakers: {char_list_str}, Narrator.
+
+Rules:
+1. Use the dialogue tags and the surrounding action to identify the speaker.
+2. In a back-and-forth exchange without tags, speakers usually alternate.
+3. Use "Narrator" only if the line is not spoken by any listed character.
+4. Return ONLY a JSON object mapping each marker number to a speaker name, e.g. {{"12": "Harry", "13": "Narrator"}}
+
+Excerpt:
+{excerpt}"""
+
+
+def _parse_attribution(parsed) -> Dict[str, str]:
+    # Accept {"id": "Name"} or a list of {"id": ..., "speaker": ...}
+    if isinstance(parsed, list):
+        parsed = {str(item.get("id")): item.get("speaker") for item in parsed if isinstance(item, dict)}
+    if not isinstance(parsed, dict):
+        return {}
+    return {str(k): v for k, v in parsed.items() if isinstance(v, str) and v}
+
 class GeminiLLMAdapter(BaseLLM):
-    def __init__(self, api_key: str):
+    # Bump when a prompt changes so cached responses are not reused
+    PROMPT_VERSION = "1"
+
+    def __init__(self, api_key: str, model_name: str = "gemini-1.5-flash"):
         genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+        self.scheduler = get_llm_scheduler("gemini")
+
+    @staticmethod
+    def _usage_tokens(response) -> Optional[int]:
+        usage = getattr(response, "usage_metadata", None)
+        return getattr(usage, "total_token_count", None) or None
+
+    async def _generate(self, prompt: str, expected_output_tokens: int) -> str:
+        """Call Gemini within the shared rate budget and return the response without code fences."""
+        response = await self.scheduler.run(
+            lambda: self.model.generate_content_async(prompt),
+            prompt,
+            expected_output_tokens,
+            usage=self._usage_tokens,
+        )
+        content = response.text.strip()
+        if content.startswith("```json"):
+            content = content[7:-3].strip()
+        elif content.startswith("```"):
+            content = content[3:-3].strip()
+        return content
 
     async def analyze_text(self, text: str) -> Dict[str, Any]:
         prompt = """
@@ -35,22 +89,13 @@ class GeminiLLMAdapter(BaseLLM):
         
         Text to analyze:
         """
-        # Truncate text to avoid token limits if necessary, though Gemini 1.5 Flash has a large context.
-        # We'll take the first 15000 characters which is usually enough for a chapter.
-        safe_text = text[:15000]
-        
+        # The orchestrator sends book windows sized by ANALYSIS_WINDOW_CHARS, never a whole book
         try:
-            response = await self.model.generate_content_async(f"{prompt}\n{safe_text}")
-            
-            # Clean up response to ensure it's valid JSON
-            content = response.text.strip()
-            if content.startswith("```json"):
-                content = content[7:-3].strip()
-            elif content.startswith("```"):
-                content = content[3:-3].strip()
-                
+            content = await self._generate(f"{prompt}\n{text}", expected_output_tokens=1000)
             import json
             return json.loads(content)
+        except LLMRateLimitError:
+            raise
         except Exception as e:
             print(f"Error calling Gemini: {e}")
             return {"characters": []}
@@ -85,48 +130,88 @@ Return a JSON array:
 Text to process:
 """
         
-        # We process in chunks to avoid hitting output token limits, but for V1 let's try a reasonable chunk.
-        # Ideally we should loop, but let's assume the chapter text passed here is manageable or we handle it upstream.
-        # For this demo, we'll take the first 10000 chars if it's huge, but ideally the orchestrator handles chunking.
-        safe_text = text[:10000] 
-        
+        # The orchestrator sends chapter windows sized by ROLE_WINDOW_CHARS, never a whole long chapter
         try:
-            response = await self.model.generate_content_async(f"{prompt}\n{safe_text}")
-            
-            content = response.text.strip()
-            if content.startswith("```json"):
-                content = content[7:-3].strip()
-            elif content.startswith("```"):
-                content = content[3:-3].strip()
-                
+            # The model echoes the text back as segments
+            content = await self._generate(f"{prompt}\n{text}", expected_output_tokens=estimate_tokens(text) * 3 // 2)
             import json
             return json.loads(content)
+        except LLMRateLimitError:
+            raise
         except Exception as e:
             print(f"Error calling Gemini for roles: {e}")
             # Fallback: Return entire text as Narrator
             return [{"text": text, "speaker": "Narrator"}]
 
+    async def attribute_speakers(self, excerpt: str, characters: List[Dict]) -> Dict[str, str]:
+        prompt = _attribution_prompt(excerpt, characters)
+        try:
+            content = await self._generate(prompt, expected_output_tokens=200)
+            import json
+            return _parse_attribution(json.loads(content))
+        except LLMRateLimitError:
+            raise
+        except Exception as e:
+            print(f"Error calling Gemini for speaker attribution: {e}")
+            return {}
+
 class OllamaLLMAdapter(BaseLLM):
-    def __init__(self, model_name: str = "qwen3:8b", base_url: str = "http://localhost:11434"):
-        self.model_name = model_name
-        self.base_url = base_url
-    
-    async def _call_ollama(self, prompt: str) -> str:
+    # Bump when a prompt changes so cached responses are not reused
+    PROMPT_VERSION = "1"
+
+    def __init__(self, model_name: Optional[str] = None, base_url: Optional[str] = None):
+        self.model_name = model_name or settings.OLLAMA_MODEL
+        self.base_url = (base_url or settings.OLLAMA_BASE_URL).rstrip("/")
+        self._session = None
+
+    def _get_session(self):
+        # One pooled session per adapter: connections to Ollama are reused across calls
         import aiohttp
+
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=settings.OLLAMA_MAX_CONNECTIONS),
+                # No total limit on streamed completions, only on silence between chunks
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=settings.OLLAMA_READ_TIMEOUT),
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _stream_ollama(self, prompt: str) -> AsyncIterator[str]:
+        """Yield response text fragments as Ollama generates them."""
         import json
-        
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.base_url}/api/generate",
-                json={
-                    "model": self.model_name,
-                    "prompt": prompt,
-                    "stream": False,
-                    "format": "json"
-                }
-            ) as response:
-                result = await response.json()
-                return result.get("response", "{}")
+
+        async with self._get_session().post(
+            f"{self.base_url}/api/generate",
+            json={
+                "model": self.model_name,
+                "prompt": prompt,
+                "stream": True,
+                "format": "json"
+            }
+        ) as response:
+            response.raise_for_status()
+            # One JSON object per line: {"response": "...", "done": false}
+            async for line in response.content:
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(f"Ollama error: {chunk['error']}")
+                if chunk.get("response"):
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    break
+
+    async def _call_ollama(self, prompt: str) -> str:
+        fragments = []
+        async for fragment in self._stream_ollama(prompt):
+            fragments.append(fragment)
+        return "".join(fragments) or "{}"
     
     async def analyze_text(self, text: str) -> Dict[str, Any]:
         prompt = f"""You are an expert literary analyst. 
@@ -153,7 +238,7 @@ Return the result strictly as a JSON object with this structure:
 }}
 
 Text to analyze:
-{text[:15000]}"""
+{text}"""
         
         try:
             response_text = await self._call_ollama(prompt)
@@ -163,10 +248,10 @@ Text to analyze:
             print(f"Error calling Ollama: {e}")
             return {"characters": []}
 
-    async def assign_roles(self, text: str, characters: List[Dict]) -> List[Dict]:
+    def _roles_prompt(self, text: str, characters: List[Dict]) -> str:
         char_list_str = ", ".join([f"{c['name']} ({c['gender']})" for c in characters])
         
-        prompt = f"""You are a scriptwriter adapting a novel for audio.
+        return f"""You are a scriptwriter adapting a novel for audio.
 Your task is to split the following text into granular segments (dialogue vs narration) and assign a speaker to each.
 
 Available Characters: {char_list_str}, Narrator.
@@ -186,49 +271,50 @@ Example Output:
 ]
 
 Text to process:
-{text[:10000]}"""
-        
+{text}"""
+
+    async def assign_roles(self, text: str, characters: List[Dict]) -> List[Dict]:
+        # Streaming only makes parsing incremental and tolerant of malformed elements.
+        # Synthesis does not start any earlier: the orchestrator needs every window of a
+        # chapter to stitch them, and persists the chapter's segments together.
         try:
-            response_text = await self._call_ollama(prompt)
-            print(f"[DEBUG] Ollama raw response: {response_text[:500]}")
-            
-            # Clean up response
-            response_text = response_text.strip()
-            
-            # Remove markdown code blocks if present
-            if response_text.startswith("```json"):
-                response_text = response_text[7:]
-            if response_text.startswith("```"):
-                response_text = response_text[3:]
-            if response_text.endswith("```"):
-                response_text = response_text[:-3]
-            
-            response_text = response_text.strip()
-            
-            import json
-            parsed = json.loads(response_text)
-            
-            # Handle case where Ollama returns a single object instead of an array
-            if isinstance(parsed, dict):
-                print(f"[DEBUG] Ollama returned single object, converting to array")
-                parsed = [parsed]
-            
-            # Validate structure
-            if isinstance(parsed, list):
-                # Check if items are dicts with required keys
-                valid_segments = []
-                for item in parsed:
-                    if isinstance(item, dict) and "text" in item and "speaker" in item:
-                        valid_segments.append(item)
-                    else:
-                        print(f"[WARN] Skipping invalid segment: {item}")
-                
-                if valid_segments:
-                    return valid_segments
-            
+            segments = [segment async for segment in self.stream_roles(text, characters)]
+            if segments:
+                return segments
             print(f"[WARN] Ollama returned invalid format, using fallback")
             return [{"text": text, "speaker": "Narrator"}]
-            
         except Exception as e:
             print(f"Error calling Ollama for roles: {e}")
             return [{"text": text, "speaker": "Narrator"}]
+
+    async def stream_roles(self, text: str, characters: List[Dict]) -> AsyncIterator[Dict]:
+        """Yield each {"text", "speaker"} segment as soon as the model has finished writing it.
+
+        Malformed elements are skipped one by one instead of failing the whole response.
+        Only ``assign_roles`` consumes it, collecting the whole window.
+        """
+        parser = JsonArrayStream()
+        async for fragment in self._stream_ollama(self._roles_prompt(text, characters)):
+            for item in parser.feed(fragment):
+                if isinstance(item, dict) and "text" in item and "speaker" in item:
+                    yield item
+                else:
+                    print(f"[WARN] Skipping invalid segment: {item}")
+
+        if parser.count == 0:
+            print(f"[DEBUG] Ollama raw response: {parser.text[:500]}")
+            # Handle case where Ollama returns a single object instead of an array
+            parsed = parser.finish()
+            if isinstance(parsed, dict) and "text" in parsed and "speaker" in parsed:
+                print(f"[DEBUG] Ollama returned single object, converting to array")
+                yield parsed
+
+    async def attribute_speakers(self, excerpt: str, characters: List[Dict]) -> Dict[str, str]:
+        prompt = _attribution_prompt(excerpt, characters)
+        try:
+            response_text = await self._call_ollama(prompt)
+            import json
+            return _parse_attribution(json.loads(response_text))
+        except Exception as e:
+            print(f"Error calling Ollama for speaker attribution: {e}")
+            return {}
@@ -0,0 +1,159 @@
+import asyncio
+import os
+import random
+import time
+from typing import List, Dict, Optional
+
+import aiohttp
+
+from .base import BaseTTS
+from ..core.config import settings
+
+try:
+    from edge_tts.exceptions import NoAudioReceived, UnexpectedResponse, UnknownResponse, WebSocketError
+    _EDGE_TRANSIENT = (NoAudioReceived, UnexpectedResponse, UnknownResponse, WebSocketError)
+except ImportError:
+    _EDGE_TRANSIENT = ()
+
+# HTTP statuses worth retrying: timeouts, throttling and server-side failures
+_RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error: BaseException) -> bool:
+    """True for failures caused by the network or the provider rather than the request."""
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status in _RETRYABLE_STATUS
+    return isinstance(error, (asyncio.TimeoutError, ConnectionError, aiohttp.ClientError) + _EDGE_TRANSIENT)
+
+
+class CircuitBreaker:
+    """Stops sending requests to a provider that keeps failing.
+
+    After ``failure_threshold`` consecutive transient failures the circuit
+    opens and every caller waits in ``acquire()`` for ``reset_timeout``
+    seconds. Then a single probe request goes through: success closes the
+    circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if self._probing else "open"
+
+    async def acquire(self):
+        while self.opened_at is not None:
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+            elif not self._probing:
+                self._probing = True
+                return
+            else:
+                # Another caller is probing; wait for its outcome
+                await asyncio.sleep(min(0.5, self.reset_timeout))
+
+    def record_success(self):
+        if self.opened_at is not None:
+            print("[TTS] Circuit closed, provider is responding again")
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._probing or (self.opened_at is None and self.failures >= self.failure_threshold):
+            print(f"[WARN] TTS circuit open after {self.failures} failures, pausing requests for {self.reset_timeout}s")
+            self.opened_at = time.monotonic()
+            self._probing = False
+
+    def release_probe(self):
+        """Give up a probe slot without an outcome (non-transient error or cancellation)."""
+        self._probing = False
+
+
+class ResilientTTSAdapter(BaseTTS):
+    """Wraps any BaseTTS with timeouts, retries and a circuit breaker.
+
+    Transient failures are retried with full-jitter exponential backoff.
+    Other errors (bad voice, empty text...) are raised at once. Every wait is
+    an asyncio sleep, so a struggling provider never blocks the event loop.
+
+    An engine may set ``request_timeout`` to replace TTS_REQUEST_TIMEOUT, and
+    ``remote = False`` when it runs on this host: a local engine has no
+    provider to protect, so it gets no circuit breaker and a slow model load
+    cannot pause every request.
+    """
+
+    def __init__(
+        self,
+        inner: BaseTTS,
+        max_attempts: Optional[int] = None,
+        base_delay: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        timeout: Optional[float] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.inner = inner
+        # Cache keys and limiter slots are per engine, not per wrapper
+        self.adapter_name = getattr(inner, "adapter_name", type(inner).__name__)
+        self.max_attempts = max(1, max_attempts or settings.TTS_RETRY_ATTEMPTS)
+        self.base_delay = base_delay if base_delay is not None else settings.TTS_RETRY_BASE_DELAY
+        self.max_delay = max_delay if max_delay is not None else settings.TTS_RETRY_MAX_DELAY
+        self.timeout = timeout or getattr(inner, "request_timeout", None) or settings.TTS_REQUEST_TIMEOUT
+        if breaker is None and getattr(inner, "remote", True):
+            breaker = CircuitBreaker(
+                settings.TTS_CIRCUIT_FAILURE_THRESHOLD,
+                settings.TTS_CIRCUIT_RESET_SECONDS,
+            )
+        self.breaker: Optional[CircuitBreaker] = breaker
+
+    async def close(self):
+        await self.inner.close()
+
+    async def list_voices(self) -> List[Dict[str, str]]:
+        return await asyncio.wait_for(self.inner.list_voices(), timeout=self.timeout)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    async def generate_audio(self, text: str, voice_id: str, output_path: str) -> str:
+        breaker = self.breaker
+        for attempt in range(1, self.max_attempts + 1):
+            if breaker:
+                await breaker.acquire()
+            try:
+                result = await asyncio.wait_for(
+                    self.inner.generate_audio(text, voice_id, output_path),
+                    timeout=self.timeout,
+                )
+            except Exception as e:
+                retryable = is_retryable(e)
+                if breaker and retryable:
+                    breaker.record_failure()
+                elif breaker:
+                    breaker.release_probe()
+                if not retryable or attempt == self.max_attempts:
+                    # A partial file would look like a finished segment
+                    if os.path.exists(output_path):
+                        os.remove(output_path)
+                    raise
+
+                delay = self._backoff(attempt)
+                print(f"[WARN] TTS attempt {attempt}/{self.max_attempts} failed ({type(e).__name__}: {e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                if breaker:
+                    breaker.release_probe()
+                raise
+            else:
+                if breaker:
+                    breaker.record_success()
+                return result
@@ -1,11 +1,15 @@
 import edge_tts
 import asyncio
-import subprocess
-import sys
-import tempfile
+import importlib.util
+import multiprocessing
 import os
-from typing import List, Dict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Optional
 from .base import BaseTTS
+from . import xtts_engine
+from ..core.config import settings
+from ..services.voice_registry import VoiceRegistry
 
 class EdgeTTSAdapter(BaseTTS):
     async def list_voices(self) -> List[Dict[str, str]]:
@@ -27,80 +31,148 @@ class EdgeTTSAdapter(BaseTTS):
         print(f"[TTS DEBUG]   Text preview: {text[:100]}...")
         print(f"[TTS DEBUG]   Output: {output_path}")
         
-        # Use the edge_tts Python library directly (more reliable than subprocess)
-        try:
-            communicate = edge_tts.Communicate(text, voice_id)
-            await communicate.save(output_path)
-            print(f"[TTS DEBUG] Audio saved to {output_path}")
-            return output_path
-        except Exception as e:
-            print(f"[TTS ERROR] edge_tts library failed: {e}, trying subprocess fallback")
-        
-        # Fallback to subprocess with temp file for long texts
-        try:
-            # For long texts, write to a temp file to avoid command-line length limits
-            if len(text) > 1000:
-                with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False, encoding='utf-8') as f:
-                    f.write(text)
-                    temp_file = f.name
-                
-                try:
-                    result = subprocess.run(
-                        [
-                            sys.executable, "-m", "edge_tts",
-                            "--file", temp_file,
-                            "--voice", voice_id,
-                            "--write-media", output_path
-                        ],
-                        capture_output=True,
-                        text=True,
-                        timeout=120
-                    )
-                finally:
-                    # Clean up temp file
-                    try:
-                        os.unlink(temp_file)
-                    except:
-                        pass
-            else:
-                result = subprocess.run(
-                    [
-                        sys.executable, "-m", "edge_tts",
-                        "--text", text,
-                        "--voice", voice_id,
-                        "--write-media", output_path
-                    ],
-                    capture_output=True,
-                    text=True,
-                    timeout=60
-                )
-            
-            if result.returncode != 0:
-                print(f"[TTS ERROR] edge-tts failed: {result.stderr}")
-                raise Exception(f"edge-tts failed: {result.stderr}")
-            
-            print(f"[TTS DEBUG] Audio saved to {output_path}")
-            return output_path
-            
-        except subprocess.TimeoutExpired:
-            print(f"[TTS ERROR] edge-tts timed out")
-            raise Exception("TTS generation timed out")
-        except Exception as e:
-            print(f"[TTS ERROR] {e}")
-            raise
+        # Failures propagate: retries and timeouts are handled by ResilientTTSAdapter
+        communicate = edge_tts.Communicate(text, voice_id)
+        await communicate.save(output_path)
+        print(f"[TTS DEBUG] Audio saved to {output_path}")
+        return output_path
 
 class XTTSAdapter(BaseTTS):
+    """Local Coqui XTTS on CPU, run in a pool of worker processes.
+
+    Each pool process loads the model once (see ``xtts_engine``). Requests
+    for the same voice that arrive within XTTS_BATCH_WINDOW seconds are sent
+    to a worker as one batch, so speaker conditioning and the round trip to
+    the process are paid once per batch instead of once per segment.
+
+    ``voice_id`` is looked up as ``XTTS_SPEAKER_DIR/<voice_id>.wav`` (voice
+    cloning), then as a built-in XTTS speaker; other ids (e.g. EdgeTTS names
+    assigned in CLOUD mode) fall back to a default speaker of the same gender.
+    """
+
+    # Runs on this host: no circuit breaker, and a timeout long enough for the first model load
+    remote = False
+
     def __init__(self):
-        # Check if required libraries are available, or raise error if strictly needed at init time.
-        # For now, we just act as a stub that would fail if methods are called without proper setup.
-        try:
-            import torch
-            # import TTS... 
-        except ImportError:
-            pass # Allow init, but methods might fail if used in wrong env
+        self.request_timeout = settings.XTTS_REQUEST_TIMEOUT
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = asyncio.Lock()
+        self._speakers: set = set()
+        # voice key -> pending [(text, output_path, future)]
+        self._pending: Dict[tuple, list] = {}
+        self._flushers: Dict[tuple, asyncio.Task] = {}
+        self._voice_registry = VoiceRegistry()
+
+    async def _ensure_pool(self) -> ProcessPoolExecutor:
+        async with self._pool_lock:
+            if self._pool is None:
+                if importlib.util.find_spec("TTS") is None:
+                    raise RuntimeError("XTTS requires Coqui TTS: pip install -r requirements.local.txt")
+                self._pool = ProcessPoolExecutor(
+                    max_workers=max(1, settings.XTTS_WORKERS),
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=xtts_engine.init_worker,
+                    initargs=(settings.XTTS_MODEL, settings.XTTS_THREADS_PER_WORKER),
+                )
+                loop = asyncio.get_running_loop()
+                self._speakers = set(await loop.run_in_executor(self._pool, xtts_engine.list_speakers))
+        return self._pool
+
+    def _resolve_voice(self, voice_id: str) -> tuple:
+        """(language, speaker, speaker_wav) for a voice id."""
+        prefix = voice_id.split("-", 1)[0].lower()
+        language = prefix if "-" in voice_id and len(prefix) == 2 else settings.XTTS_LANGUAGE
+
+        speaker_wav = os.path.join(settings.XTTS_SPEAKER_DIR, f"{voice_id}.wav")
+        if os.path.exists(speaker_wav):
+            return language, None, speaker_wav
+        if voice_id in self._speakers:
+            return language, voice_id, None
+
+        info = self._voice_registry.get_voice_info(voice_id)
+        if info and info.gender == "male":
+            return language, settings.XTTS_MALE_SPEAKER, None
+        return language, settings.XTTS_FEMALE_SPEAKER, None
 
     async def list_voices(self) -> List[Dict[str, str]]:
-        raise NotImplementedError("XTTS is not yet implemented or dependencies are missing.")
+        await self._ensure_pool()
+        voices = [
+            {"ShortName": name, "Gender": "Unknown", "Locale": settings.XTTS_LANGUAGE, "FriendlyName": name}
+            for name in sorted(self._speakers)
+        ]
+        if os.path.isdir(settings.XTTS_SPEAKER_DIR):
+            for filename in sorted(os.listdir(settings.XTTS_SPEAKER_DIR)):
+                name, ext = os.path.splitext(filename)
+                if ext.lower() == ".wav":
+                    voices.append({"ShortName": name, "Gender": "Unknown", "Locale": settings.XTTS_LANGUAGE,
+                                   "FriendlyName": f"{name} (cloned)"})
+        return voices
 
     async def generate_audio(self, text: str, voice_id: str, output_path: str) -> str:
-        raise NotImplementedError("XTTS is not yet implemented or dependencies are missing.")
+        await self._ensure_pool()
+        voice = self._resolve_voice(voice_id)
+        future = asyncio.get_running_loop().create_future()
+        batch = self._pending.setdefault(voice, [])
+        batch.append((text, output_path, future))
+
+        if len(batch) >= settings.XTTS_MAX_BATCH:
+            self._submit(voice)
+        elif voice not in self._flushers:
+            self._flushers[voice] = asyncio.create_task(self._flush_later(voice))
+
+        error = await future
+        if error:
+            raise RuntimeError(f"XTTS synthesis failed: {error}")
+        return output_path
+
+    async def _flush_later(self, voice: tuple):
+        await asyncio.sleep(settings.XTTS_BATCH_WINDOW)
+        self._flushers.pop(voice, None)
+        self._submit(voice)
+
+    def _submit(self, voice: tuple):
+        batch = self._pending.pop(voice, [])
+        flusher = self._flushers.pop(voice, None)
+        if flusher and flusher is not asyncio.current_task():
+            flusher.cancel()
+        # Requests cancelled while waiting (e.g. timed out) are dropped
+        batch = [item for item in batch if not item[2].done()]
+        if batch:
+            asyncio.create_task(self._run_batch(voice, batch))
+
+    async def _run_batch(self, voice: tuple, batch: list):
+        language, speaker, speaker_wav = voice
+        items = [(text, output_path) for text, output_path, _ in batch]
+        loop = asyncio.get_running_loop()
+        pool = None
+        try:
+            # Never self._pool directly: after a crash it is None, and run_in_executor(None, ...)
+            # would load the model in this process
+            pool = await self._ensure_pool()
+            errors = await loop.run_in_executor(
+                pool, xtts_engine.synthesize_batch,
+                items, language, speaker, speaker_wav, settings.XTTS_MP3_BITRATE,
+            )
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                await self._discard_pool(pool)
+            errors = [f"{type(e).__name__}: {e}"] * len(batch)
+        for (_, _, future), error in zip(batch, errors):
+            if not future.done():
+                future.set_result(error)
+
+    async def _discard_pool(self, pool: Optional[ProcessPoolExecutor]):
+        """Shut down a pool whose worker died (e.g. out of memory); the next request starts a fresh one."""
+        async with self._pool_lock:
+            # Other batches sent to the same pool fail too; only the first replaces it
+            if pool is not None and self._pool is pool:
+                self._pool = None
+                pool.shutdown(wait=False, cancel_futures=True)
+
+    async def close(self):
+        for flusher in list(self._flushers.values()):
+            flusher.cancel()
+        async with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
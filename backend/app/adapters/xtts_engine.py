@@ -0,0 +1,85 @@
+"""XTTS inference inside pool worker processes.
+
+Everything here runs in the processes of XTTSAdapter's ProcessPoolExecutor:
+the model is loaded once by ``init_worker`` and kept resident for every
+batch the process handles afterwards.
+"""
+
+import os
+from typing import Dict, List, Optional, Tuple
+
+SAMPLE_RATE = 24000
+
+_model = None
+_latents_cache: Dict[str, tuple] = {}
+
+
+def init_worker(model_name: str, threads: int):
+    """Pool initializer: load the model on CPU once for this process."""
+    global _model
+    import torch
+    from TTS.api import TTS
+
+    torch.set_num_threads(max(1, threads))
+    print(f"[XTTS] Loading {model_name} in worker {os.getpid()} ({threads} threads)")
+    _model = TTS(model_name).to("cpu").synthesizer.tts_model
+
+
+def list_speakers() -> List[str]:
+    return sorted(_model.speaker_manager.speakers.keys())
+
+
+def _conditioning(speaker: Optional[str], speaker_wav: Optional[str]) -> tuple:
+    """Speaker latents, computed once per voice and process."""
+    key = speaker_wav or speaker
+    if key not in _latents_cache:
+        if speaker_wav:
+            gpt_cond_latent, speaker_embedding = _model.get_conditioning_latents(audio_path=[speaker_wav])
+        else:
+            latents = _model.speaker_manager.speakers[speaker]
+            gpt_cond_latent, speaker_embedding = latents["gpt_cond_latent"], latents["speaker_embedding"]
+        _latents_cache[key] = (gpt_cond_latent, speaker_embedding)
+    return _latents_cache[key]
+
+
+def _encode_mp3(samples, bitrate: int) -> bytes:
+    import lameenc
+    import numpy as np
+
+    pcm = (np.clip(np.asarray(samples, dtype=np.float32), -1.0, 1.0) * 32767).astype("<i2").tobytes()
+    encoder = lameenc.Encoder()
+    encoder.set_bit_rate(bitrate)
+    encoder.set_in_sample_rate(SAMPLE_RATE)
+    encoder.set_channels(1)
+    encoder.set_quality(2)
+    return encoder.encode(pcm) + encoder.flush()
+
+
+def synthesize_batch(
+    items: List[Tuple[str, str]],
+    language: str,
+    speaker: Optional[str],
+    speaker_wav: Optional[str],
+    bitrate: int,
+) -> List[Optional[str]]:
+    """Synthesize (text, output_path) pairs that share one voice.
+
+    The speaker conditioning is shared by the whole batch. Returns, for each
+    item, None on success or the error message.
+    """
+    import torch
+
+    gpt_cond_latent, speaker_embedding = _conditioning(speaker, speaker_wav)
+    errors: List[Optional[str]] = []
+    with torch.inference_mode():
+        for text, output_path in items:
+            try:
+                result = _model.inference(text, language, gpt_cond_latent, speaker_embedding)
+                tmp_path = f"{output_path}.part"
+                with open(tmp_path, "wb") as f:
+                    f.write(_encode_mp3(result["wav"], bitrate))
+                os.replace(tmp_path, output_path)
+                errors.append(None)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+    return errors
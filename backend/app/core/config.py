@@ -9,7 +9,131 @@ class Settings(BaseSettings):
     
     # API Keys
     GEMINI_API_KEY: Optional[str] = None
-    
+
+    # CLOUD mode LLM (Gemini) rate budgets, shared through the database by the API and every worker
+    # process: calls wait for request and token budget; concurrency adapts per process between 1 and
+    # GEMINI_MAX_CONCURRENCY to throttling (429) and latency
+    GEMINI_REQUESTS_PER_MINUTE: int = 15
+    GEMINI_TOKENS_PER_MINUTE: int = 1000000
+    GEMINI_MAX_CONCURRENCY: int = 8
+    GEMINI_TARGET_LATENCY: float = 20.0
+    GEMINI_RATE_LIMIT_RETRIES: int = 6
+
+    # LOCAL mode LLM (Ollama): pooled connections, max silence while streaming a completion
+    OLLAMA_BASE_URL: str = "http://localhost:11434"
+    OLLAMA_MODEL: str = "qwen3:8b"
+    OLLAMA_MAX_CONNECTIONS: int = 4
+    OLLAMA_READ_TIMEOUT: float = 120.0
+
+    # TTS synthesis concurrency (set both to 1 for strictly sequential generation)
+    TTS_MAX_CONCURRENCY: int = 8
+    TTS_MAX_CONCURRENCY_PER_VOICE: int = 4
+
+    # Segments longer than this are split at sentence/clause boundaries and synthesized in parallel
+    TTS_MAX_SEGMENT_CHARS: int = 1500
+
+    # Transient TTS failures: attempts with jittered exponential backoff, per-request
+    # timeout, and a circuit that pauses all requests after N consecutive failures
+    TTS_RETRY_ATTEMPTS: int = 4
+    TTS_RETRY_BASE_DELAY: float = 1.0
+    TTS_RETRY_MAX_DELAY: float = 30.0
+    TTS_REQUEST_TIMEOUT: float = 120.0
+    TTS_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    TTS_CIRCUIT_RESET_SECONDS: float = 30.0
+
+    # LOCAL mode XTTS: worker processes (each keeps the model loaded), same-voice batching
+    # and voices (XTTS_SPEAKER_DIR/<voice_id>.wav clones a voice from a reference clip)
+    XTTS_MODEL: str = "tts_models/multilingual/multi-dataset/xtts_v2"
+    XTTS_WORKERS: int = 2
+    XTTS_THREADS_PER_WORKER: int = 2
+    XTTS_MAX_BATCH: int = 4
+    XTTS_BATCH_WINDOW: float = 0.05
+    # Replaces TTS_REQUEST_TIMEOUT for XTTS; the first request also waits for the model to load
+    XTTS_REQUEST_TIMEOUT: float = 900.0
+    XTTS_LANGUAGE: str = "fr"
+    XTTS_SPEAKER_DIR: str = "data/voices"
+    XTTS_FEMALE_SPEAKER: str = "Claribel Dervla"
+    XTTS_MALE_SPEAKER: str = "Damien Black"
+    XTTS_MP3_BITRATE: int = 64
+
+    # Content-addressed cache of synthesized segments ("link" or "copy" into chapter dirs)
+    TTS_CACHE_ENABLED: bool = True
+    TTS_CACHE_DIR: str = "data/cache/tts"
+    TTS_CACHE_MAX_MB: int = 2048
+    TTS_CACHE_MATERIALIZE: str = "link"
+
+    # Persistent LLM response cache (analysis and role assignment); TTL 0 keeps entries forever
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_PATH: str = "data/cache/llm.db"
+    LLM_CACHE_TTL_DAYS: float = 30
+    LLM_CACHE_MAX_ENTRIES: int = 20000
+
+    # Character analysis: the whole book is analyzed in windows of about ANALYSIS_WINDOW_CHARS
+    # (short chapters grouped, long ones split), ANALYSIS_CONCURRENCY at a time, then merged
+    ANALYSIS_WINDOW_CHARS: int = 12000
+    ANALYSIS_CONCURRENCY: int = 4
+
+    # Chapter segmentation: "llm" (the LLM splits and attributes everything), "hybrid"
+    # (rules split narration/dialogue, the LLM only names speakers of untagged quotes,
+    # in batches of ATTRIBUTION_BATCH_SIZE) or "rules" (no LLM at all)
+    SEGMENTATION_MODE: str = "hybrid"
+    ATTRIBUTION_BATCH_SIZE: int = 40
+
+    # Role assignment ("llm" mode): chapters are sent to the LLM as paragraph-aligned windows (with
+    # overlapping context) processed concurrently, then stitched back together
+    ROLE_WINDOW_CHARS: int = 8000
+    ROLE_WINDOW_OVERLAP_CHARS: int = 500
+    ROLE_WINDOW_CONCURRENCY: int = 4
+
+    # Book pipeline: workers per stage and chapters buffered between segmentation and synthesis
+    PIPELINE_SEGMENT_WORKERS: int = 2
+    PIPELINE_SYNTHESIS_WORKERS: int = 2
+    PIPELINE_QUEUE_SIZE: int = 2
+
+    # Process pool for CPU-bound work (EPUB parsing, dialogue splitting); 0 runs it in a thread
+    CPU_POOL_WORKERS: int = 2
+
+    # Largest accepted uploads; bigger files are rejected with 413 while they are streamed to disk
+    MAX_UPLOAD_SIZE_MB: int = 200
+    MAX_COVER_SIZE_MB: int = 10
+
+    # Parse results of uploaded EPUBs, keyed by content hash (uploads are stored as data/uploads/<sha256>.epub)
+    PARSED_CACHE_DIR: str = "data/cache/parsed"
+
+    # Bulk import: books per transaction, max seconds a parsed book waits for its batch, and the
+    # directory the API may import from (the CLI can import from anywhere)
+    IMPORT_BATCH_SIZE: int = 20
+    IMPORT_FLUSH_INTERVAL: float = 2.0
+    IMPORT_ROOT_DIR: str = "data/import"
+
+    # EPUB parsing: "stream" reads the zip lazily in spine order with a streaming HTML text
+    # extractor; "ebooklib" loads the whole book with ebooklib/BeautifulSoup
+    EPUB_PARSER_MODE: str = "stream"
+
+    # Keep segment_NNNN.mp3 files after they are joined into chapter.mp3
+    AUDIO_KEEP_SEGMENT_FILES: bool = False
+
+    # Segment results are written in batches: every N seconds or every N segments
+    PROGRESS_FLUSH_INTERVAL: float = 1.0
+    PROGRESS_FLUSH_SEGMENTS: int = 25
+
+    # Persistent job queue (jobs are claimed with a lease renewed by heartbeats)
+    JOB_LEASE_SECONDS: int = 60
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BACKOFF_SECONDS: float = 10.0
+    JOB_POLL_INTERVAL: float = 1.0
+    JOB_WORKER_CONCURRENCY: int = 2
+
+    # Workers: run one inside the API process, and how standalone workers detect dead peers
+    RUN_EMBEDDED_WORKER: bool = True
+    WORKER_PROCESSES: int = 1
+    WORKER_HEARTBEAT_SECONDS: float = 10.0
+    WORKER_DEAD_AFTER_SECONDS: float = 45.0
+
+    # Progressive chapter streaming: DB poll interval and give-up time without new audio
+    STREAM_POLL_INTERVAL: float = 0.5
+    STREAM_IDLE_TIMEOUT: float = 300.0
+
     class Config:
         env_file = ".env"
         extra = "ignore"
@@ -10,7 +10,11 @@ engine = create_engine(
 )
 
 def create_db_and_tables():
+    from ..models import models  # noqa: F401  (registers the tables)
+    from .migrations import run_migrations
+
     SQLModel.metadata.create_all(engine)
+    run_migrations(engine)
 
 def get_session():
     with Session(engine) as session:
@@ -0,0 +1,157 @@
+"""Versioned schema migrations, applied at startup after ``create_all``.
+
+``SQLModel.metadata.create_all`` creates missing tables but never changes an
+existing one. Each migration brings a database created by an older version
+up to the current models; applied versions are recorded in the
+``schema_migration`` table. Migrations are idempotent (``IF NOT EXISTS``,
+column checks), because on a new database ``create_all`` has already built
+the current schema and they find nothing to do.
+
+Every schema change has its own migration, new tables included, so the list
+reads as the history of the schema. To change the schema, update the model
+and append a migration with the next version number; never edit or
+renumber one that has been released.
+"""
+
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Sequence
+
+from sqlalchemy import inspect, insert, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+
+
+def create_index(conn: Connection, name: str, table: str, columns: Sequence[str], unique: bool = False):
+    unique_sql = "UNIQUE " if unique else ""
+    conn.execute(text(f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+
+
+def add_column(conn: Connection, table: str, column: str, ddl: str):
+    if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def create_table(conn: Connection, model):
+    """Create a model's table with its indexes unless it exists."""
+    model.__table__.create(conn, checkfirst=True)
+
+
+def _job_table(conn: Connection):
+    from ..models.models import Job
+
+    create_table(conn, Job)
+
+
+def _worker_table(conn: Connection):
+    from ..models.models import Worker
+
+    create_table(conn, Worker)
+
+
+def _uploaded_file_table(conn: Connection):
+    from ..models.models import UploadedFile
+
+    create_table(conn, UploadedFile)
+
+
+def _paragraph_table(conn: Connection):
+    from ..models.models import Paragraph
+
+    create_table(conn, Paragraph)
+
+
+def _foreign_key_indexes(conn: Connection):
+    create_index(conn, "ix_chapter_book_id_position", "chapter", ["book_id", "position"])
+    create_index(conn, "ix_character_book_id", "character", ["book_id"])
+    create_index(conn, "ix_segment_chapter_id_id", "segment", ["chapter_id", "id"])
+    create_index(conn, "ix_job_book_id", "job", ["book_id"])
+    create_index(conn, "ix_job_status_available_at", "job", ["status", "available_at"])
+
+
+def _segment_source_offsets(conn: Connection):
+    add_column(conn, "segment", "char_start", "INTEGER")
+    add_column(conn, "segment", "char_end", "INTEGER")
+
+
+def _paragraphs_from_content_text(conn: Connection):
+    """Move the text of chapters parsed before paragraphs existed into the paragraph table."""
+    from ..models.models import Paragraph
+    from ..services.chapter_text import paragraph_hash, split_paragraphs
+
+    legacy = conn.execute(text(
+        "SELECT id FROM chapter WHERE content_text != '' "
+        "AND NOT EXISTS (SELECT 1 FROM paragraph WHERE paragraph.chapter_id = chapter.id)"
+    )).scalars().all()
+    for chapter_id in legacy:
+        content = conn.execute(text("SELECT content_text FROM chapter WHERE id = :id"), {"id": chapter_id}).scalar_one()
+        conn.execute(insert(Paragraph.__table__), [
+            {"chapter_id": chapter_id, "ordinal": ordinal, "char_offset": offset,
+             "text": paragraph, "text_hash": paragraph_hash(paragraph)}
+            for ordinal, (offset, paragraph) in enumerate(split_paragraphs(content))
+        ])
+        conn.execute(text("UPDATE chapter SET content_text = '' WHERE id = :id"), {"id": chapter_id})
+    if legacy:
+        print(f"[MIGRATION] Moved the text of {len(legacy)} chapters to paragraphs")
+
+
+def _llm_rate_budget(conn: Connection):
+    from ..models.models import RateBudget
+
+    create_table(conn, RateBudget)
+
+
+def _job_claims(conn: Connection):
+    add_column(conn, "job", "claims", "INTEGER NOT NULL DEFAULT 0")
+    # Jobs claimed before the counter existed
+    conn.execute(text("UPDATE job SET claims = attempts WHERE claims < attempts"))
+
+
+# In the order the schema changed; each entry names the change it brings an older database through
+MIGRATIONS: List[Migration] = [
+    Migration(1, "job_table", _job_table),  # Persistent job queue
+    Migration(2, "worker_table", _worker_table),  # Standalone worker registry and heartbeats
+    Migration(3, "uploaded_file_table", _uploaded_file_table),  # Content-addressed uploads
+    Migration(4, "paragraph_table", _paragraph_table),  # Chapter text as paragraphs
+    Migration(5, "foreign_key_indexes", _foreign_key_indexes),
+    # Source offsets of the segments made by the dialogue splitter and the role windows
+    Migration(6, "segment_source_offsets", _segment_source_offsets),
+    Migration(7, "paragraphs_from_content_text", _paragraphs_from_content_text),
+    Migration(8, "llm_rate_budget", _llm_rate_budget),  # Gemini budget shared between processes
+    Migration(9, "job_claims", _job_claims),  # Resume released jobs too
+]
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """Apply the migrations this database has not seen yet; returns their versions."""
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migration "
+            "(version INTEGER PRIMARY KEY, name VARCHAR NOT NULL, applied_at TIMESTAMP NOT NULL)"
+        ))
+    with engine.connect() as conn:
+        applied = set(conn.execute(text("SELECT version FROM schema_migration")).scalars())
+
+    newly_applied = []
+    for migration in MIGRATIONS:
+        if migration.version in applied:
+            continue
+        try:
+            with engine.begin() as conn:
+                # Recorded first: the write lock makes a concurrently starting process wait, then skip it
+                conn.execute(
+                    text("INSERT INTO schema_migration (version, name, applied_at) VALUES (:version, :name, :now)"),
+                    {"version": migration.version, "name": migration.name, "now": datetime.utcnow()},
+                )
+                migration.apply(conn)
+        except IntegrityError:
+            # Applied by another process in the meantime
+            continue
+        print(f"[MIGRATION] Applied {migration.version:04d}_{migration.name}")
+        newly_applied.append(migration.version)
+    return newly_applied
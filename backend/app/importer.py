@@ -0,0 +1,77 @@
+"""Bulk EPUB import (the ``scriptvox-import`` command).
+
+Imports every EPUB under a directory into the library, parsing several
+books at once. Run it from the backend directory, against the same
+DATABASE_URL and ``data/`` volume as the API:
+
+    python -m app.importer /srv/catalog --concurrency 8 --analyze
+
+Books already in the library (same file content) are skipped, so an
+interrupted import is resumed by running the same command again.
+"""
+
+import argparse
+import asyncio
+import sys
+from typing import List, Optional
+
+from .core.config import settings
+from .core.database import create_db_and_tables
+
+
+async def run_import(directory: str, recursive: bool, analyze: bool, concurrency: Optional[int]) -> int:
+    from .services.bulk_import import BulkImporter, print_progress
+    from .services.cpu_pool import shutdown_cpu_pool
+    from .services.orchestrator import Orchestrator
+
+    if concurrency:
+        # This process only imports: run one parser process per concurrent book
+        settings.CPU_POOL_WORKERS = concurrency
+    orchestrator = Orchestrator()
+    try:
+        paths = BulkImporter.scan(directory, recursive=recursive)
+        print(f"Found {len(paths)} EPUB files in {directory}")
+        importer = BulkImporter(orchestrator.parser, orchestrator.uploads, concurrency=concurrency)
+        progress = await importer.run(paths, on_progress=print_progress())
+    finally:
+        shutdown_cpu_pool()
+
+    if analyze and progress.book_ids:
+        # Analysis needs the LLM: leave it to the job runners (API or python -m app.worker)
+        from .models.models import JobKind
+        from .services.job_queue import JobQueue
+
+        queue = JobQueue()
+        for book_id in progress.book_ids:
+            queue.enqueue(JobKind.ANALYZE, book_id=book_id)
+        print(f"Queued character analysis for {len(progress.book_ids)} books")
+
+    for path, error in progress.errors.items():
+        print(f"  failed: {path}: {error}")
+    return 1 if progress.failed else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="scriptvox-import", description="Import a directory of EPUB files.")
+    parser.add_argument("directory", help="directory to scan for .epub files")
+    parser.add_argument("--no-recursive", dest="recursive", action="store_false",
+                        help="only import files directly in the directory")
+    parser.add_argument("--analyze", action="store_true",
+                        help="queue character analysis for the imported books")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="books parsed at the same time, each in its own process "
+                             f"(default: CPU_POOL_WORKERS={settings.CPU_POOL_WORKERS})")
+    args = parser.parse_args(argv)
+    if args.concurrency is not None and args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+
+    create_db_and_tables()
+    try:
+        return asyncio.run(run_import(args.directory, args.recursive, args.analyze, args.concurrency))
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,11 +2,14 @@ from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
+import os
 from .core.config import settings
 from .core.database import create_db_and_tables
 from .adapters.base import BaseTTS, BaseLLM
-from .adapters.tts_adapters import EdgeTTSAdapter, XTTSAdapter
-from .adapters.llm_adapters import GeminiLLMAdapter, OllamaLLMAdapter
+from .adapters.factory import create_services
+from .services.job_queue import JobRunner
+from .services.cpu_pool import shutdown_cpu_pool
+from .services.cover_store import CoverFiles
 
 # Dependency Container
 class ServiceContainer:
@@ -21,24 +24,22 @@ async def lifespan(app: FastAPI):
     create_db_and_tables()
     
     # Initialize Adapters based on Mode
-    print(f"Initializing in {settings.APP_MODE} mode...")
-    
-    if settings.APP_MODE == "CLOUD":
-        container.tts_service = EdgeTTSAdapter()
-        if settings.GEMINI_API_KEY:
-            container.llm_service = GeminiLLMAdapter(api_key=settings.GEMINI_API_KEY)
-        else:
-            print("WARNING: GEMINI_API_KEY not set. LLM features will fail.")
-            container.llm_service = GeminiLLMAdapter(api_key="dummy_key")
-            
-    elif settings.APP_MODE == "LOCAL":
-        container.tts_service = XTTSAdapter()
-        container.llm_service = OllamaLLMAdapter()
-    else:
-        raise ValueError(f"Unknown APP_MODE: {settings.APP_MODE}")
+    container.tts_service, container.llm_service = create_services()
+
+    # Generation work runs from the persistent job queue; interrupted jobs resume here.
+    # With RUN_EMBEDDED_WORKER=false the API only serves requests and `python -m app.worker` does the work.
+    job_runner = None
+    if settings.RUN_EMBEDDED_WORKER:
+        job_runner = JobRunner(container.llm_service, container.tts_service)
+        await job_runner.start()
         
     yield
     # Shutdown
+    if job_runner:
+        await job_runner.stop()
+    await container.llm_service.close()
+    await container.tts_service.close()
+    shutdown_cpu_pool()
 
 app = FastAPI(title="ScriptVox API", lifespan=lifespan)
 
@@ -59,13 +60,16 @@ def get_llm_service() -> BaseLLM:
     return container.llm_service
 
 # Register Routers
-from .routers import books, generation, characters, settings as settings_router
+from .routers import books, generation, characters, jobs, settings as settings_router
 app.include_router(books.router)
 app.include_router(generation.router)
 app.include_router(characters.router)
+app.include_router(jobs.router)
 app.include_router(settings_router.router)
 
-# Mount static files for serving covers and audio
+# Mount static files for serving covers and audio; resized covers are content-addressed and cached for a year
+os.makedirs("data/covers", exist_ok=True)
+app.mount("/data/covers", CoverFiles(directory="data/covers"), name="covers")
 app.mount("/data", StaticFiles(directory="data"), name="data")
 
 @app.get("/")
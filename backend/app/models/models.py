@@ -1,5 +1,5 @@
-from typing import Optional, List
-from sqlmodel import Field, SQLModel, Relationship
+from typing import Optional, List, Dict, Any
+from sqlmodel import Field, SQLModel, Relationship, Column, JSON, Index
 from enum import Enum
 from datetime import datetime
 
@@ -14,6 +14,24 @@ class ChapterStatus(str, Enum):
     COMPLETED = "completed"
     FAILED = "failed"
 
+class JobKind(str, Enum):
+    PIPELINE = "pipeline"
+    ANALYZE = "analyze"
+    SEGMENT = "segment"
+    GENERATE = "generate"
+    IMPORT = "import"
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class WorkerStatus(str, Enum):
+    ACTIVE = "active"
+    STOPPED = "stopped"
+    DEAD = "dead"
+
 class Book(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str
@@ -27,7 +45,7 @@ class Book(SQLModel, table=True):
 
 class Character(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    book_id: int = Field(foreign_key="book.id")
+    book_id: int = Field(foreign_key="book.id", index=True)
     name: str
     gender: Optional[str] = None
     age_category: Optional[str] = None  # e.g., "child", "teen", "adult", "old"
@@ -39,11 +57,13 @@ class Character(SQLModel, table=True):
     book: Book = Relationship(back_populates="characters")
 
 class Chapter(SQLModel, table=True):
+    __table_args__ = (Index("ix_chapter_book_id_position", "book_id", "position"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     book_id: int = Field(foreign_key="book.id")
     position: int
     title: str
-    content_text: str
+    content_text: str = ""  # Legacy; text lives in Paragraph (migration 7 moves older chapters there)
     audio_path: Optional[str] = None
     status: ChapterStatus = Field(default=ChapterStatus.PENDING)
     progress: int = Field(default=0)
@@ -51,13 +71,83 @@ class Chapter(SQLModel, table=True):
     book: Book = Relationship(back_populates="chapters")
     segments: List["Segment"] = Relationship(back_populates="chapter", sa_relationship_kwargs={"cascade": "all, delete"})
 
+class ChapterRead(SQLModel):
+    """A chapter without its text, as listed by the API."""
+    id: int
+    book_id: int
+    position: int
+    title: str
+    audio_path: Optional[str] = None
+    status: ChapterStatus
+    progress: int
+    char_count: int = 0
+
+class Paragraph(SQLModel, table=True):
+    """One line of a chapter's text; the chapter is its paragraphs joined by newlines."""
+    __table_args__ = (Index("ix_paragraph_chapter_ordinal", "chapter_id", "ordinal", unique=True),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    chapter_id: int = Field(foreign_key="chapter.id")
+    ordinal: int  # 0-based position in the chapter
+    char_offset: int  # Offset of the first character in the chapter text
+    text: str
+    text_hash: str  # First 16 hex digits of the sha256 of ``text``
+
 class Segment(SQLModel, table=True):
+    __table_args__ = (Index("ix_segment_chapter_id_id", "chapter_id", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     chapter_id: int = Field(foreign_key="chapter.id")
     text: str
     speaker_id: Optional[int] = Field(default=None, foreign_key="character.id", nullable=True) # Null for Narrator
+    char_start: Optional[int] = None  # Source range of ``text`` in the chapter text, when known
+    char_end: Optional[int] = None
     audio_file: Optional[str] = None
     start_time: Optional[float] = None
     end_time: Optional[float] = None
     
     chapter: Chapter = Relationship(back_populates="segments")
+
+class UploadedFile(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    book_id: int = Field(foreign_key="book.id", index=True)
+    content_hash: str = Field(index=True)  # sha256 of the EPUB, also its name in the upload store
+    file_path: str
+    original_filename: str
+    size: int
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class Job(SQLModel, table=True):
+    __table_args__ = (Index("ix_job_status_available_at", "status", "available_at"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: JobKind
+    book_id: Optional[int] = Field(default=None, index=True)
+    chapter_id: Optional[int] = None
+    payload: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON))
+    status: JobStatus = Field(default=JobStatus.QUEUED)
+    attempts: int = Field(default=0)
+    claims: int = Field(default=0)  # Like attempts, but not given back on release
+    max_attempts: int = Field(default=3)
+    available_at: datetime = Field(default_factory=datetime.utcnow)  # Not claimable before (retry backoff)
+    lease_owner: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+    checkpoint: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON))
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class Worker(SQLModel, table=True):
+    id: str = Field(primary_key=True)  # hostname:pid:random
+    hostname: str
+    pid: int
+    concurrency: int = Field(default=1)
+    status: WorkerStatus = Field(default=WorkerStatus.ACTIVE)
+    started_at: datetime = Field(default_factory=datetime.utcnow)
+    last_heartbeat: datetime = Field(default_factory=datetime.utcnow)
+
+class RateBudget(SQLModel, table=True):
+    """A provider budget (token bucket) shared by every process using this database."""
+    key: str = Field(primary_key=True)  # e.g. "gemini:requests"
+    level: float
+    updated_at: float  # Unix time of the last refill
@@ -1,57 +1,102 @@
-from fastapi import APIRouter, UploadFile, File, BackgroundTasks, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlmodel import Session, select
-from typing import List
+from typing import List, Optional
+from pydantic import BaseModel
 import shutil
 import os
 from ..core.database import get_session
-from ..models.models import Book, Chapter, Character
+from ..core.config import settings
+from ..models.models import Book, Chapter, ChapterRead, Character, ChapterStatus, UploadedFile, JobKind
 from ..services.orchestrator import Orchestrator
-from ..main import get_llm_service, get_tts_service
+from ..services.job_queue import JobQueue
+from ..services.bulk_import import BulkImporter
+from ..services.chapter_text import chapter_lengths, delete_book_paragraphs, read_text
+from ..services.upload_store import MultipartFile, UploadRejected, stream_upload, check_image_head
+from ..services.cover_store import store_cover_file
+from ..services.cpu_pool import run_cpu
+from ..services.chapter_stream import stream_chapter_audio
+from ..services.audio_assembler import CHAPTER_AUDIO_FILENAME
 
 router = APIRouter(prefix="/books", tags=["books"])
 orchestrator = Orchestrator()
 
-@router.post("/upload", response_model=Book)
+# Uploads read the request body themselves (see MultipartFile), so the form is described here for the API docs
+FILE_UPLOAD_BODY = {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+    "type": "object", "required": ["file"],
+    "properties": {"file": {"type": "string", "format": "binary"}},
+}}}}}
+
+@router.post("/upload", response_model=Book, openapi_extra=FILE_UPLOAD_BODY)
 async def upload_book(
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
+    request: Request,
     auto_process: bool = False,
-    llm_service = Depends(get_llm_service),
-    tts_service = Depends(get_tts_service)
+    reuse_analysis: bool = True
 ):
-    if not file.filename.endswith(".epub"):
-        raise HTTPException(status_code=400, detail="Only .epub files are supported")
-    
-    if auto_process:
-        return await orchestrator.process_upload_and_generate(file, background_tasks, llm_service, tts_service)
-    else:
-        return await orchestrator.process_upload_and_analyze(file, background_tasks, llm_service)
+    # A known EPUB reuses its stored parse result, and with reuse_analysis the characters of the last book made from it
+    try:
+        file = await MultipartFile(request, "file", settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024).open()
+        if not file.filename.endswith(".epub"):
+            raise HTTPException(status_code=400, detail="Only .epub files are supported")
+        if auto_process:
+            return await orchestrator.process_upload_and_generate(file, reuse_analysis=reuse_analysis)
+        else:
+            return await orchestrator.process_upload_and_analyze(file, reuse_analysis=reuse_analysis)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+class ImportRequest(BaseModel):
+    directory: str
+    recursive: bool = True
+    analyze: bool = False
 
-@router.post("/{book_id}/cover", response_model=Book)
+@router.post("/import")
+def import_books(request: ImportRequest):
+    # Only directories below IMPORT_ROOT_DIR can be imported through the API
+    root = os.path.realpath(settings.IMPORT_ROOT_DIR)
+    directory = os.path.realpath(os.path.join(root, request.directory))
+    if os.path.commonpath([root, directory]) != root:
+        raise HTTPException(status_code=400, detail=f"Directory must be inside {settings.IMPORT_ROOT_DIR}")
+    try:
+        files = BulkImporter.scan(directory, recursive=request.recursive)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    job = JobQueue().enqueue(JobKind.IMPORT, payload={
+        "directory": directory, "recursive": request.recursive, "analyze": request.analyze
+    })
+    return {"message": f"Importing {len(files)} EPUB files", "job_id": job.id, "files": len(files)}
+
+@router.post("/{book_id}/cover", response_model=Book, openapi_extra=FILE_UPLOAD_BODY)
 async def upload_cover(
     book_id: int,
-    file: UploadFile = File(...),
+    request: Request,
     session: Session = Depends(get_session)
 ):
     book = session.get(Book, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
     
-    # Validate file type
-    if not file.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="Only image files are supported")
-    
     # Create covers directory if it doesn't exist
     covers_dir = "data/covers"
     os.makedirs(covers_dir, exist_ok=True)
     
-    # Save cover image
-    file_extension = file.filename.split(".")[-1]
-    cover_filename = f"book_{book_id}_cover.{file_extension}"
-    cover_path = os.path.join(covers_dir, cover_filename)
-    
-    with open(cover_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Stream the image to a temp file, then store its resized variants under its content hash
+    max_size = settings.MAX_COVER_SIZE_MB * 1024 * 1024
+    try:
+        file = await MultipartFile(request, "file", max_size).open()
+        # Validate file type
+        if not (file.content_type or "").startswith("image/"):
+            raise HTTPException(status_code=400, detail="Only image files are supported")
+        streamed = await stream_upload(file, covers_dir, max_size, check_head=check_image_head)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    try:
+        cover_path = await run_cpu(store_cover_file, streamed.tmp_path, covers_dir)
+    except ValueError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    finally:
+        os.remove(streamed.tmp_path)
     
     # Update book record
     book.cover_path = cover_path
@@ -73,10 +118,27 @@ def get_book(book_id: int, session: Session = Depends(get_session)):
         raise HTTPException(status_code=404, detail="Book not found")
     return book
 
-@router.get("/{book_id}/chapters", response_model=List[Chapter])
+@router.get("/{book_id}/chapters", response_model=List[ChapterRead])
 def get_book_chapters(book_id: int, session: Session = Depends(get_session)):
-    chapters = session.exec(select(Chapter).where(Chapter.book_id == book_id).order_by(Chapter.position)).all()
-    return chapters
+    # Chapter text is not listed (GET /books/chapters/{id}/text reads it), so it is not loaded either
+    rows = session.exec(
+        select(Chapter.id, Chapter.book_id, Chapter.position, Chapter.title,
+               Chapter.audio_path, Chapter.status, Chapter.progress)
+        .where(Chapter.book_id == book_id).order_by(Chapter.position)
+    ).all()
+    lengths = chapter_lengths(session, [row.id for row in rows])
+    return [ChapterRead(**row._mapping, char_count=lengths.get(row.id) or 0) for row in rows]
+
+@router.get("/chapters/{chapter_id}/text")
+def get_chapter_text(chapter_id: int, start: int = Query(0, ge=0), end: Optional[int] = Query(None, ge=0),
+                     session: Session = Depends(get_session)):
+    if session.exec(select(Chapter.id).where(Chapter.id == chapter_id)).first() is None:
+        raise HTTPException(status_code=404, detail="Chapter not found")
+    length = chapter_lengths(session, [chapter_id]).get(chapter_id) or 0
+    end = length if end is None else min(end, length)
+    start = min(start, end)
+    return {"chapter_id": chapter_id, "start": start, "end": end, "length": length,
+            "text": read_text(session, chapter_id, start, end)}
 
 @router.get("/{book_id}/characters", response_model=List[Character])
 def get_book_characters(book_id: int, session: Session = Depends(get_session)):
@@ -95,6 +157,25 @@ def get_chapter_segments(chapter_id: int, session: Session = Depends(get_session
     segments = session.exec(select(Segment).where(Segment.chapter_id == chapter_id).order_by(Segment.id)).all()
     return segments
 
+@router.get("/chapters/{chapter_id}/stream")
+def stream_chapter(chapter_id: int, session: Session = Depends(get_session)):
+    chapter = session.get(Chapter, chapter_id)
+    if not chapter:
+        raise HTTPException(status_code=404, detail="Chapter not found")
+
+    # Finished chapters are a plain file, so players can seek with Range requests
+    if chapter.status == ChapterStatus.COMPLETED and chapter.audio_path:
+        chapter_file = os.path.join(chapter.audio_path, CHAPTER_AUDIO_FILENAME)
+        if os.path.exists(chapter_file):
+            return FileResponse(chapter_file, media_type="audio/mpeg")
+
+    # Still generating: send segments as they finish over a chunked response
+    return StreamingResponse(
+        stream_chapter_audio(chapter_id),
+        media_type="audio/mpeg",
+        headers={"Cache-Control": "no-cache", "Accept-Ranges": "none"}
+    )
+
 @router.delete("/{book_id}")
 async def delete_book(book_id: int, session: Session = Depends(get_session)):
     book = session.get(Book, book_id)
@@ -114,6 +195,11 @@ async def delete_book(book_id: int, session: Session = Depends(get_session)):
     # The cover_path is usually "data/covers/uuid.jpg". 
     # Let's just delete the DB record for now, file cleanup is secondary/risky without strict paths.
     
+    JobQueue().cancel_for_book(book_id)
+    delete_book_paragraphs(session, book_id)
+    # The stored EPUB and its parse result stay in the upload store for other books
+    for upload in session.exec(select(UploadedFile).where(UploadedFile.book_id == book_id)).all():
+        session.delete(upload)
     session.delete(book)
     session.commit()
     return {"message": "Book deleted successfully"}
@@ -1,55 +1,80 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session
 from ..core.database import get_session
-from ..models.models import Book, Chapter
-from ..services.orchestrator import Orchestrator
-from ..adapters.base import BaseLLM, BaseTTS
-from ..main import get_llm_service, get_tts_service
+from ..models.models import Book, Chapter, JobKind
+from ..services.job_queue import JobQueue
+from ..adapters.base import BaseTTS
+from ..adapters.base import BaseLLM
+from ..adapters.cached_tts import CachedTTSAdapter
+from ..adapters.cached_llm import CachedLLMAdapter
+from ..main import get_tts_service, get_llm_service
 
 router = APIRouter(prefix="/generation", tags=["generation"])
-orchestrator = Orchestrator()
+job_queue = JobQueue()
 
 @router.post("/analyze/{book_id}")
 async def analyze_book(
     book_id: int, 
-    background_tasks: BackgroundTasks,
-    session: Session = Depends(get_session),
-    llm_service: BaseLLM = Depends(get_llm_service)
+    refresh: bool = False,
+    session: Session = Depends(get_session)
 ):
     # Check if book exists
     book = session.get(Book, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
 
-    # Run analysis in background
-    background_tasks.add_task(orchestrator.analyze_book, book_id, llm_service)
+    # Run analysis in a worker
+    job = job_queue.enqueue(JobKind.ANALYZE, book_id=book_id, payload={"refresh": refresh})
     
-    return {"message": f"Analysis started for book {book_id}"}
+    return {"message": f"Analysis started for book {book_id}", "job_id": job.id}
 
 @router.post("/segment/{chapter_id}")
 async def segment_chapter(
     chapter_id: int,
-    background_tasks: BackgroundTasks,
-    session: Session = Depends(get_session),
-    llm_service: BaseLLM = Depends(get_llm_service)
+    refresh: bool = False,
+    session: Session = Depends(get_session)
 ):
     chapter = session.get(Chapter, chapter_id)
     if not chapter:
         raise HTTPException(status_code=404, detail="Chapter not found")
         
-    background_tasks.add_task(orchestrator.segment_chapter, chapter_id, llm_service)
-    return {"message": f"Segmentation started for chapter {chapter_id}"}
+    job = job_queue.enqueue(JobKind.SEGMENT, book_id=chapter.book_id, chapter_id=chapter_id, payload={"refresh": refresh})
+    return {"message": f"Segmentation started for chapter {chapter_id}", "job_id": job.id}
 
 @router.post("/generate/{chapter_id}")
 async def generate_audio(
     chapter_id: int, 
-    background_tasks: BackgroundTasks,
-    session: Session = Depends(get_session),
-    tts_service: BaseTTS = Depends(get_tts_service)
+    session: Session = Depends(get_session)
 ):
     chapter = session.get(Chapter, chapter_id)
     if not chapter:
         raise HTTPException(status_code=404, detail="Chapter not found")
         
-    background_tasks.add_task(orchestrator.generate_audio, chapter_id, tts_service)
-    return {"message": f"Audio generation started for chapter {chapter_id}"}
+    job = job_queue.enqueue(JobKind.GENERATE, book_id=chapter.book_id, chapter_id=chapter_id)
+    return {"message": f"Audio generation started for chapter {chapter_id}", "job_id": job.id}
+
+@router.get("/tts-cache")
+def get_tts_cache_stats(tts_service: BaseTTS = Depends(get_tts_service)):
+    if not isinstance(tts_service, CachedTTSAdapter):
+        return {"enabled": False}
+    return {"enabled": True, **tts_service.cache.stats()}
+
+@router.get("/llm-cache")
+def get_llm_cache_stats(llm_service: BaseLLM = Depends(get_llm_service)):
+    if not isinstance(llm_service, CachedLLMAdapter):
+        return {"enabled": False}
+    return {"enabled": True, **llm_service.cache.stats()}
+
+@router.get("/llm-rate")
+def get_llm_rate_stats(llm_service: BaseLLM = Depends(get_llm_service)):
+    inner = llm_service.inner if isinstance(llm_service, CachedLLMAdapter) else llm_service
+    scheduler = getattr(inner, "scheduler", None)
+    if scheduler is None:
+        return {"enabled": False}
+    return {"enabled": True, **scheduler.stats()}
+
+@router.delete("/llm-cache")
+def clear_llm_cache(llm_service: BaseLLM = Depends(get_llm_service)):
+    if not isinstance(llm_service, CachedLLMAdapter):
+        raise HTTPException(status_code=400, detail="LLM cache is disabled")
+    return {"deleted": llm_service.cache.clear()}
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlmodel import Session, select
+from typing import List, Optional
+from ..core.database import get_session
+from ..models.models import Job, JobStatus, Worker
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+@router.get("/", response_model=List[Job])
+def list_jobs(
+    book_id: Optional[int] = None,
+    status: Optional[JobStatus] = None,
+    limit: int = 100,
+    session: Session = Depends(get_session)
+):
+    query = select(Job)
+    if book_id is not None:
+        query = query.where(Job.book_id == book_id)
+    if status is not None:
+        query = query.where(Job.status == status)
+    return session.exec(query.order_by(Job.id.desc()).limit(limit)).all()
+
+@router.get("/workers", response_model=List[Worker])
+def list_workers(session: Session = Depends(get_session)):
+    return session.exec(select(Worker).order_by(Worker.last_heartbeat.desc())).all()
+
+@router.get("/{job_id}", response_model=Job)
+def get_job(job_id: int, session: Session = Depends(get_session)):
+    job = session.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -0,0 +1,152 @@
+"""Joins per-segment MP3 files into one chapter file without re-encoding."""
+
+import os
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+READ_CHUNK = 64 * 1024
+CHAPTER_AUDIO_FILENAME = "chapter.mp3"
+
+# Bitrates in kbps indexed by [version_is_mpeg1][layer][index]
+_BITRATES = {
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+
+def parse_frame_header(header: bytes) -> Optional[Tuple[int, float]]:
+    """Return (frame_length, duration_seconds) for a 4-byte MPEG audio header, or None."""
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+
+    version = (header[1] >> 3) & 0x03  # 3 = MPEG1, 2 = MPEG2, 0 = MPEG2.5
+    layer_bits = (header[1] >> 1) & 0x03  # 3 = Layer I, 2 = Layer II, 1 = Layer III
+    bitrate_index = (header[2] >> 4) & 0x0F
+    sample_rate_index = (header[2] >> 2) & 0x03
+    padding = (header[2] >> 1) & 0x01
+
+    if version == 1 or layer_bits == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    layer = 4 - layer_bits
+    mpeg1 = version == 3
+    bitrate = _BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+
+    if layer == 1:
+        length = (12 * bitrate // sample_rate + padding) * 4
+        samples = 384
+    elif layer == 2 or mpeg1:
+        length = 144 * bitrate // sample_rate + padding
+        samples = 1152
+    else:
+        length = 72 * bitrate // sample_rate + padding
+        samples = 576
+
+    return length, samples / sample_rate
+
+
+def _id3v2_size(data: bytes) -> int:
+    """Size of a leading ID3v2 tag (header included), 0 if there is none."""
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _is_info_frame(frame: bytes) -> bool:
+    # Xing/Info/VBRI headers describe the whole source file; inside a joined
+    # stream they would make players report the first segment's length.
+    head = frame[:64]
+    return b"Xing" in head or b"Info" in head or b"VBRI" in head
+
+
+def iter_mp3_frames(stream: BinaryIO) -> Iterator[Tuple[bytes, float]]:
+    """Yield (frame_bytes, duration) for each audio frame, reading in chunks.
+
+    Tags (ID3v2, ID3v1, APE) and encoder info frames are skipped; bytes that
+    do not form a valid frame are resynchronized past.
+    """
+    buffer = bytearray(stream.read(READ_CHUNK))
+    eof = len(buffer) < READ_CHUNK
+    position = 0
+    first_frame = True
+
+    def fill(needed: int) -> bool:
+        nonlocal buffer, position, eof
+        while len(buffer) - position < needed and not eof:
+            del buffer[:position]
+            position = 0
+            chunk = stream.read(READ_CHUNK)
+            if not chunk:
+                eof = True
+            buffer.extend(chunk)
+        return len(buffer) - position >= needed
+
+    while fill(4):
+        if buffer[position:position + 3] == b"ID3" and fill(10):
+            skip = _id3v2_size(bytes(buffer[position:position + 10]))
+            while skip > 0 and fill(1):
+                step = min(skip, len(buffer) - position)
+                position += step
+                skip -= step
+            continue
+        if buffer[position:position + 3] == b"TAG" or buffer[position:position + 8] == b"APETAGEX":
+            return
+
+        parsed = parse_frame_header(bytes(buffer[position:position + 4]))
+        if parsed is None:
+            position += 1
+            continue
+
+        length, duration = parsed
+        if not fill(length):
+            return
+        frame = bytes(buffer[position:position + length])
+        position += length
+
+        if first_frame:
+            first_frame = False
+            if _is_info_frame(frame):
+                continue
+        yield frame, duration
+
+
+def assemble_chapter(
+    segment_files: List[Tuple[int, Optional[str]]],
+    output_path: str,
+) -> List[Tuple[int, float, float]]:
+    """Concatenate segment MP3 frames into ``output_path``.
+
+    ``segment_files`` is a list of (segment_id, path) in playback order; a
+    ``None`` path is skipped. Returns (segment_id, start, end) offsets in
+    seconds for every segment that contributed audio. The output is written to
+    a temporary file and renamed so readers never see a partial chapter.
+    """
+    offsets = []
+    elapsed = 0.0
+    tmp_path = f"{output_path}.tmp"
+
+    try:
+        with open(tmp_path, "wb") as out:
+            for segment_id, path in segment_files:
+                if not path or not os.path.exists(path):
+                    continue
+                start = elapsed
+                with open(path, "rb") as src:
+                    for frame, duration in iter_mp3_frames(src):
+                        out.write(frame)
+                        elapsed += duration
+                if elapsed > start:
+                    offsets.append((segment_id, round(start, 3), round(elapsed, 3)))
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return offsets
@@ -0,0 +1,195 @@
+"""Disk-backed, content-addressed cache of synthesized audio."""
+
+import asyncio
+import hashlib
+import os
+import shutil
+import unicodedata
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so cosmetic differences (whitespace, Unicode forms) share an entry."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class AudioCache:
+    """Stores one audio file per (adapter, voice, normalized text) key.
+
+    Entries live under ``cache_dir/<2 hex chars>/<sha256>.<ext>``. Recency is
+    tracked in memory and mirrored to the file mtime so the LRU order survives
+    restarts. When the total size exceeds ``max_bytes`` the least recently
+    used entries are deleted.
+
+    Cached files are materialized into the chapter directory by hard link
+    (falling back to a copy across filesystems), so a re-run costs one
+    ``link()`` per segment instead of a synthesis call.
+
+    Several worker processes may share ``cache_dir``: the in-memory index is
+    only a view of the directory, so an entry another process wrote is found
+    on disk and one it evicted is forgotten.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, materialize: str = "link"):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.materialize_mode = materialize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        found = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if ".tmp" in name:
+                    # Leftover from an interrupted synthesis
+                    try:
+                        os.remove(os.path.join(root, name))
+                    except OSError:
+                        pass
+                    continue
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                found.append((stat.st_mtime, path, stat.st_size))
+
+        for _, path, size in sorted(found):
+            self._entries[path] = size
+            self._total_bytes += size
+        # The size limit may have been lowered since the last run
+        self._evict()
+
+    @staticmethod
+    def make_key(adapter: str, voice_id: str, text: str) -> str:
+        payload = "\x1f".join([adapter, voice_id, normalize_text(text)])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str, ext: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}{ext}")
+
+    def _touch(self, path: str):
+        self._entries.move_to_end(path)
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    def _add(self, path: str):
+        size = os.path.getsize(path)
+        previous = self._entries.pop(path, 0)
+        self._entries[path] = size
+        self._total_bytes += size - previous
+        self._evict()
+
+    def _forget(self, path: str):
+        size = self._entries.pop(path, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            path, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _materialize(self, entry_path: str, output_path: str):
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        # Never write through an existing file: it may be a hard link to a cache entry
+        if os.path.lexists(output_path):
+            os.remove(output_path)
+        if self.materialize_mode == "link":
+            try:
+                os.link(entry_path, output_path)
+                return
+            except OSError:
+                pass
+        shutil.copyfile(entry_path, output_path)
+
+    async def fetch(
+        self,
+        key: str,
+        output_path: str,
+        produce: Callable[[str], Awaitable[object]],
+    ) -> bool:
+        """Materialize the entry for ``key`` at ``output_path``.
+
+        On a miss ``produce(tmp_path)`` is awaited to create the audio, and the
+        result is stored before being materialized. Concurrent requests for the
+        same key wait for the first producer. Returns True on a cache hit.
+        """
+        ext = os.path.splitext(output_path)[1] or ".mp3"
+        entry_path = self._entry_path(key, ext)
+
+        pending = self._inflight.get(entry_path)
+        if pending is not None:
+            await asyncio.shield(pending)
+            self.hits += 1
+            await asyncio.to_thread(self._materialize, entry_path, output_path)
+            return True
+
+        if os.path.exists(entry_path):
+            if entry_path in self._entries:
+                self._touch(entry_path)
+            else:
+                # Written by another process sharing the cache directory
+                self._add(entry_path)
+            try:
+                await asyncio.to_thread(self._materialize, entry_path, output_path)
+                self.hits += 1
+                return True
+            except FileNotFoundError:
+                pass  # Evicted by another process meanwhile
+        self._forget(entry_path)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[entry_path] = future
+        try:
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            tmp_path = f"{entry_path}.{uuid.uuid4().hex}.tmp{ext}"
+            try:
+                await produce(tmp_path)
+                if not os.path.exists(tmp_path) or os.path.getsize(tmp_path) == 0:
+                    raise RuntimeError(f"TTS produced no audio for cache entry {key}")
+                os.replace(tmp_path, entry_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+            self._add(entry_path)
+            await asyncio.to_thread(self._materialize, entry_path, output_path)
+            future.set_result(None)
+            return False
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure does not log a warning
+            future.exception()
+            raise
+        finally:
+            del self._inflight[entry_path]
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / lookups) if lookups else None,
+        }
@@ -0,0 +1,241 @@
+"""Imports every EPUB of a directory tree into the library."""
+
+import asyncio
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional, Set
+
+from sqlalchemy import insert
+from sqlmodel import Session, select
+
+from ..core.config import settings
+from ..core.database import engine
+from ..models.models import Book, BookStatus, Chapter, ChapterStatus, UploadedFile
+from .chapter_text import insert_paragraphs
+from .cpu_pool import cpu_pool_size, run_cpu
+from .ebook_parser import EbookParser
+from .upload_store import StoredUpload, UploadStore
+
+_MAX_REPORTED_ERRORS = 50
+
+
+@dataclass
+class ImportProgress:
+    total: int = 0
+    imported: int = 0
+    skipped: int = 0  # Already in the library (same content hash)
+    failed: int = 0
+    chapters: int = 0
+    book_ids: List[int] = field(default_factory=list)
+    errors: Dict[str, str] = field(default_factory=dict)  # path -> error, first few only
+
+    @property
+    def done(self) -> int:
+        return self.imported + self.skipped + self.failed
+
+    def as_dict(self) -> dict:
+        data = asdict(self)
+        data.pop("book_ids")
+        data["done"] = self.done
+        return data
+
+
+@dataclass
+class _ParsedFile:
+    path: str
+    stored: StoredUpload
+
+
+def _parse_to_cache(file_path: str, cover_dir: str, parsed_dir: str, content_hash: str) -> int:
+    """Parse one EPUB into the upload store's parse cache; runs in a pool process. Returns the chapter count."""
+    parser = EbookParser(upload_dir=os.path.dirname(file_path), cover_dir=cover_dir)
+    store = UploadStore(parser.upload_dir, parsed_dir)
+    writer = store.parsed_writer(content_hash)
+    try:
+        if settings.EPUB_PARSER_MODE.lower() == "stream":
+            book = parser.read_metadata(file_path)
+            chapters = parser.iter_chapters(file_path)
+        else:
+            book = parser.parse_epub(file_path)
+            chapters = book.chapters
+        writer.write_book(book)
+        count = 0
+        for chapter in chapters:
+            writer.write_chapter(chapter)
+            count += 1
+    except BaseException:
+        writer.discard()
+        raise
+    writer.commit()
+    return count
+
+
+class BulkImporter:
+    """Copies, parses and stores many EPUBs concurrently.
+
+    Files are copied into the upload store (hashed on the way) and parsed
+    in the CPU pool, ``concurrency`` at a time; parse results go to the
+    parse cache rather than back through the pool. A single writer then
+    creates the Book, Chapter and UploadedFile rows of ``batch_size`` books
+    per transaction. EPUBs whose content hash is already in the library are
+    skipped, so an interrupted import is resumed by running it again.
+    """
+
+    def __init__(self, parser: EbookParser, uploads: UploadStore,
+                 concurrency: Optional[int] = None, batch_size: Optional[int] = None):
+        self.parser = parser
+        self.uploads = uploads
+        self.concurrency = max(1, concurrency or cpu_pool_size())
+        self.batch_size = max(1, batch_size or settings.IMPORT_BATCH_SIZE)
+
+    @staticmethod
+    def scan(directory: str, recursive: bool = True) -> List[str]:
+        """EPUB files under ``directory``, in a stable order."""
+        if not os.path.isdir(directory):
+            raise ValueError(f"Not a directory: {directory}")
+        paths = []
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            paths.extend(os.path.join(root, name) for name in sorted(files) if name.lower().endswith(".epub"))
+            if not recursive:
+                break
+        return paths
+
+    @staticmethod
+    def _imported_hashes() -> Set[str]:
+        """Hashes of the EPUBs in the library, including books still being processed.
+
+        Only failed parses (status "failed", outside BookStatus) are imported again.
+        """
+        with Session(engine) as session:
+            return set(session.exec(
+                select(UploadedFile.content_hash)
+                .join(Book, Book.id == UploadedFile.book_id)
+                .where(Book.status.in_(list(BookStatus)))
+            ).all())
+
+    async def run(self, paths: List[str],
+                  on_progress: Optional[Callable[[ImportProgress], None]] = None) -> ImportProgress:
+        progress = ImportProgress(total=len(paths))
+        known = await asyncio.to_thread(self._imported_hashes)
+        parsed: asyncio.Queue = asyncio.Queue(maxsize=self.batch_size * 2)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        def report():
+            if on_progress:
+                on_progress(progress)
+
+        def record_failure(path: str, error: BaseException):
+            progress.failed += 1
+            if len(progress.errors) < _MAX_REPORTED_ERRORS:
+                progress.errors[path] = f"{type(error).__name__}: {error}"
+            print(f"[ERROR] Import of {path} failed: {error}")
+            report()
+
+        async def prepare(path: str):
+            async with semaphore:
+                try:
+                    stored = await asyncio.to_thread(self.uploads.save_file, path)
+                    if stored.content_hash in known:
+                        progress.skipped += 1
+                        report()
+                        return
+                    # Identical files in the same run are imported once
+                    known.add(stored.content_hash)
+                    if not self.uploads.has_parsed(stored.content_hash):
+                        await run_cpu(_parse_to_cache, stored.file_path, self.parser.cover_dir,
+                                      self.uploads.parsed_dir, stored.content_hash)
+                except Exception as e:
+                    record_failure(path, e)
+                    return
+            await parsed.put(_ParsedFile(path, stored))
+
+        async def write():
+            # A batch is written when full, at the end, or FLUSH_INTERVAL after its first book
+            batch: List[_ParsedFile] = []
+            deadline = None
+            finished = False
+            while not finished:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = await asyncio.wait_for(parsed.get(), timeout=timeout)
+                    if item is None:
+                        finished = True
+                    else:
+                        batch.append(item)
+                        deadline = deadline or time.monotonic() + settings.IMPORT_FLUSH_INTERVAL
+                except asyncio.TimeoutError:
+                    pass
+                if batch and (finished or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                    await self._flush(batch, progress, record_failure)
+                    batch = []
+                    deadline = None
+                    report()
+
+        writer = asyncio.create_task(write())
+        try:
+            await asyncio.gather(*(prepare(path) for path in paths))
+            await parsed.put(None)
+            await writer
+        finally:
+            writer.cancel()
+        return progress
+
+    async def _flush(self, batch: List[_ParsedFile], progress: ImportProgress, record_failure):
+        try:
+            results = await asyncio.to_thread(self._write_batch, batch)
+        except Exception as e:
+            if len(batch) == 1:
+                record_failure(batch[0].path, e)
+                return
+            # Find the culprit: write the books one by one
+            for item in batch:
+                await self._flush([item], progress, record_failure)
+            return
+        for book_id, chapter_count in results:
+            progress.imported += 1
+            progress.chapters += chapter_count
+            progress.book_ids.append(book_id)
+
+    def _write_batch(self, batch: List[_ParsedFile]) -> List[tuple]:
+        """Create the rows of every book in ``batch`` in one transaction."""
+        results = []
+        with Session(engine) as session:
+            for item in batch:
+                meta, chapters = self.uploads.read_parsed(item.stored.content_hash)
+                book = Book(title=meta.title, author=meta.author, cover_path=meta.cover_path, status=BookStatus.READY)
+                session.add(book)
+                session.flush()
+                chapter_count = 0
+                for chapter in chapters:
+                    result = session.execute(insert(Chapter).values(
+                        book_id=book.id, position=chapter.position, title=chapter.title, content_text="",
+                        status=ChapterStatus.PENDING, progress=0
+                    ))
+                    insert_paragraphs(session, result.inserted_primary_key[0], chapter.content)
+                    chapter_count += 1
+                session.add(UploadedFile(
+                    book_id=book.id,
+                    content_hash=item.stored.content_hash,
+                    file_path=item.stored.file_path,
+                    original_filename=os.path.basename(item.path),
+                    size=item.stored.size
+                ))
+                results.append((book.id, chapter_count))
+            session.commit()
+        return results
+
+
+def print_progress(every_seconds: float = 2.0) -> Callable[[ImportProgress], None]:
+    """Progress callback printing a summary line at most every ``every_seconds``."""
+    last = [0.0]
+
+    def report(progress: ImportProgress):
+        now = time.monotonic()
+        if now - last[0] >= every_seconds or progress.done == progress.total:
+            last[0] = now
+            print(f"[IMPORT] {progress.done}/{progress.total} files: {progress.imported} imported "
+                  f"({progress.chapters} chapters), {progress.skipped} already present, {progress.failed} failed")
+
+    return report
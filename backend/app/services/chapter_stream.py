@@ -0,0 +1,125 @@
+"""Progressive playback of a chapter while its segments are still being generated."""
+
+import asyncio
+import os
+import time
+from typing import AsyncIterator, Optional
+
+from sqlmodel import Session, select
+
+from ..core.config import settings
+from ..core.database import engine
+from ..models.models import Chapter, ChapterStatus, Segment
+from .audio_assembler import iter_mp3_frames, CHAPTER_AUDIO_FILENAME
+
+STREAM_CHUNK = 64 * 1024
+
+
+def _frames_from(path: str, start_time: float = 0.0) -> AsyncIterator[bytes]:
+    """Read MP3 frames from ``path`` starting at ``start_time`` seconds, batched into chunks.
+
+    The file is opened and read in a worker thread, one chunk at a time, so a
+    slow disk never stalls the event loop.
+    """
+
+    async def generate():
+        source = await asyncio.to_thread(open, path, "rb")
+        frames = iter_mp3_frames(source)
+        elapsed = 0.0
+
+        def read_chunk() -> bytes:
+            nonlocal elapsed
+            buffer = bytearray()
+            for frame, duration in frames:
+                if elapsed + duration / 2 < start_time:
+                    elapsed += duration
+                    continue
+                elapsed += duration
+                buffer.extend(frame)
+                if len(buffer) >= STREAM_CHUNK:
+                    break
+            return bytes(buffer)
+
+        try:
+            while True:
+                chunk = await asyncio.to_thread(read_chunk)
+                if not chunk:
+                    return
+                yield chunk
+        finally:
+            source.close()
+
+    return generate()
+
+
+def _load_state(chapter_id: int):
+    with Session(engine) as session:
+        chapter = session.get(Chapter, chapter_id)
+        if not chapter:
+            return None, []
+        segments = session.exec(
+            select(Segment.id, Segment.text, Segment.audio_file, Segment.start_time)
+            .where(Segment.chapter_id == chapter_id)
+            .order_by(Segment.id)
+        ).all()
+        return chapter.status, segments
+
+
+async def stream_chapter_audio(chapter_id: int, poll_interval: Optional[float] = None) -> AsyncIterator[bytes]:
+    """Yield the chapter's audio in segment order, waiting for segments that are not done yet.
+
+    Once a segment's audio file is recorded it is sent frame by frame; when the
+    chapter has already been assembled, the remainder is read from chapter.mp3
+    at the next segment's start time. The stream ends when every segment has
+    been sent or skipped, or after STREAM_IDLE_TIMEOUT seconds without progress.
+    """
+    poll_interval = poll_interval or settings.STREAM_POLL_INTERVAL
+    next_index = 0
+    last_progress = time.monotonic()
+
+    while True:
+        status, segments = await asyncio.to_thread(_load_state, chapter_id)
+        if status is None:
+            return
+        finished = status in (ChapterStatus.COMPLETED, ChapterStatus.FAILED)
+
+        while next_index < len(segments):
+            segment = segments[next_index]
+            audio_file = segment.audio_file
+
+            if audio_file and os.path.basename(audio_file) == CHAPTER_AUDIO_FILENAME and segment.start_time is not None:
+                # Assembly finished mid-stream: the rest of the chapter is in one file
+                # (a restarted generation clears these references before it begins)
+                if await asyncio.to_thread(os.path.exists, audio_file):
+                    async for chunk in _frames_from(audio_file, segment.start_time):
+                        yield chunk
+                return
+
+            if audio_file and await asyncio.to_thread(os.path.exists, audio_file):
+                try:
+                    chunks = _frames_from(audio_file)
+                    first = await chunks.__anext__()
+                except StopAsyncIteration:
+                    first = None
+                except FileNotFoundError:
+                    # Removed by chapter assembly in the meantime; the next poll sees chapter.mp3
+                    break
+                if first:
+                    yield first
+                    async for chunk in chunks:
+                        yield chunk
+            elif segment.text.strip() and not finished:
+                # Not generated yet
+                break
+            # Empty segments are never synthesized; failed ones are skipped once the chapter is done
+
+            next_index += 1
+            last_progress = time.monotonic()
+
+        if finished and next_index >= len(segments):
+            return
+        if time.monotonic() - last_progress > settings.STREAM_IDLE_TIMEOUT:
+            print(f"[WARN] Stream for chapter {chapter_id} idle for {settings.STREAM_IDLE_TIMEOUT}s, closing")
+            return
+
+        await asyncio.sleep(poll_interval)
@@ -0,0 +1,92 @@
+"""Chapter text stored as paragraphs with character offsets.
+
+A chapter's text is its paragraphs joined by newlines, and each Paragraph
+row stores the offset of its first character in that text. Reads of a
+character range only load the paragraphs overlapping it. Chapters parsed
+before paragraphs existed are moved to paragraphs by a migration; until then
+their text is read from ``Chapter.content_text``.
+"""
+
+import hashlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert
+from sqlmodel import Session, select
+
+from ..models.models import Chapter, Paragraph
+
+
+def paragraph_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def split_paragraphs(text: str) -> List[Tuple[int, str]]:
+    """(char offset, text) of each line of ``text``; joining the texts with newlines gives ``text`` back."""
+    paragraphs = []
+    offset = 0
+    for line in text.split("\n"):
+        paragraphs.append((offset, line))
+        offset += len(line) + 1
+    return paragraphs
+
+
+def insert_paragraphs(session: Session, chapter_id: int, text: str) -> int:
+    """Add the paragraphs of ``text`` to the session's transaction; returns how many."""
+    rows = [
+        {"chapter_id": chapter_id, "ordinal": ordinal, "char_offset": offset,
+         "text": paragraph, "text_hash": paragraph_hash(paragraph)}
+        for ordinal, (offset, paragraph) in enumerate(split_paragraphs(text))
+    ]
+    if rows:
+        session.execute(insert(Paragraph), rows)
+    return len(rows)
+
+
+def delete_book_paragraphs(session: Session, book_id: int):
+    chapter_ids = select(Chapter.id).where(Chapter.book_id == book_id)
+    session.exec(delete(Paragraph).where(Paragraph.chapter_id.in_(chapter_ids)))
+
+
+def read_text(session: Session, chapter_id: int, start: int = 0, end: Optional[int] = None) -> str:
+    """Characters ``start`` to ``end`` of a chapter, reading only the paragraphs that overlap them."""
+    query = select(Paragraph.char_offset, Paragraph.text).where(Paragraph.chapter_id == chapter_id)
+    if start > 0:
+        # A paragraph reaching ``start`` also supplies the newline that follows it
+        query = query.where(Paragraph.char_offset + func.length(Paragraph.text) >= start)
+    if end is not None:
+        # A paragraph starting at ``end`` supplies the newline before it
+        query = query.where(Paragraph.char_offset <= end)
+    rows = session.exec(query.order_by(Paragraph.ordinal)).all()
+    if not rows:
+        if _has_paragraphs(session, chapter_id):
+            return ""
+        # Legacy chapter: let the database cut the range out of content_text
+        length = func.length(Chapter.content_text) if end is None else max(0, end - start)
+        text = session.exec(select(func.substr(Chapter.content_text, start + 1, length))
+                            .where(Chapter.id == chapter_id)).first()
+        return text or ""
+    base = rows[0][0]
+    text = "\n".join(paragraph for _, paragraph in rows)
+    return text[max(0, start - base):None if end is None else end - base]
+
+
+def chapter_lengths(session: Session, chapter_ids: Iterable[int]) -> Dict[int, int]:
+    """Length in characters of each chapter, without reading its text."""
+    chapter_ids = list(chapter_ids)
+    if not chapter_ids:
+        return {}
+    lengths = dict(session.exec(
+        select(Paragraph.chapter_id, func.max(Paragraph.char_offset + func.length(Paragraph.text)))
+        .where(Paragraph.chapter_id.in_(chapter_ids))
+        .group_by(Paragraph.chapter_id)
+    ).all())
+    legacy = [chapter_id for chapter_id in chapter_ids if chapter_id not in lengths]
+    if legacy:
+        lengths.update(session.exec(
+            select(Chapter.id, func.length(Chapter.content_text)).where(Chapter.id.in_(legacy))
+        ).all())
+    return lengths
+
+
+def _has_paragraphs(session: Session, chapter_id: int) -> bool:
+    return session.exec(select(Paragraph.id).where(Paragraph.chapter_id == chapter_id).limit(1)).first() is not None
@@ -0,0 +1,153 @@
+"""Merges character records from per-window analyses into one cast per book.
+
+The same character is often reported under several names across windows
+("Harry Potter", "Harry", "Potter", "Mr. Potter"). Names are compared on
+their significant words (lowercased, accents and honorifics removed): a name
+whose words are all part of exactly one other character's name is an alias
+of it. A short name shared by several characters ("Weasley" for "Ron
+Weasley" and "Ginny Weasley") is ambiguous and stays a character of its own.
+
+Traits reported differently by different windows are settled by majority
+vote, ties going to the value that was reported first.
+"""
+
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+TRAIT_FIELDS = ("gender", "age_category", "tone", "voice_quality")
+
+_HONORIFICS = {
+    "mr", "mrs", "ms", "miss", "dr", "sir", "lady", "lord", "professor", "prof", "uncle", "aunt",
+    "m", "mme", "mlle", "monsieur", "madame", "mademoiselle", "professeur", "oncle", "tante",
+    "the", "le", "la", "les",
+}
+
+
+def name_tokens(name: str) -> FrozenSet[str]:
+    """Significant words of a name: "Mr. Potter" -> {"potter"}."""
+    name = unicodedata.normalize("NFKD", name or "")
+    name = "".join(ch for ch in name if not unicodedata.combining(ch)).lower()
+    words = re.findall(r"[\w'-]+", name)
+    significant = [w for w in words if w not in _HONORIFICS]
+    # A bare honorific ("Madame") is still a name
+    return frozenset(significant or words)
+
+
+def is_narrator(name: str) -> bool:
+    return "narrator" in (name or "").lower()
+
+
+@dataclass
+class CharacterRecord:
+    """One character of the merged cast, with every name and trait reported for it."""
+
+    name: str
+    tokens: FrozenSet[str]
+    character_id: Optional[int] = None  # Set for characters already stored for the book
+    names: Counter = field(default_factory=Counter)
+    votes: Dict[str, Counter] = field(default_factory=dict)
+    descriptions: List[str] = field(default_factory=list)
+
+    def add(self, data: Dict):
+        name = str(data.get("name", "")).strip()
+        if name:
+            self.names[name] += 1
+            tokens = name_tokens(name)
+            if len(tokens) > len(self.tokens):
+                self.tokens = tokens
+        for trait in TRAIT_FIELDS:
+            value = data.get(trait)
+            if isinstance(value, str) and value.strip():
+                # Counter keeps insertion order, so ties go to the first value reported
+                self.votes.setdefault(trait, Counter())[value.strip().lower()] += 1
+        description = str(data.get("description") or "").strip()
+        if description and description not in self.descriptions:
+            self.descriptions.append(description)
+
+    def trait(self, trait: str, default: str) -> str:
+        votes = self.votes.get(trait)
+        if not votes:
+            return default
+        if trait == "gender" and len(votes) > 1:
+            # "neutral" usually means the window could not tell
+            votes = Counter({k: v for k, v in votes.items() if k != "neutral"}) or votes
+        return votes.most_common(1)[0][0]
+
+    @property
+    def display_name(self) -> str:
+        """The fullest name the character was reported under (most words, then most frequent)."""
+        if self.character_id is not None or not self.names:
+            return self.name
+        return max(self.names, key=lambda n: (len(name_tokens(n)), self.names[n]))
+
+    @property
+    def description(self) -> str:
+        return max(self.descriptions, key=len) if self.descriptions else ""
+
+
+class CharacterMerger:
+    """Reduces character records into a cast, optionally on top of existing characters."""
+
+    def __init__(self, existing: Iterable[Dict] = ()):
+        self.records: List[CharacterRecord] = []
+        for data in existing:
+            record = CharacterRecord(
+                name=data["name"], tokens=name_tokens(data["name"]), character_id=data.get("id")
+            )
+            record.add(data)
+            self.records.append(record)
+
+    def _find(self, name: str) -> Optional[CharacterRecord]:
+        tokens = name_tokens(name)
+        if not tokens:
+            return None
+        if is_narrator(name):
+            return next((r for r in self.records if is_narrator(r.name)), None)
+
+        exact = [r for r in self.records if r.tokens == tokens]
+        if exact:
+            return exact[0]
+        # "Harry" -> "Harry Potter", or "Harry Potter" -> an existing "Harry"
+        related = [r for r in self.records if tokens < r.tokens or r.tokens < tokens]
+        return related[0] if len(related) == 1 else None
+
+    def add(self, data: Dict) -> CharacterRecord:
+        name = str(data.get("name", "")).strip()
+        record = self._find(name)
+        if record is None:
+            record = CharacterRecord(name=name, tokens=name_tokens(name))
+            self.records.append(record)
+        record.add(data)
+        return record
+
+    def merge(self, analyses: Iterable[Dict]) -> List[CharacterRecord]:
+        """Add the characters of every analysis, full names first so short aliases find them."""
+        characters = [
+            c for analysis in analyses for c in (analysis or {}).get("characters", [])
+            if isinstance(c, dict) and str(c.get("name", "")).strip()
+        ]
+        for data in sorted(characters, key=lambda c: -len(name_tokens(c["name"]))):
+            self.add(data)
+        return self.records
+
+    def new_records(self) -> List[CharacterRecord]:
+        return [r for r in self.records if r.character_id is None]
+
+
+def resolve_character(name: str, characters: List[Dict]) -> Optional[Dict]:
+    """Find the character a speaker name refers to, allowing unambiguous aliases."""
+    if not name or is_narrator(name):
+        return None
+    exact = next((c for c in characters if c["name"].lower() == name.lower()), None)
+    if exact:
+        return exact
+    tokens = name_tokens(name)
+    if not tokens:
+        return None
+    matches = [c for c in characters if tokens == name_tokens(c["name"])]
+    if not matches:
+        matches = [c for c in characters if tokens < name_tokens(c["name"])]
+    return matches[0] if len(matches) == 1 else None
@@ -0,0 +1,121 @@
+"""Content-addressed cover images, normalized into a few fixed sizes and formats."""
+
+import hashlib
+import os
+import re
+import tempfile
+from io import BytesIO
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+from fastapi.staticfiles import StaticFiles
+
+# Variant name -> width in pixels (height follows the aspect ratio; images are never enlarged)
+COVER_SIZES = {"small": 160, "medium": 480, "large": 960}
+COVER_FORMATS = {"webp": ("WEBP", {"quality": 80, "method": 4}),
+                 "jpg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True})}
+# Written last, so its presence means every variant of the cover exists
+DEFAULT_VARIANT = "large.jpg"
+
+_HASH_DIR = re.compile(r"^[0-9a-f]{64}/")
+
+
+class CoverStore:
+    """Keeps each distinct cover once, under ``<cover_dir>/<sha256>/``.
+
+    A cover is decoded once at ingest and saved as ``small``, ``medium`` and
+    ``large`` variants in WebP and JPEG (``<size>.<format>``). The directory
+    name is the hash of the source image, so a variant's URL never changes
+    content and can be cached by clients indefinitely.
+    """
+
+    def __init__(self, cover_dir: str = "data/covers"):
+        self.cover_dir = cover_dir
+        os.makedirs(cover_dir, exist_ok=True)
+
+    def variant_path(self, content_hash: str, variant: str = DEFAULT_VARIANT) -> str:
+        return os.path.join(self.cover_dir, content_hash, variant)
+
+    def store(self, data: bytes) -> str:
+        """Store an encoded image and return the path of its default variant.
+
+        Raises ``ValueError`` if the image cannot be decoded.
+        """
+        content_hash = hashlib.sha256(data).hexdigest()
+        default_path = self.variant_path(content_hash)
+        if os.path.exists(default_path):
+            return default_path
+        try:
+            image = Image.open(BytesIO(data))
+            # JPEG sources are decoded at the smallest scale that still covers the largest variant
+            image.draft("RGB", (max(COVER_SIZES.values()), max(COVER_SIZES.values()) * 4))
+            image = ImageOps.exif_transpose(image)
+            image.load()
+        except UnidentifiedImageError:
+            raise ValueError("Unreadable cover image: unknown image format")
+        except (OSError, Image.DecompressionBombError) as e:
+            raise ValueError(f"Unreadable cover image: {e}")
+        image = _to_rgb(image)
+
+        directory = os.path.join(self.cover_dir, content_hash)
+        os.makedirs(directory, exist_ok=True)
+        variants = [(size, extension) for size in COVER_SIZES for extension in COVER_FORMATS]
+        variants.sort(key=lambda v: f"{v[0]}.{v[1]}" == DEFAULT_VARIANT)
+        for size, extension in variants:
+            width = min(COVER_SIZES[size], image.width)
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            image_format, options = COVER_FORMATS[extension]
+            _save_atomic(resized, os.path.join(directory, f"{size}.{extension}"), image_format, options)
+        return default_path
+
+    def store_file(self, path: str) -> str:
+        with open(path, "rb") as f:
+            return self.store(f.read())
+
+
+def _to_rgb(image: Image.Image) -> Image.Image:
+    if image.mode == "RGB":
+        return image
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        # Transparent areas become white, as they would on the page
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def _save_atomic(image: Image.Image, path: str, image_format: str, options: dict):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            image.save(out, image_format, **options)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def store_cover_file(path: str, cover_dir: str) -> str:
+    """``CoverStore(cover_dir).store_file(path)`` as a picklable call for the CPU pool."""
+    return CoverStore(cover_dir).store_file(path)
+
+
+class CoverFiles(StaticFiles):
+    """Static files for the cover directory with long-lived caching of content-addressed variants.
+
+    ``<sha256>/<variant>`` files never change, so clients may keep them for a
+    year without asking again. Other files (covers stored before variants
+    existed) are revalidated with their ETag on every use.
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        relative = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+        if _HASH_DIR.match(relative):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response
+
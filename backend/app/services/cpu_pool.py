@@ -0,0 +1,56 @@
+"""Process pool for CPU-bound work (EPUB parsing, text splitting) kept off the event loop."""
+
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from ..core.config import settings
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if _pool is None and settings.CPU_POOL_WORKERS > 0:
+        # Spawn keeps children independent of the parent's DB connections and event loop
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.CPU_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def cpu_pool_size() -> int:
+    """How many calls run at once: the pool size, or 1 without a pool."""
+    return max(1, settings.CPU_POOL_WORKERS)
+
+
+async def run_cpu(fn: Callable, *args, **kwargs) -> Any:
+    """Run ``fn(*args, **kwargs)`` in the process pool and return its result.
+
+    ``fn`` and its arguments must be picklable (module-level functions,
+    dataclasses). With CPU_POOL_WORKERS=0 the call runs in a thread instead,
+    which still keeps the event loop responsive but shares the GIL.
+    """
+    global _pool
+    call = functools.partial(fn, *args, **kwargs)
+    pool = _get_pool()
+    if pool is None:
+        return await asyncio.to_thread(call)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, call)
+    except BrokenProcessPool:
+        # A child died (e.g. out of memory); start a fresh pool for the next call
+        if _pool is pool:
+            _pool = None
+        raise
+
+
+def shutdown_cpu_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
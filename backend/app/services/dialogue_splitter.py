@@ -0,0 +1,244 @@
+"""Deterministic split of chapter text into narration and dialogue spans.
+
+Recognized conventions:
+- French guillemets « ... », including quotes continued over several
+  paragraphs (each continuation paragraph opening with « or »)
+- curly “ ... ” and straight " ... " quotes within a paragraph
+- dialogue paragraphs opened by an em/en dash (— Bonjour, dit-il.)
+
+Paragraphs are rebuilt from hard-wrapped lines before any of this applies.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+_DASH_LINE = re.compile(r"^\s*[—–―]\s*")
+_PAIRS = {"«": "»", "“": "”", '"': '"'}
+# Speech verbs used in incises, e.g. "dit Harry", "répondit-elle", "said Ron"
+_SPEECH_VERBS = (
+    r"dit|dis|répondit|répliqua|demanda|s'écria|s’écria|cria|murmura|chuchota|ajouta|lança|souffla|hurla|"
+    r"reprit|continua|commença|poursuivit|grogna|protesta|expliqua|déclara|annonça|interrompit|soupira|"
+    r"said|asked|replied|shouted|whispered|muttered|called|cried|added|answered"
+)
+
+
+@dataclass
+class Span:
+    kind: str  # "narration" or "dialogue"
+    text: str
+    start: int
+    end: int
+
+
+def _find_closer(line: str, start: int, depth: int = 0) -> int:
+    """Index of the quote closing the one open at ``start``, -1 if it stays open.
+
+    Paired quotes nest (« il a crié « non » hier »); straight quotes cannot.
+    ``depth`` counts quotes already open before ``start``.
+    """
+    opener = line[start] if depth == 0 else "«"
+    closer = _PAIRS[opener]
+    if opener == closer:
+        return line.find(closer, start + 1)
+    for i in range(start, len(line)):
+        if line[i] == opener:
+            depth += 1
+        elif line[i] == closer:
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
+
+def _quoted_ranges(line: str) -> List[tuple]:
+    """(start, end) of quoted passages in one paragraph, closing quotes included."""
+    ranges = []
+    i = 0
+    while i < len(line):
+        closer = _PAIRS.get(line[i])
+        if closer is None:
+            i += 1
+            continue
+        end = _find_closer(line, i)
+        if end < 0:
+            # Unclosed: French quotes continue to the end of the paragraph
+            end = len(line) - 1 if line[i] == "«" else -1
+        if end < 0:
+            i += 1
+            continue
+        ranges.append((i, end + 1))
+        i = end + 1
+    return ranges
+
+
+_SENTENCE_END = ".!?…»”\"'’:"
+
+
+def _paragraphs(text: str) -> List[tuple]:
+    """(start, end) of logical paragraphs.
+
+    EPUB text is often hard-wrapped, so a newline only ends a paragraph when
+    the line before it ends a sentence and the next line does not start in
+    lowercase (wrapped dialogue like "— Ass…\nasseyez-vous !" stays together).
+    A dash line always starts a new paragraph.
+    """
+    paragraphs = []
+    start = None
+    previous = ""
+    offset = 0
+    for line in text.split("\n"):
+        line_start = offset
+        offset += len(line) + 1
+        content = line.strip()
+        if not content:
+            if start is not None:
+                paragraphs.append((start, line_start - 1))
+                start = None
+            previous = ""
+            continue
+        new_paragraph = (
+            start is None
+            or _DASH_LINE.match(line)
+            or (previous[-1] in _SENTENCE_END and not content[0].islower())
+        )
+        if new_paragraph:
+            if start is not None:
+                paragraphs.append((start, line_start - 1))
+            start = line_start
+        previous = content
+    if start is not None:
+        paragraphs.append((start, len(text)))
+    return paragraphs
+
+
+def split_dialogue(text: str, max_narration_chars: int = 1500) -> List[Span]:
+    """Split ``text`` into alternating narration and dialogue spans covering all of it.
+
+    Consecutive narration paragraphs are merged up to ``max_narration_chars``
+    so narration stays in long, natural segments.
+    """
+    spans: List[Span] = []
+    in_continued_quote = False
+
+    def add(kind: str, start: int, end: int, continues: bool = False):
+        piece = text[start:end]
+        stripped = piece.strip()
+        if not stripped:
+            return
+        start += len(piece) - len(piece.lstrip())
+        end = start + len(stripped)
+        previous = spans[-1] if spans else None
+        merge_narration = (kind == "narration" and previous and previous.kind == "narration"
+                           and end - previous.start <= max_narration_chars)
+        if merge_narration or (continues and previous and previous.kind == "dialogue"):
+            previous.text = text[previous.start:end]
+            previous.end = end
+        else:
+            spans.append(Span(kind, stripped, start, end))
+
+    for line_start, line_end in _paragraphs(text):
+        line = text[line_start:line_end]
+        content = line.strip()
+
+        if _DASH_LINE.match(line):
+            add("dialogue", line_start, line_start + len(line))
+            in_continued_quote = False
+            continue
+
+        # A quote left open in the previous paragraph and resumed here (French « or »)
+        if in_continued_quote and content[0] in "«»":
+            marker = line.find(content[0])
+            # A « marker opens the continued quote again; after a » it is still open
+            close = _find_closer(line, marker) if content[0] == "«" else _find_closer(line, marker + 1, depth=1)
+            if close < 0:
+                add("dialogue", line_start, line_start + len(line), continues=True)
+                continue
+            add("dialogue", line_start, line_start + close + 1, continues=True)
+            in_continued_quote = False
+            rest_start = close + 1
+        else:
+            in_continued_quote = False
+            rest_start = 0
+
+        cursor = rest_start
+        for start, end in _quoted_ranges(line[rest_start:]):
+            start += rest_start
+            end += rest_start
+            add("narration", line_start + cursor, line_start + start)
+            add("dialogue", line_start + start, line_start + end)
+            cursor = end
+            if line[start] == "«" and _find_closer(line, start) < 0:
+                in_continued_quote = True
+        add("narration", line_start + cursor, line_start + len(line))
+
+    return spans
+
+
+def attribution_excerpts(text: str, quotes: List[Tuple[int, Span]], context_chars: int = 150,
+                         max_quotes: int = 40) -> List[str]:
+    """Excerpts of ``text`` in which each quote to attribute is preceded by ``[#id]``.
+
+    Quotes closer than twice ``context_chars`` share one excerpt, so a run of
+    dialogue is sent once with its surroundings rather than once per quote.
+    """
+    groups: List[List[Tuple[int, Span]]] = []
+    for quote_id, span in quotes:
+        last = groups[-1][-1][1] if groups else None
+        if last and span.start - last.end <= 2 * context_chars and len(groups[-1]) < max_quotes:
+            groups[-1].append((quote_id, span))
+        else:
+            groups.append([(quote_id, span)])
+
+    excerpts = []
+    for group in groups:
+        cursor = max(0, group[0][1].start - context_chars)
+        parts = []
+        for quote_id, span in group:
+            parts.append(text[cursor:span.start])
+            parts.append(f"[#{quote_id}] ")
+            cursor = span.start
+        parts.append(text[cursor:min(len(text), group[-1][1].end + context_chars)])
+        excerpts.append("".join(parts))
+    return excerpts
+
+
+def guess_speaker(text: str, span: Span, character_names: List[str]) -> Optional[str]:
+    """Find the speaker from an incise next to the quote ("dit Harry", "Ron said").
+
+    Returns None when no known character is named close to a speech verb.
+    """
+    if not character_names:
+        return None
+    # Full names plus unambiguous first names ("Harry" for "Harry Potter")
+    by_lower: Dict[str, str] = {name.lower(): name for name in character_names}
+    first_names: Dict[str, List[str]] = {}
+    for name in character_names:
+        first = name.split()[0].lower() if name.split() else ""
+        if len(first) > 2 and first != name.lower():
+            first_names.setdefault(first, []).append(name)
+    for first, owners in first_names.items():
+        if len(owners) == 1 and first not in by_lower:
+            by_lower[first] = owners[0]
+
+    names = sorted(by_lower, key=len, reverse=True)
+    name_pattern = "|".join(re.escape(name) for name in names)
+    patterns = [
+        re.compile(rf"\b(?:{_SPEECH_VERBS})\b[\s-]+(?:\w+\s+)?({name_pattern})\b", re.IGNORECASE),
+        re.compile(rf"\b({name_pattern})\s+(?:\w+\s+)?(?:{_SPEECH_VERBS})\b", re.IGNORECASE),
+    ]
+
+    # The incise inside the quote, then the rest of the sentence after it
+    # ("» demanda Ron."), then the clause introducing it ("Ron dit : «").
+    # A dash line carries its own incise; the lines around it are other turns.
+    windows = [(span.text, False)]
+    if not _DASH_LINE.match(span.text):
+        after = re.split(r"[.!?…—«“]", text[span.end:span.end + 120], maxsplit=1)[0]
+        before = re.split(r"[.!?…»”—]", text[max(0, span.start - 120):span.start])[-1]
+        windows += [(after, False), (before, True)]
+    for window, closest_last in windows:
+        matches = [m for pattern in patterns for m in pattern.finditer(window)]
+        if matches:
+            match = max(matches, key=lambda m: m.start()) if closest_last else min(matches, key=lambda m: m.start())
+            return by_lower.get(match.group(1).lower())
+    return None
@@ -1,9 +1,17 @@
 import ebooklib
 from ebooklib import epub
 from bs4 import BeautifulSoup
+import codecs
 import os
-from typing import List, Tuple, Optional
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+from html.parser import HTMLParser
+from typing import List, Tuple, Optional, Iterator, Dict
+from urllib.parse import unquote
 from dataclasses import dataclass
+from ..core.config import settings
+from .cover_store import CoverStore
 
 @dataclass
 class ParsedChapter:
@@ -18,14 +26,230 @@ class ParsedBook:
     cover_path: Optional[str]
     chapters: List[ParsedChapter]
 
+_NS = {
+    "container": "urn:oasis:names:tc:opendocument:xmlns:container",
+    "opf": "http://www.idpf.org/2007/opf",
+    "dc": "http://purl.org/dc/elements/1.1/",
+}
+_DOCUMENT_TYPES = {"application/xhtml+xml", "text/html"}
+_READ_CHUNK = 64 * 1024
+
+
+def clean_text(text: str) -> str:
+    """Strip lines and drop empty ones, splitting on double spaces left by the markup."""
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return '\n'.join(chunk for chunk in chunks if chunk)
+
+
+class _TextExtractor(HTMLParser):
+    """Collects the text of an (X)HTML document and its first h1/h2 without building a tree."""
+
+    _SKIP = {"script", "style", "head"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self.h1: Optional[str] = None
+        self.h2: Optional[str] = None
+        self._skip_depth = 0
+        self._heading: Optional[str] = None
+        self._heading_parts: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP:
+            self._skip_depth += 1
+        elif tag in ("h1", "h2") and self._heading is None and getattr(self, tag) is None:
+            self._heading = tag
+            self._heading_parts = []
+
+    def handle_startendtag(self, tag, attrs):
+        # Self-closing tags (<br/>, <img/>) have no content to collect or skip
+        pass
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag == self._heading:
+            setattr(self, tag, "".join(self._heading_parts).strip())
+            self._heading = None
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        self.parts.append(data)
+        if self._heading:
+            self._heading_parts.append(data)
+
+    @property
+    def title(self) -> Optional[str]:
+        return self.h1 if self.h1 is not None else self.h2
+
+
+class _EpubPackage:
+    """Manifest, spine and metadata of an EPUB, read from its OPF without loading any item."""
+
+    def __init__(self, zf: zipfile.ZipFile):
+        container = ET.fromstring(zf.read("META-INF/container.xml"))
+        rootfile = container.find(".//container:rootfile", _NS)
+        if rootfile is None:
+            raise ValueError("EPUB container has no rootfile")
+        self.opf_path = rootfile.get("full-path")
+        self.base_dir = posixpath.dirname(self.opf_path)
+        opf = ET.fromstring(zf.read(self.opf_path))
+
+        self.title = self._first_text(opf, "dc:title") or "Unknown Title"
+        self.author = self._first_text(opf, "dc:creator") or "Unknown Author"
+
+        # id -> (zip member, media type, properties)
+        self.manifest: Dict[str, Tuple[str, str, str]] = {}
+        for item in opf.iterfind(".//opf:manifest/opf:item", _NS):
+            href = unquote(item.get("href", "").split("#")[0])
+            self.manifest[item.get("id")] = (
+                posixpath.normpath(posixpath.join(self.base_dir, href)),
+                item.get("media-type", ""),
+                item.get("properties", ""),
+            )
+        self.spine = [ref.get("idref") for ref in opf.iterfind(".//opf:spine/opf:itemref", _NS)]
+        cover_meta = opf.find(".//opf:metadata/opf:meta[@name='cover']", _NS)
+        self.cover_meta_id = cover_meta.get("content") if cover_meta is not None else None
+
+    @staticmethod
+    def _first_text(opf, tag: str) -> Optional[str]:
+        element = opf.find(f".//{tag}", _NS)
+        return element.text.strip() if element is not None and element.text else None
+
+    def documents(self) -> List[str]:
+        """Zip members of the spine's content documents, in reading order."""
+        members = []
+        for idref in self.spine:
+            entry = self.manifest.get(idref)
+            if entry and entry[1] in _DOCUMENT_TYPES and "nav" not in entry[2].split():
+                members.append(entry[0])
+        return members
+
+    def cover(self) -> Optional[str]:
+        images = {i: e for i, e in self.manifest.items() if e[1].startswith("image/")}
+        for item_id in ("cover", self.cover_meta_id):
+            if item_id in images:
+                return images[item_id][0]
+        for member, _, properties in images.values():
+            if "cover-image" in properties.split():
+                return member
+        for member, _, _ in images.values():
+            if "cover" in member.lower():
+                return member
+        return None
+
+
+def _open_package(file_path: str) -> Tuple[zipfile.ZipFile, _EpubPackage]:
+    try:
+        zf = zipfile.ZipFile(file_path)
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Failed to read EPUB file: {e}")
+    try:
+        return zf, _EpubPackage(zf)
+    except (KeyError, ET.ParseError, ValueError) as e:
+        zf.close()
+        raise ValueError(f"Failed to read EPUB file: {e}")
+
+
+def list_documents(file_path: str) -> List[str]:
+    """Zip members of the EPUB's spine documents in reading order."""
+    zf, package = _open_package(file_path)
+    with zf:
+        return package.documents()
+
+
+def extract_document(file_path: str, member: str) -> Tuple[Optional[str], str]:
+    """(title, cleaned text) of one spine document; (None, "") if the member is missing.
+
+    Opens the zip on its own so documents of one book can be parsed in
+    separate processes.
+    """
+    with zipfile.ZipFile(file_path) as zf:
+        try:
+            return EbookParser._extract_document(zf, member)
+        except KeyError:
+            return None, ""
+
+
 class EbookParser:
     def __init__(self, upload_dir: str = "data/uploads", cover_dir: str = "data/covers"):
         self.upload_dir = upload_dir
         self.cover_dir = cover_dir
         os.makedirs(upload_dir, exist_ok=True)
-        os.makedirs(cover_dir, exist_ok=True)
+        self.covers = CoverStore(cover_dir)
+
+    def _store_cover(self, data: bytes, file_path: str) -> Optional[str]:
+        """Store the cover's resized variants; a cover that cannot be decoded is skipped."""
+        try:
+            return self.covers.store(data)
+        except ValueError as e:
+            print(f"[WARN] {os.path.basename(file_path)}: {e}")
+            return None
 
     def parse_epub(self, file_path: str) -> ParsedBook:
+        if settings.EPUB_PARSER_MODE.lower() == "stream":
+            book = self.read_metadata(file_path)
+            book.chapters = list(self.iter_chapters(file_path))
+            return book
+        return self._parse_epub_ebooklib(file_path)
+
+    def read_metadata(self, file_path: str) -> ParsedBook:
+        """Title, author and cover of an EPUB (``chapters`` is left empty), reading only the OPF and the cover."""
+        try:
+            with zipfile.ZipFile(file_path) as zf:
+                package = _EpubPackage(zf)
+                cover_path = None
+                cover_member = package.cover()
+                if cover_member:
+                    if zf.getinfo(cover_member).file_size <= settings.MAX_COVER_SIZE_MB * 1024 * 1024:
+                        cover_data = zf.read(cover_member)
+                    else:
+                        print(f"[WARN] {os.path.basename(file_path)}: cover is larger than {settings.MAX_COVER_SIZE_MB} MB, skipped")
+                        cover_data = None
+                else:
+                    cover_data = None
+        except (zipfile.BadZipFile, KeyError, ET.ParseError, ValueError) as e:
+            raise ValueError(f"Failed to read EPUB file: {e}")
+        if cover_data:
+            cover_path = self._store_cover(cover_data, file_path)
+        return ParsedBook(title=package.title, author=package.author, cover_path=cover_path, chapters=[])
+
+    def iter_chapters(self, file_path: str) -> Iterator[ParsedChapter]:
+        """Yield chapters in spine order, reading one document at a time from the zip."""
+        zf, package = _open_package(file_path)
+        with zf:
+            members = package.documents()
+            position = 1
+            for member in members:
+                try:
+                    chapter_title, text = self._extract_document(zf, member)
+                except KeyError:
+                    # Spine entry pointing at a missing file
+                    continue
+                if len(text) > 100: # Filter out very short "chapters" like empty pages or just titles
+                    yield ParsedChapter(
+                        title=chapter_title or f"Chapter {position}",
+                        content=text,
+                        position=position
+                    )
+                    position += 1
+
+    @staticmethod
+    def _extract_document(zf: zipfile.ZipFile, member: str) -> Tuple[Optional[str], str]:
+        """Stream one spine document through the text extractor; returns (title, cleaned text)."""
+        extractor = _TextExtractor()
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        with zf.open(member) as f:
+            while chunk := f.read(_READ_CHUNK):
+                extractor.feed(decoder.decode(chunk))
+        extractor.feed(decoder.decode(b"", final=True))
+        extractor.close()
+        return extractor.title, clean_text("".join(extractor.parts))
+
+    def _parse_epub_ebooklib(self, file_path: str) -> ParsedBook:
         try:
             book = epub.read_epub(file_path)
         except Exception as e:
@@ -33,7 +257,7 @@ class EbookParser:
 
         title = book.get_metadata('DC', 'title')[0][0] if book.get_metadata('DC', 'title') else "Unknown Title"
         author = book.get_metadata('DC', 'creator')[0][0] if book.get_metadata('DC', 'creator') else "Unknown Author"
-        
+
         # Extract Cover
         cover_path = None
         cover_item = book.get_item_with_id('cover')
@@ -43,32 +267,23 @@ class EbookParser:
                 if item.get_type() == ebooklib.ITEM_IMAGE and 'cover' in item.get_name().lower():
                     cover_item = item
                     break
-        
+
         if cover_item:
-            cover_filename = f"{os.path.basename(file_path).replace('.epub', '')}_cover.jpg"
-            cover_path = os.path.join(self.cover_dir, cover_filename)
-            with open(cover_path, 'wb') as f:
-                f.write(cover_item.get_content())
+            cover_path = self._store_cover(cover_item.get_content(), file_path)
 
         # Extract Chapters
         chapters = []
         position = 1
-        
-        # Iterate over spine to get chapters in order
-        for item in book.get_items_of_type(ebooklib.ITEM_DOCUMENT):
-            # Basic filtering to skip nav, toc, etc. if possible, but spine is better order.
-            # Using spine is more reliable for reading order.
-            pass
 
-        # Better approach: Use spine
+        # Iterate over spine to get chapters in order
         for item_id in book.spine:
             item = book.get_item_with_id(item_id[0])
             if not item:
                 continue
-            
+
             if item.get_type() == ebooklib.ITEM_DOCUMENT:
                 soup = BeautifulSoup(item.get_content(), 'html.parser')
-                
+
                 # Try to find a title
                 chapter_title = f"Chapter {position}"
                 h1 = soup.find('h1')
@@ -76,19 +291,14 @@ class EbookParser:
                     chapter_title = h1.get_text().strip()
                 elif soup.find('h2'):
                     chapter_title = soup.find('h2').get_text().strip()
-                
+
                 # Extract text
                 # Remove script and style elements
                 for script in soup(["script", "style"]):
                     script.extract()
-                
-                text = soup.get_text()
-                
-                # Clean text (basic)
-                lines = (line.strip() for line in text.splitlines())
-                chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-                text = '\n'.join(chunk for chunk in chunks if chunk)
-                
+
+                text = clean_text(soup.get_text())
+
                 if len(text) > 100: # Filter out very short "chapters" like empty pages or just titles
                     chapters.append(ParsedChapter(
                         title=chapter_title,
@@ -0,0 +1,354 @@
+"""Persistent job queue for generation work, with leases and retries."""
+
+import asyncio
+import os
+import socket
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import and_, or_, update
+from sqlmodel import Session, select
+
+from ..core.config import settings
+from ..core.database import engine
+from ..models.models import Job, JobKind, JobStatus, Worker, WorkerStatus
+
+
+def make_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class JobQueue:
+    """Jobs table operations.
+
+    A job is claimed by atomically moving it to RUNNING with a lease. The
+    owner renews the lease while it works; a job whose lease expired (its
+    worker died or was restarted) becomes claimable again and is picked up
+    by the next worker, up to ``max_attempts`` claims.
+    """
+
+    def __init__(self, lease_seconds: Optional[int] = None):
+        self.lease_seconds = lease_seconds or settings.JOB_LEASE_SECONDS
+
+    def enqueue(
+        self,
+        kind: JobKind,
+        book_id: Optional[int] = None,
+        chapter_id: Optional[int] = None,
+        payload: Optional[Dict[str, Any]] = None,
+    ) -> Job:
+        with Session(engine) as session:
+            job = Job(
+                kind=kind,
+                book_id=book_id,
+                chapter_id=chapter_id,
+                payload=payload or {},
+                max_attempts=settings.JOB_MAX_ATTEMPTS,
+            )
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+            return job
+
+    @staticmethod
+    def _claimable(now: datetime):
+        expired = and_(Job.status == JobStatus.RUNNING, Job.lease_expires_at < now)
+        return and_(
+            or_(Job.status == JobStatus.QUEUED, expired),
+            Job.available_at <= now,
+            Job.attempts < Job.max_attempts,
+        )
+
+    def claim(self, owner: str) -> Optional[Job]:
+        """Claim the oldest runnable job for ``owner``, or return None."""
+        with Session(engine) as session:
+            for _ in range(5):
+                now = datetime.utcnow()
+                candidate = session.exec(
+                    select(Job.id).where(self._claimable(now)).order_by(Job.id).limit(1)
+                ).first()
+                if candidate is None:
+                    return None
+
+                # The WHERE clause is re-checked by the UPDATE itself, so only one worker wins
+                result = session.execute(
+                    update(Job)
+                    .where(Job.id == candidate, self._claimable(now))
+                    .values(
+                        status=JobStatus.RUNNING,
+                        lease_owner=owner,
+                        lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                        attempts=Job.attempts + 1,
+                        claims=Job.claims + 1,
+                        updated_at=now,
+                    )
+                )
+                session.commit()
+                if result.rowcount == 1:
+                    return session.get(Job, candidate)
+        return None
+
+    def _update_owned(self, job_id: int, owner: str, **values) -> bool:
+        values["updated_at"] = datetime.utcnow()
+        with Session(engine) as session:
+            result = session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.lease_owner == owner, Job.status == JobStatus.RUNNING)
+                .values(**values)
+            )
+            session.commit()
+            return result.rowcount == 1
+
+    def renew_lease(self, job_id: int, owner: str) -> bool:
+        """Extend the lease; False means the job was lost to another worker."""
+        expires = datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+        return self._update_owned(job_id, owner, lease_expires_at=expires)
+
+    def save_checkpoint(self, job_id: int, owner: str, checkpoint: Dict[str, Any]) -> bool:
+        return self._update_owned(job_id, owner, checkpoint=dict(checkpoint))
+
+    def complete(self, job_id: int, owner: str) -> bool:
+        return self._update_owned(
+            job_id, owner, status=JobStatus.COMPLETED, lease_owner=None, lease_expires_at=None, last_error=None
+        )
+
+    def fail(self, job_id: int, owner: str, error: str) -> bool:
+        """Record a failure; the job is re-queued with backoff until it runs out of attempts."""
+        with Session(engine) as session:
+            job = session.get(Job, job_id)
+            if not job or job.lease_owner != owner:
+                return False
+            retry = job.attempts < job.max_attempts
+            delay = settings.JOB_RETRY_BACKOFF_SECONDS * (2 ** max(0, job.attempts - 1))
+
+        return self._update_owned(
+            job_id,
+            owner,
+            status=JobStatus.QUEUED if retry else JobStatus.FAILED,
+            available_at=datetime.utcnow() + timedelta(seconds=delay),
+            lease_owner=None,
+            lease_expires_at=None,
+            last_error=error[-2000:],
+        )
+
+    def release(self, job_id: int, owner: str) -> bool:
+        """Hand a job back without counting the attempt (worker shutdown).
+
+        ``claims`` is kept, so the next claim still resumes from the checkpoint.
+        """
+        return self._update_owned(
+            job_id,
+            owner,
+            status=JobStatus.QUEUED,
+            attempts=Job.attempts - 1,
+            lease_owner=None,
+            lease_expires_at=None,
+        )
+
+    def reap_expired(self) -> int:
+        """Fail jobs whose lease expired after their last allowed attempt."""
+        now = datetime.utcnow()
+        with Session(engine) as session:
+            result = session.execute(
+                update(Job)
+                .where(
+                    Job.status == JobStatus.RUNNING,
+                    Job.lease_expires_at < now,
+                    Job.attempts >= Job.max_attempts,
+                )
+                .values(
+                    status=JobStatus.FAILED,
+                    lease_owner=None,
+                    lease_expires_at=None,
+                    last_error="Lease expired on final attempt",
+                    updated_at=now,
+                )
+            )
+            session.commit()
+            return result.rowcount
+
+    def register_worker(self, owner: str, concurrency: int):
+        with Session(engine) as session:
+            session.merge(Worker(id=owner, hostname=socket.gethostname(), pid=os.getpid(), concurrency=concurrency))
+            session.commit()
+
+    def worker_heartbeat(self, owner: str):
+        with Session(engine) as session:
+            session.execute(
+                update(Worker)
+                .where(Worker.id == owner)
+                .values(last_heartbeat=datetime.utcnow(), status=WorkerStatus.ACTIVE)
+            )
+            session.commit()
+
+    def unregister_worker(self, owner: str):
+        with Session(engine) as session:
+            session.execute(update(Worker).where(Worker.id == owner).values(status=WorkerStatus.STOPPED))
+            session.commit()
+
+    def requeue_dead_workers(self, dead_after: float) -> int:
+        """Mark workers without a recent heartbeat dead and put their jobs back in the queue.
+
+        This recovers work as soon as a worker is known to be gone instead of
+        waiting for each job's lease to run out.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=dead_after)
+        with Session(engine) as session:
+            dead = session.exec(
+                select(Worker.id).where(Worker.status == WorkerStatus.ACTIVE, Worker.last_heartbeat < cutoff)
+            ).all()
+            if not dead:
+                return 0
+
+            session.execute(update(Worker).where(Worker.id.in_(dead)).values(status=WorkerStatus.DEAD))
+            orphaned = (Job.status == JobStatus.RUNNING) & Job.lease_owner.in_(dead)
+            requeued = session.execute(
+                update(Job)
+                .where(orphaned, Job.attempts < Job.max_attempts)
+                .values(status=JobStatus.QUEUED, lease_owner=None, lease_expires_at=None,
+                        last_error="Worker stopped responding", updated_at=datetime.utcnow())
+            ).rowcount
+            session.execute(
+                update(Job)
+                .where(orphaned)
+                .values(status=JobStatus.FAILED, lease_owner=None, lease_expires_at=None,
+                        last_error="Worker stopped responding on final attempt", updated_at=datetime.utcnow())
+            )
+            session.commit()
+
+        print(f"[WARN] Workers {', '.join(dead)} stopped responding; re-queued {requeued} job(s)")
+        return requeued
+
+    def cancel_for_book(self, book_id: int) -> int:
+        """Fail every queued or running job of a book, e.g. when the book is deleted.
+
+        Running jobs lose their lease, so their worker's next ``renew_lease``
+        returns False and it cancels the job.
+        """
+        with Session(engine) as session:
+            result = session.execute(
+                update(Job)
+                .where(Job.book_id == book_id, Job.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]))
+                .values(status=JobStatus.FAILED, lease_owner=None, lease_expires_at=None,
+                        last_error="Book deleted", updated_at=datetime.utcnow())
+            )
+            session.commit()
+            return result.rowcount
+
+
+class JobCheckpoint:
+    """Per-job progress markers the orchestrator can persist and read back on retry."""
+
+    def __init__(self, queue: JobQueue, job: Job, owner: str):
+        self.queue = queue
+        self.job_id = job.id
+        self.owner = owner
+        self.data: Dict[str, Any] = dict(job.checkpoint or {})
+        # A job claimed more than once was interrupted before (crash, retry or
+        # release on shutdown): skip finished work
+        self.resuming = job.claims > 1
+
+    def get(self, key: str, default=None):
+        return self.data.get(key, default)
+
+    def save(self, **updates):
+        self.data.update(updates)
+        self.queue.save_checkpoint(self.job_id, self.owner, self.data)
+
+
+class JobRunner:
+    """Claims jobs from the queue and executes them with the Orchestrator."""
+
+    def __init__(self, llm_service, tts_service, queue: Optional[JobQueue] = None,
+                 owner: Optional[str] = None, concurrency: Optional[int] = None):
+        from .orchestrator import Orchestrator
+
+        self.orchestrator = Orchestrator()
+        self.llm_service = llm_service
+        self.tts_service = tts_service
+        self.queue = queue or JobQueue()
+        self.owner = owner or make_worker_id()
+        self.concurrency = max(1, concurrency or settings.JOB_WORKER_CONCURRENCY)
+        self._task: Optional[asyncio.Task] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._running: Dict[int, asyncio.Task] = {}
+
+    async def start(self):
+        self.queue.register_worker(self.owner, self.concurrency)
+        self._task = asyncio.create_task(self.run_forever())
+        self._heartbeat_task = asyncio.create_task(self._worker_heartbeat())
+        print(f"Job runner {self.owner} started (concurrency={self.concurrency})")
+
+    async def stop(self):
+        for task in (self._task, self._heartbeat_task):
+            if task:
+                task.cancel()
+        jobs = list(self._running.values())
+        for task in jobs:
+            task.cancel()
+        await asyncio.gather(*jobs, return_exceptions=True)
+        await asyncio.gather(*(t for t in (self._task, self._heartbeat_task) if t), return_exceptions=True)
+        self.queue.unregister_worker(self.owner)
+
+    async def wait(self):
+        """Block until the runner stops."""
+        await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _worker_heartbeat(self):
+        while True:
+            try:
+                self.queue.worker_heartbeat(self.owner)
+                # Every live worker also watches for dead ones
+                self.queue.requeue_dead_workers(settings.WORKER_DEAD_AFTER_SECONDS)
+            except Exception as e:
+                print(f"[ERROR] Worker heartbeat failed: {e}")
+            await asyncio.sleep(settings.WORKER_HEARTBEAT_SECONDS)
+
+    async def run_forever(self):
+        slots = asyncio.Semaphore(self.concurrency)
+        while True:
+            await slots.acquire()
+            try:
+                self.queue.reap_expired()
+                job = self.queue.claim(self.owner)
+            except Exception as e:
+                print(f"[ERROR] Job claim failed: {e}")
+                job = None
+
+            if job is None:
+                slots.release()
+                await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+                continue
+
+            task = asyncio.create_task(self._execute(job))
+            self._running[job.id] = task
+            task.add_done_callback(lambda _, job_id=job.id: (self._running.pop(job_id, None), slots.release()))
+
+    async def _heartbeat(self, job_id: int, job_task: asyncio.Task):
+        interval = max(1.0, self.queue.lease_seconds / 3)
+        while True:
+            await asyncio.sleep(interval)
+            if not self.queue.renew_lease(job_id, self.owner):
+                print(f"[WARN] Lost lease on job {job_id} (cancelled or taken over), stopping it")
+                job_task.cancel()
+                return
+
+    async def _execute(self, job: Job):
+        print(f"Running job {job.id} ({job.kind.value}, attempt {job.attempts}/{job.max_attempts})")
+        checkpoint = JobCheckpoint(self.queue, job, self.owner)
+        heartbeat = asyncio.create_task(self._heartbeat(job.id, asyncio.current_task()))
+        try:
+            await self.orchestrator.run_job(job, self.llm_service, self.tts_service, checkpoint)
+            self.queue.complete(job.id, self.owner)
+            print(f"Job {job.id} completed")
+        except asyncio.CancelledError:
+            self.queue.release(job.id, self.owner)
+            raise
+        except Exception as e:
+            print(f"[ERROR] Job {job.id} failed: {e}")
+            traceback.print_exc()
+            self.queue.fail(job.id, self.owner, f"{type(e).__name__}: {e}")
+        finally:
+            heartbeat.cancel()
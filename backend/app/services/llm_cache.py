@@ -0,0 +1,133 @@
+"""SQLite-backed cache of LLM responses."""
+
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from .audio_cache import normalize_text
+
+# Set while a caller wants fresh responses (e.g. a re-analysis with refresh=true);
+# lookups are skipped but new responses still replace the cached ones.
+_bypass = contextvars.ContextVar("llm_cache_bypass", default=False)
+
+
+@contextmanager
+def bypass_llm_cache():
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+class LLMResponseCache:
+    """Stores JSON responses keyed by (adapter, model, prompt version, method, input).
+
+    Entries older than ``ttl_seconds`` are ignored and purged; beyond
+    ``max_entries`` the least recently used ones are deleted. The cache lives
+    in its own SQLite file so it survives re-creating the application
+    database and can be shared by every worker process.
+    """
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None, max_entries: int = 10000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds or None
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS llm_response (
+                key TEXT PRIMARY KEY,
+                adapter TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                method TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_response_last_used ON llm_response (last_used)")
+        self._conn.commit()
+        self._evict()
+
+    @staticmethod
+    def make_key(adapter: str, model: str, prompt_version: str, method: str, text: str, context: Any = None) -> str:
+        """Key for one call; ``context`` holds other prompt inputs (e.g. the character list)."""
+        text_hash = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        context_json = json.dumps(context, sort_keys=True, ensure_ascii=False, default=str)
+        payload = "\x1f".join([adapter, model, prompt_version, method, text_hash, context_json])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        if _bypass.get():
+            self.bypassed += 1
+            return None
+
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM llm_response WHERE key = ?", (key,)).fetchone()
+            if row and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_response WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_response SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, adapter: str, model: str, prompt_version: str, method: str, response: Any):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_response VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, adapter, model, prompt_version, method, json.dumps(response, ensure_ascii=False), now, now),
+            )
+            self._conn.commit()
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            if self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_response WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            self._conn.execute(
+                """DELETE FROM llm_response WHERE key IN (
+                    SELECT key FROM llm_response ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self) -> int:
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM llm_response").rowcount
+            self._conn.commit()
+        return deleted
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_response").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": (self.hits / lookups) if lookups else None,
+        }
@@ -0,0 +1,296 @@
+"""Rate and concurrency scheduling for LLM provider calls.
+
+Request and token budgets are rows of the ``ratebudget`` table, so the API
+process, its embedded runner and every standalone worker spend from the
+same provider quota. Concurrency is adapted per process.
+"""
+
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.engine import Connection, Engine
+
+from ..core.config import settings
+from ..core.database import engine as default_engine
+from ..models.models import RateBudget
+
+try:
+    from google.api_core.exceptions import ResourceExhausted, TooManyRequests, ServiceUnavailable
+    _THROTTLED = (ResourceExhausted, TooManyRequests, ServiceUnavailable)
+except ImportError:
+    _THROTTLED = ()
+
+
+class LLMRateLimitError(Exception):
+    """The provider kept throttling a call after every retry.
+
+    Adapters let it propagate instead of returning their fallback, so the job
+    fails and is retried later rather than producing a Narrator-only result.
+    """
+
+
+def is_throttled(error: BaseException) -> bool:
+    """True when the provider refused the call because of load or quota (HTTP 429/503)."""
+    if _THROTTLED and isinstance(error, _THROTTLED):
+        return True
+    return getattr(error, "code", None) in (429, 503) or getattr(error, "status", None) in (429, 503)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token, a bit less for French prose)."""
+    return len(text) // 4 + 1
+
+
+class TokenBucket:
+    """Refills ``rate_per_minute`` units per minute, holding at most a minute's worth.
+
+    The level lives in the ``ratebudget`` row ``key``; every method works on
+    the caller's connection, so several buckets can be updated in one
+    transaction. Refills use wall-clock time, since processes share it.
+    """
+
+    def __init__(self, key: str, rate_per_minute: float):
+        self.key = key
+        self.capacity = max(1.0, float(rate_per_minute))
+
+    def _refilled(self, now: float):
+        elapsed = func.max(0.0, now - RateBudget.updated_at)
+        return func.min(self.capacity, RateBudget.level + elapsed * self.capacity / 60.0)
+
+    def _update(self, conn: Connection, level, *conditions) -> bool:
+        now = time.time()
+        result = conn.execute(
+            update(RateBudget)
+            .where(RateBudget.key == self.key, *[condition(self._refilled(now)) for condition in conditions])
+            .values(level=level(self._refilled(now)), updated_at=now)
+        )
+        return result.rowcount == 1
+
+    def create(self, conn: Connection):
+        """Add the row with a full bucket unless it exists."""
+        conn.execute(insert(RateBudget).prefix_with("OR IGNORE")
+                     .values(key=self.key, level=self.capacity, updated_at=time.time()))
+
+    def level(self, conn: Connection) -> float:
+        """Units available now."""
+        now = time.time()
+        row = conn.execute(select(RateBudget.level, RateBudget.updated_at).where(RateBudget.key == self.key)).first()
+        if row is None:
+            return self.capacity
+        level, updated_at = row
+        return min(self.capacity, level + max(0.0, now - updated_at) * self.capacity / 60.0)
+
+    def wait_time(self, conn: Connection, amount: float) -> float:
+        """Seconds until ``amount`` units are available (requests above capacity wait for a full bucket)."""
+        missing = min(amount, self.capacity) - self.level(conn)
+        return max(0.0, missing * 60.0 / self.capacity)
+
+    def take(self, conn: Connection, amount: float) -> bool:
+        """Consume ``amount`` units if they are available now."""
+        needed = min(amount, self.capacity)
+        return self._update(conn, lambda level: level - amount, lambda level: level >= needed)
+
+    def consume(self, conn: Connection, amount: float):
+        # May go negative when actual usage exceeds the estimate; later calls wait it off
+        self._update(conn, lambda level: level - amount)
+
+    def drain(self, conn: Connection):
+        """Empty the bucket (the provider said we are over quota)."""
+        self._update(conn, lambda level: func.min(level, 0.0))
+
+
+class LLMScheduler:
+    """Paces calls to one LLM provider under request and token budgets.
+
+    Each call waits for a concurrency slot, then for its share of the
+    requests-per-minute and tokens-per-minute buckets, using an estimate of
+    the prompt and expected output tokens; the token bucket is corrected
+    with the usage reported by the provider. The buckets are shared through
+    the database by every scheduler with the same ``name``, in any process.
+    Concurrency adapts like TCP congestion control: it grows by one slot
+    per round of fast successful calls and is halved when the provider
+    throttles (429/503) or latency climbs far above ``target_latency``.
+    Throttled calls are retried with jittered backoff.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        max_concurrency: int,
+        min_concurrency: int = 1,
+        target_latency: float = 20.0,
+        max_retries: int = 6,
+        base_delay: float = 2.0,
+        max_delay: float = 60.0,
+        engine: Optional[Engine] = None,
+    ):
+        self.name = name
+        self.engine = engine or default_engine
+        self.requests = TokenBucket(f"{name.lower()}:requests", requests_per_minute)
+        self.tokens = TokenBucket(f"{name.lower()}:tokens", tokens_per_minute)
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.limit = float(self.min_concurrency)
+        self.target_latency = target_latency
+        self.max_retries = max(0, max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.in_flight = 0
+        self.calls = 0
+        self.throttled = 0
+        self.latency: Optional[float] = None  # Moving average of successful calls
+        self._last_decrease = 0.0
+        self._slots: Optional[asyncio.Condition] = None
+        self._budget: Optional[asyncio.Lock] = None
+
+    def _primitives(self):
+        # Created inside the running loop, like the synthesis limiter
+        if self._slots is None:
+            self._slots = asyncio.Condition()
+            self._budget = asyncio.Lock()
+        return self._slots, self._budget
+
+    async def _acquire(self, estimated_tokens: int):
+        slots, budget = self._primitives()
+        async with slots:
+            await slots.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            # One waiter at a time so this process's calls are served in arrival order
+            async with budget:
+                while True:
+                    wait = await asyncio.to_thread(self._take, estimated_tokens)
+                    if wait is None:
+                        break
+                    await asyncio.sleep(wait)
+        except BaseException:
+            await self._release()
+            raise
+
+    def _take(self, estimated_tokens: int) -> Optional[float]:
+        """Take a request and ``estimated_tokens`` together; otherwise return how long to wait for both."""
+        with self.engine.connect() as conn:
+            # Writes only: a transaction that read before writing could deadlock with another process
+            with conn.begin() as transaction:
+                self.requests.create(conn)
+                self.tokens.create(conn)
+                if self.requests.take(conn, 1) and self.tokens.take(conn, estimated_tokens):
+                    return None
+                transaction.rollback()
+            # 0 when another process has just refilled it; the caller then tries again
+            return max(self.requests.wait_time(conn, 1), self.tokens.wait_time(conn, estimated_tokens))
+
+    def _budget_update(self, change: Callable[[Connection], None]):
+        with self.engine.begin() as conn:
+            change(conn)
+
+    def _levels(self) -> Tuple[float, float]:
+        with self.engine.begin() as conn:
+            return self.requests.level(conn), self.tokens.level(conn)
+
+    async def _release(self):
+        slots, _ = self._primitives()
+        async with slots:
+            self.in_flight -= 1
+            slots.notify_all()
+
+    def _decrease(self, reason: str):
+        now = time.monotonic()
+        # Concurrent calls see the same overload; react to it once per round trip
+        if now - self._last_decrease < (self.latency or 1.0):
+            return
+        self._last_decrease = now
+        previous = self.limit
+        self.limit = max(float(self.min_concurrency), self.limit / 2)
+        if int(self.limit) != int(previous):
+            print(f"[LLM] {self.name}: {reason}, concurrency {int(previous)} -> {int(self.limit)}")
+
+    def _on_success(self, latency: float):
+        self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+        if latency > 2 * self.target_latency:
+            self._decrease(f"slow responses ({latency:.1f}s)")
+        elif latency <= self.target_latency and self.limit < self.max_concurrency:
+            self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(self.base_delay / 2, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[Any]],
+        prompt: str,
+        expected_output_tokens: int = 0,
+        usage: Optional[Callable[[Any], Optional[int]]] = None,
+    ) -> Any:
+        """Run ``call`` within the budgets; ``usage`` reads the tokens actually used from its result."""
+        estimated = estimate_tokens(prompt) + expected_output_tokens
+        for attempt in range(1, self.max_retries + 2):
+            await self._acquire(estimated)
+            started = time.monotonic()
+            try:
+                result = await call()
+            except Exception as e:
+                await self._release()
+                if not is_throttled(e):
+                    raise
+                self.throttled += 1
+                await asyncio.to_thread(self._budget_update, self.requests.drain)
+                self._decrease("throttled by provider")
+                if attempt > self.max_retries:
+                    raise LLMRateLimitError(f"{self.name} still throttling after {attempt} attempts: {e}") from e
+                delay = self._backoff(attempt)
+                print(f"[WARN] {self.name} throttled (attempt {attempt}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                await self._release()
+                raise
+
+            await self._release()
+            self.calls += 1
+            self._on_success(time.monotonic() - started)
+            actual = usage(result) if usage else None
+            if actual:
+                await asyncio.to_thread(self._budget_update, lambda conn: self.tokens.consume(conn, actual - estimated))
+            return result
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        requests_available, tokens_available = self._levels()
+        return {
+            "name": self.name,
+            "concurrency_limit": int(self.limit),
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "requests_available": round(requests_available, 1),
+            "tokens_available": round(tokens_available),
+            "calls": self.calls,
+            "throttled": self.throttled,
+            "avg_latency": round(self.latency, 2) if self.latency is not None else None,
+        }
+
+
+_schedulers: Dict[str, LLMScheduler] = {}
+
+
+def get_llm_scheduler(provider: str) -> LLMScheduler:
+    """Return the process-wide scheduler for ``provider``; its budgets are shared with other processes too."""
+    scheduler = _schedulers.get(provider)
+    if scheduler is None:
+        if provider == "gemini":
+            scheduler = LLMScheduler(
+                "Gemini",
+                requests_per_minute=settings.GEMINI_REQUESTS_PER_MINUTE,
+                tokens_per_minute=settings.GEMINI_TOKENS_PER_MINUTE,
+                max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+                target_latency=settings.GEMINI_TARGET_LATENCY,
+                max_retries=settings.GEMINI_RATE_LIMIT_RETRIES,
+            )
+        else:
+            raise ValueError(f"No LLM scheduler configured for {provider}")
+        _schedulers[provider] = scheduler
+    return scheduler
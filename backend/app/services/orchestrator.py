@@ -1,21 +1,38 @@
-from fastapi import UploadFile, BackgroundTasks
 from sqlmodel import Session, select
-import shutil
+from sqlalchemy import update, delete
+import asyncio
 import os
-from typing import List
-from ..models.models import Book, Chapter, BookStatus, ChapterStatus, Character, Segment
-from .ebook_parser import EbookParser
+import time
+from collections import deque
+from typing import List, Optional
+from ..models.models import Book, Chapter, BookStatus, ChapterStatus, Character, Segment, Job, JobKind, UploadedFile
+from .ebook_parser import EbookParser, ParsedChapter, list_documents, extract_document
+from .cpu_pool import run_cpu, cpu_pool_size
+from .upload_store import MultipartFile, UploadStore, StoredUpload
+from .bulk_import import BulkImporter, ImportProgress
+from .synthesis_limiter import get_synthesis_limiter
+from .audio_assembler import assemble_chapter, CHAPTER_AUDIO_FILENAME
+from .progress_writer import ProgressWriter
+from .text_chunker import split_text
+from .role_windows import make_windows, stitch_windows
+from .llm_cache import bypass_llm_cache
+from .llm_scheduler import LLMRateLimitError
+from .dialogue_splitter import split_dialogue, guess_speaker, attribution_excerpts
+from .character_merge import CharacterMerger, is_narrator, resolve_character
+from .chapter_text import delete_book_paragraphs, insert_paragraphs, read_text
 from ..core.database import engine
+from ..core.config import settings
 
 class Orchestrator:
     def __init__(self):
         self.parser = EbookParser()
+        self.uploads = UploadStore(self.parser.upload_dir, settings.PARSED_CACHE_DIR)
 
-    async def process_upload(self, file: UploadFile) -> tuple[Book, str]:
-        # 1. Save file
-        file_path = os.path.join(self.parser.upload_dir, file.filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+    async def process_upload(self, file: MultipartFile) -> tuple[Book, StoredUpload]:
+        # 1. Stream the file to disk under its content hash (a re-upload of the same EPUB is stored once)
+        stored = await self.uploads.save_upload(file, max_size=settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024)
+        if stored.already_stored:
+            print(f"Upload {file.filename} matches stored EPUB {stored.content_hash[:12]}")
             
         # 2. Create Initial Book Record
         with Session(engine) as session:
@@ -23,86 +40,377 @@ class Orchestrator:
             session.add(book)
             session.commit()
             session.refresh(book)
+            session.add(UploadedFile(
+                book_id=book.id,
+                content_hash=stored.content_hash,
+                file_path=stored.file_path,
+                original_filename=file.filename,
+                size=stored.size
+            ))
+            session.commit()
+            session.refresh(book)
             
-            # 3. Queue Pipeline Task
-            # We don't queue parse here anymore if we are using the new pipeline methods
-            # But for backward compatibility or simple upload, we might.
-            # actually, let's make process_upload JUST save the file and DB record.
-            # The caller will decide what to do next.
-            
-            return book, file_path
+            # The caller decides what to queue next
+            return book, stored
 
-    async def process_upload_and_analyze(self, file: UploadFile, background_tasks: BackgroundTasks, llm_service) -> Book:
-        book, file_path = await self.process_upload(file)
-        # Chain analysis only (tts_service=None)
-        background_tasks.add_task(self._run_pipeline, book.id, file_path, llm_service, None)
+    async def process_upload_and_analyze(self, file: MultipartFile, reuse_analysis: bool = True) -> Book:
+        book, stored = await self.process_upload(file)
+        # Chain analysis only
+        self._job_queue().enqueue(JobKind.PIPELINE, book_id=book.id, payload={
+            "file_path": stored.file_path, "generate": False,
+            "content_hash": stored.content_hash, "reuse_analysis": reuse_analysis
+        })
         return book
 
-    async def process_upload_and_generate(self, file: UploadFile, background_tasks: BackgroundTasks, llm_service, tts_service) -> Book:
-        book, file_path = await self.process_upload(file)
+    async def process_upload_and_generate(self, file: MultipartFile, reuse_analysis: bool = True) -> Book:
+        book, stored = await self.process_upload(file)
         # Chain full process
-        background_tasks.add_task(self._run_pipeline, book.id, file_path, llm_service, tts_service)
+        self._job_queue().enqueue(JobKind.PIPELINE, book_id=book.id, payload={
+            "file_path": stored.file_path, "generate": True,
+            "content_hash": stored.content_hash, "reuse_analysis": reuse_analysis
+        })
         return book
 
+    @staticmethod
+    def _job_queue():
+        from .job_queue import JobQueue
+        return JobQueue()
+
+    async def run_job(self, job: Job, llm_service, tts_service, checkpoint=None):
+        """Execute a queued job. Raises on failure so the queue can retry it."""
+        resuming = checkpoint is not None and checkpoint.resuming
+
+        if job.payload.get("refresh"):
+            # Re-run requested explicitly: ask the LLM again instead of reusing cached responses
+            with bypass_llm_cache():
+                return await self._run_job_kind(job, llm_service, tts_service, checkpoint, resuming)
+        return await self._run_job_kind(job, llm_service, tts_service, checkpoint, resuming)
+
+    async def _run_job_kind(self, job: Job, llm_service, tts_service, checkpoint, resuming: bool):
+        if job.kind == JobKind.PIPELINE:
+            generate = job.payload.get("generate", False)
+            await self._run_pipeline(
+                job.book_id, job.payload["file_path"], llm_service,
+                tts_service if generate else None, checkpoint=checkpoint,
+                content_hash=job.payload.get("content_hash"),
+                reuse_analysis=job.payload.get("reuse_analysis", False)
+            )
+        elif job.kind == JobKind.ANALYZE:
+            if resuming and self._book_has_characters(job.book_id):
+                print(f"Book {job.book_id} already analyzed, skipping")
+                return
+            await self.analyze_book(job.book_id, llm_service)
+        elif job.kind == JobKind.SEGMENT:
+            await self.segment_chapter(job.chapter_id, llm_service)
+        elif job.kind == JobKind.GENERATE:
+            await self.generate_audio(job.chapter_id, tts_service, resume=resuming)
+        elif job.kind == JobKind.IMPORT:
+            await self.import_directory(
+                job.payload["directory"], recursive=job.payload.get("recursive", True),
+                analyze=job.payload.get("analyze", False), checkpoint=checkpoint
+            )
+        else:
+            raise ValueError(f"Unknown job kind: {job.kind}")
+
+    async def import_directory(self, directory: str, recursive: bool = True, analyze: bool = False,
+                               checkpoint=None, on_progress=None) -> ImportProgress:
+        """Import every EPUB under ``directory``; books already imported are skipped, so re-running resumes."""
+        paths = BulkImporter.scan(directory, recursive=recursive)
+        print(f"Importing {len(paths)} EPUB files from {directory}")
+
+        last_saved = [0.0]
 
+        def report(progress: ImportProgress):
+            if on_progress:
+                on_progress(progress)
+            # Progress is visible on the job (GET /jobs/{id}), saved at most every second
+            if checkpoint and (time.monotonic() - last_saved[0] >= 1.0 or progress.done == progress.total):
+                last_saved[0] = time.monotonic()
+                checkpoint.save(stage="importing", progress=progress.as_dict())
 
-    async def _run_pipeline(self, book_id: int, file_path: str, llm_service, tts_service=None):
+        importer = BulkImporter(self.parser, self.uploads)
+        progress = await importer.run(paths, on_progress=report)
+        if checkpoint:
+            checkpoint.save(stage="imported", progress=progress.as_dict())
+
+        if analyze:
+            queue = self._job_queue()
+            for book_id in progress.book_ids:
+                queue.enqueue(JobKind.ANALYZE, book_id=book_id)
+        print(f"Import of {directory} finished: {progress.imported} imported, {progress.skipped} skipped, "
+              f"{progress.failed} failed")
+        return progress
+
+    @staticmethod
+    def _book_has_characters(book_id: int) -> bool:
+        with Session(engine) as session:
+            return session.exec(select(Character.id).where(Character.book_id == book_id).limit(1)).first() is not None
+
+    async def _run_pipeline(self, book_id: int, file_path: str, llm_service, tts_service=None, checkpoint=None,
+                            content_hash: Optional[str] = None, reuse_analysis: bool = False):
         print(f"Starting pipeline for book {book_id}")
+        resuming = checkpoint is not None and checkpoint.resuming
         
-        # 1. Parse
-        self._parse_and_save(book_id, file_path)
+        # 1. Parse (chapters are committed one by one, so only a saved stage means parsing finished)
+        if resuming and checkpoint.get("stage"):
+            print(f"Book {book_id} already parsed, resuming")
+        else:
+            await self._parse_and_save(book_id, file_path, content_hash)
+            if checkpoint:
+                checkpoint.save(stage="parsed")
         
-        # 2. Analyze
-        await self.analyze_book(book_id, llm_service)
+        # 2. Analyze (or copy the characters of an earlier book made from the same EPUB)
+        if resuming and self._book_has_characters(book_id):
+            print(f"Book {book_id} already analyzed, resuming")
+        elif reuse_analysis and content_hash and self._copy_characters(book_id, content_hash):
+            print(f"Book {book_id}: reused character analysis of EPUB {content_hash[:12]}")
+        else:
+            await self.analyze_book(book_id, llm_service)
+        if checkpoint:
+            checkpoint.save(stage="analyzed")
         
         # 3. If TTS service provided, continue to generation
         if tts_service:
             print(f"Auto-generating audio for book {book_id}")
             with Session(engine) as session:
-                chapters = session.exec(select(Chapter).where(Chapter.book_id == book_id)).all()
-                for chapter in chapters:
-                    # Segment first
-                    await self.segment_chapter(chapter.id, llm_service)
-                    # Then Generate
-                    await self.generate_audio(chapter.id, tts_service)
-
-    def _parse_and_save(self, book_id: int, file_path: str):
+                chapter_ids = session.exec(
+                    select(Chapter.id).where(Chapter.book_id == book_id).order_by(Chapter.position)
+                ).all()
+            await self._run_generation_stages(list(chapter_ids), llm_service, tts_service, checkpoint=checkpoint)
+
+    async def _run_generation_stages(self, chapter_ids: List[int], llm_service, tts_service, checkpoint=None):
+        """Segment and synthesize chapters as two overlapping stages.
+
+        Segmentation workers pull chapters in reading order and hand them to
+        synthesis workers through a bounded queue, so the LLM works on the next
+        chapters while the TTS renders the current ones. The bound keeps
+        segmentation from running arbitrarily far ahead of synthesis.
+        """
+        resuming = checkpoint is not None and checkpoint.resuming
+        completed = set(checkpoint.get("completed_chapters", [])) if checkpoint else set()
+        if resuming:
+            with Session(engine) as session:
+                completed.update(session.exec(
+                    select(Chapter.id).where(Chapter.id.in_(chapter_ids), Chapter.status == ChapterStatus.COMPLETED)
+                ).all())
+        segment_queue: asyncio.Queue = asyncio.Queue()
+        synthesis_queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, settings.PIPELINE_QUEUE_SIZE))
+        for chapter_id in chapter_ids:
+            if chapter_id not in completed:
+                segment_queue.put_nowait(chapter_id)
+
+        async def segment_worker():
+            while True:
+                try:
+                    chapter_id = segment_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    # Re-segmenting would drop segments that already have audio
+                    if not (resuming and self._chapter_has_segments(chapter_id)):
+                        await self.segment_chapter(chapter_id, llm_service)
+                except LLMRateLimitError:
+                    raise
+                except Exception as e:
+                    # generate_audio falls back to a single segment if none were created
+                    print(f"[ERROR] Segmentation stage failed for chapter {chapter_id}: {e}")
+                await synthesis_queue.put(chapter_id)
+
+        async def synthesis_worker():
+            while True:
+                chapter_id = await synthesis_queue.get()
+                if chapter_id is None:
+                    return
+                try:
+                    await self.generate_audio(chapter_id, tts_service, resume=resuming)
+                except Exception as e:
+                    print(f"[ERROR] Synthesis stage failed for chapter {chapter_id}: {e}")
+                    continue
+                if checkpoint:
+                    completed.add(chapter_id)
+                    checkpoint.save(stage="generating", completed_chapters=sorted(completed))
+
+        segmenters = [asyncio.create_task(segment_worker()) for _ in range(max(1, settings.PIPELINE_SEGMENT_WORKERS))]
+        synthesizers = [asyncio.create_task(synthesis_worker()) for _ in range(max(1, settings.PIPELINE_SYNTHESIS_WORKERS))]
+
+        try:
+            await asyncio.gather(*segmenters)
+            for _ in synthesizers:
+                await synthesis_queue.put(None)
+            await asyncio.gather(*synthesizers)
+        finally:
+            for task in segmenters + synthesizers:
+                task.cancel()
+
+    @staticmethod
+    def _chapter_has_segments(chapter_id: int) -> bool:
+        with Session(engine) as session:
+            return session.exec(select(Segment.id).where(Segment.chapter_id == chapter_id).limit(1)).first() is not None
+
+    async def _parse_and_save(self, book_id: int, file_path: str, content_hash: Optional[str] = None):
+        """Parse the EPUB in the CPU pool and store its chapters as they arrive.
+
+        Each chapter is committed on its own so no write transaction stays
+        open while documents are being parsed; chapters left by an
+        interrupted attempt are removed first. With a ``content_hash`` the
+        parse result is read from, or saved to, the upload store's cache.
+        """
         with Session(engine) as session:
             book = session.get(Book, book_id)
             if not book:
                 return
 
+            writer = None
             try:
-                parsed_book = self.parser.parse_epub(file_path)
+                # Bulk deletes skip the ORM cascade: remove the chapters' rows first
+                delete_book_paragraphs(session, book_id)
+                chapter_ids = select(Chapter.id).where(Chapter.book_id == book_id)
+                session.exec(delete(Segment).where(Segment.chapter_id.in_(chapter_ids)))
+                session.exec(delete(Chapter).where(Chapter.book_id == book_id))
+                session.commit()
+
+                if content_hash and self.uploads.has_parsed(content_hash):
+                    print(f"Book {book_id}: reusing parse result of EPUB {content_hash[:12]}")
+                    parsed_book, cached_chapters = await asyncio.to_thread(self.uploads.read_parsed, content_hash)
+                    parsed_chapters = self._iterate_in_thread(cached_chapters)
+                else:
+                    if settings.EPUB_PARSER_MODE.lower() == "stream":
+                        parsed_book = await run_cpu(self.parser.read_metadata, file_path)
+                        parsed_chapters = self._parse_chapters_pooled(file_path)
+                    else:
+                        parsed_book = await run_cpu(self.parser.parse_epub, file_path)
+                        parsed_chapters = self._iterate(parsed_book.chapters)
+                    if content_hash:
+                        writer = self.uploads.parsed_writer(content_hash)
+                        writer.write_book(parsed_book)
                 
                 # Update Book Metadata
                 book.title = parsed_book.title
                 book.author = parsed_book.author
                 book.cover_path = parsed_book.cover_path
-                book.status = BookStatus.READY
                 session.add(book)
+                session.commit()
                 
-                # Create Chapters
-                for parsed_chapter in parsed_book.chapters:
+                # Create Chapters one at a time, releasing each before the next is stored
+                async for parsed_chapter in parsed_chapters:
                     chapter = Chapter(
                         book_id=book.id,
                         position=parsed_chapter.position,
                         title=parsed_chapter.title,
-                        content_text=parsed_chapter.content,
                         status=ChapterStatus.PENDING
                     )
                     session.add(chapter)
+                    session.flush()
+                    insert_paragraphs(session, chapter.id, parsed_chapter.content)
+                    session.commit()
+                    session.expunge(chapter)
+                    if writer:
+                        writer.write_chapter(parsed_chapter)
                 
+                book.status = BookStatus.READY
+                session.add(book)
                 session.commit()
+                if writer:
+                    writer.commit()
                 print(f"Book {book_id} parsed successfully.")
                 
             except Exception as e:
+                if writer:
+                    writer.discard()
                 print(f"Error parsing book {book_id}: {e}")
+                session.rollback()
                 book.status = "failed"
                 session.add(book)
                 session.commit()
 
-    async def analyze_book(self, book_id: int, llm_service):
+    async def _parse_chapters_pooled(self, file_path: str):
+        """Yield the book's chapters in order while its spine documents are parsed in parallel.
+
+        At most two documents per pool worker are in flight, so memory stays
+        bounded however long the book is.
+        """
+        members = await run_cpu(list_documents, file_path)
+        ahead = 2 * cpu_pool_size()
+        pending = deque()
+        position = 1
+        try:
+            for member in members:
+                pending.append(asyncio.ensure_future(run_cpu(extract_document, file_path, member)))
+                if len(pending) < ahead:
+                    continue
+                chapter = await self._next_chapter(pending, position)
+                if chapter:
+                    position += 1
+                    yield chapter
+            while pending:
+                chapter = await self._next_chapter(pending, position)
+                if chapter:
+                    position += 1
+                    yield chapter
+        finally:
+            for task in pending:
+                task.cancel()
+
+    @staticmethod
+    async def _next_chapter(pending: deque, position: int) -> Optional[ParsedChapter]:
+        chapter_title, text = await pending.popleft()
+        if len(text) <= 100: # Filter out very short "chapters" like empty pages or just titles
+            return None
+        return ParsedChapter(title=chapter_title or f"Chapter {position}", content=text, position=position)
+
+    @staticmethod
+    async def _iterate(items):
+        for item in items:
+            yield item
+
+    @staticmethod
+    async def _iterate_in_thread(iterator):
+        # Decompressing cached chapters is done off the event loop
+        sentinel = object()
+        while (item := await asyncio.to_thread(next, iterator, sentinel)) is not sentinel:
+            yield item
+
+    @staticmethod
+    def _copy_characters(book_id: int, content_hash: str) -> bool:
+        """Copy the characters (and voice choices) of the latest other book uploaded from the same EPUB."""
+        with Session(engine) as session:
+            source_id = session.exec(
+                select(UploadedFile.book_id)
+                .join(Book, Book.id == UploadedFile.book_id)
+                .where(UploadedFile.content_hash == content_hash, UploadedFile.book_id != book_id)
+                .where(select(Character.id).where(Character.book_id == UploadedFile.book_id).exists())
+                .order_by(UploadedFile.created_at.desc())
+                .limit(1)
+            ).first()
+            if source_id is None:
+                return False
+
+            for character in session.exec(select(Character).where(Character.book_id == source_id)).all():
+                session.add(Character(
+                    book_id=book_id,
+                    name=character.name,
+                    gender=character.gender,
+                    age_category=character.age_category,
+                    tone=character.tone,
+                    voice_quality=character.voice_quality,
+                    description=character.description,
+                    assigned_voice_id=character.assigned_voice_id
+                ))
+            book = session.get(Book, book_id)
+            if book:
+                book.status = BookStatus.READY
+                session.add(book)
+            session.commit()
+            return True
+
+    async def analyze_book(self, book_id: int, llm_service, chapter_ids: Optional[List[int]] = None):
+        """Detect the book's characters over all chapters (or only ``chapter_ids``).
+
+        Chapter windows are analyzed concurrently, then their characters are
+        merged with alias resolution. Characters already stored for the book
+        are kept as they are (including voice choices); only characters not
+        matching any of them are added.
+        """
         from .voice_registry import VoiceRegistry
         
         voice_registry = VoiceRegistry()
@@ -112,34 +420,50 @@ class Orchestrator:
             if not book:
                 raise ValueError("Book not found")
             
-            # Get first 3 chapters for better character detection
-            chapters = session.exec(
-                select(Chapter).where(Chapter.book_id == book_id).order_by(Chapter.position).limit(3)
-            ).all()
-            
-            if not chapters:
-                print("No chapters found to analyze.")
+            query = select(Chapter.id).where(Chapter.book_id == book_id).order_by(Chapter.position)
+            if chapter_ids is not None:
+                query = query.where(Chapter.id.in_(chapter_ids))
+            chapter_texts = [read_text(session, chapter_id) for chapter_id in session.exec(query).all()]
+            existing = [
+                {"id": c.id, "name": c.name, "gender": c.gender, "age_category": c.age_category,
+                 "tone": c.tone, "voice_quality": c.voice_quality, "description": c.description}
+                for c in session.exec(select(Character).where(Character.book_id == book_id)).all()
+            ]
+
+        if not chapter_texts:
+            print("No chapters found to analyze.")
+            return
+
+        # Map: analyze windows of the book concurrently
+        windows = self._analysis_windows(chapter_texts, settings.ANALYSIS_WINDOW_CHARS)
+        semaphore = asyncio.Semaphore(max(1, settings.ANALYSIS_CONCURRENCY))
+
+        async def analyze(window_text):
+            async with semaphore:
+                return await llm_service.analyze_text(window_text)
+
+        print(f"Analyzing book {book_id}: {len(chapter_texts)} chapters in {len(windows)} windows, "
+              f"total {sum(len(w) for w in windows)} chars")
+        analyses = await asyncio.gather(*(analyze(window) for window in windows))
+
+        # Reduce: merge aliases and conflicting traits, on top of the characters already stored
+        merger = CharacterMerger(existing)
+        merger.merge(analyses)
+        if not any(is_narrator(r.name) for r in merger.records):
+            merger.add({"name": "Narrator", "gender": "neutral", "age_category": "adult", "tone": "warm",
+                        "voice_quality": "calm", "description": "Standard narrator voice"})
+        new_records = merger.new_records()
+
+        with Session(engine) as session:
+            book = session.get(Book, book_id)
+            if not book:
                 return
 
-            # Combine text from multiple chapters for better character coverage
-            combined_text = "\n\n---\n\n".join([ch.content_text for ch in chapters])
-            print(f"Analyzing book {book_id} using {len(chapters)} chapters, total {len(combined_text)} chars")
-            
-            analysis = await llm_service.analyze_text(combined_text)
-            
-            characters_data = analysis.get("characters", [])
-            
-            narrator_exists = False
-            for char_data in characters_data:
-                if "narrator" in char_data["name"].lower():
-                    narrator_exists = True
-                
-                # Extract new fields with fallbacks
-                gender = char_data.get("gender", "neutral")
-                age_category = char_data.get("age_category", "adult")
-                tone = char_data.get("tone", "neutral")
-                voice_quality = char_data.get("voice_quality", "calm")
-                description = char_data.get("description", "")
+            for record in new_records:
+                gender = record.trait("gender", "neutral")
+                age_category = record.trait("age_category", "adult")
+                tone = record.trait("tone", "neutral")
+                voice_quality = record.trait("voice_quality", "calm")
                 
                 # Automatically assign best matching voice
                 assigned_voice = voice_registry.find_best_match(
@@ -150,46 +474,49 @@ class Orchestrator:
                     locale="fr-FR"  # TODO: Detect from book metadata
                 )
                 
-                print(f"Auto-assigned voice {assigned_voice} to {char_data['name']} "
-                      f"(gender={gender}, age={age_category}, tone={tone}, quality={voice_quality})")
+                aliases = sorted(n for n in record.names if n != record.display_name)
+                print(f"Auto-assigned voice {assigned_voice} to {record.display_name} "
+                      f"(gender={gender}, age={age_category}, tone={tone}, quality={voice_quality})"
+                      + (f", aliases: {', '.join(aliases)}" if aliases else ""))
                 
-                character = Character(
+                session.add(Character(
                     book_id=book.id,
-                    name=char_data["name"],
+                    name=record.display_name,
                     gender=gender,
                     age_category=age_category,
                     tone=tone,
                     voice_quality=voice_quality,
-                    description=description,
+                    description=record.description,
                     assigned_voice_id=assigned_voice
-                )
-                session.add(character)
-            
-            if not narrator_exists:
-                # Create narrator with neutral characteristics and auto-assign voice
-                narrator_voice = voice_registry.find_best_match(
-                    gender="neutral",
-                    age_category="adult",
-                    tone="warm",
-                    voice_quality="calm",
-                    locale="fr-FR"
-                )
-                
-                session.add(Character(
-                    book_id=book.id,
-                    name="Narrator",
-                    gender="neutral",
-                    age_category="adult",
-                    tone="warm",
-                    voice_quality="calm",
-                    description="Standard narrator voice",
-                    assigned_voice_id=narrator_voice
                 ))
             
             book.status = BookStatus.READY
             session.add(book)
             session.commit()
-            print(f"Analysis complete for book {book_id}. Found {len(characters_data)} characters with auto-assigned voices.")
+            print(f"Analysis complete for book {book_id}. {len(merger.records)} characters, "
+                  f"{len(new_records)} new with auto-assigned voices.")
+
+    @staticmethod
+    def _analysis_windows(chapter_texts: List[str], window_chars: int) -> List[str]:
+        """Group short chapters and split long ones into windows of about ``window_chars``.
+
+        Windows only depend on the chapters' text, so re-analyzing a book
+        sends the same windows again and hits the LLM cache.
+        """
+        windows: List[str] = []
+        pending: List[str] = []
+        for text in chapter_texts:
+            for window in make_windows(text, window_chars, 0):
+                part = text[window.start:window.end].strip()
+                if not part:
+                    continue
+                if pending and sum(len(p) for p in pending) + len(part) > window_chars:
+                    windows.append("\n\n---\n\n".join(pending))
+                    pending = []
+                pending.append(part)
+        if pending:
+            windows.append("\n\n---\n\n".join(pending))
+        return windows
 
     async def segment_chapter(self, chapter_id: int, llm_service):
         print(f"[DEBUG] segment_chapter called for chapter_id={chapter_id}")
@@ -203,7 +530,7 @@ class Orchestrator:
                 characters = session.exec(select(Character).where(Character.book_id == chapter.book_id)).all()
                 # Detach data
                 char_dicts = [{"name": c.name, "gender": c.gender, "id": c.id} for c in characters]
-                chapter_text = chapter.content_text
+                chapter_text = read_text(session, chapter.id)
                 chapter_id_val = chapter.id
 
             # Session closed.
@@ -212,8 +539,14 @@ class Orchestrator:
             print(f"[DEBUG] Found {len(char_dicts)} characters")
             print(f"[DEBUG] Calling LLM service: {type(llm_service).__name__}")
             
-            # 2. LLM Call (Long running)
-            segments_data = await llm_service.assign_roles(chapter_text, char_dicts)
+            # 2. Split into segments: LLM windows, or rules with the LLM only naming dialogue speakers
+            mode = settings.SEGMENTATION_MODE.lower()
+            if mode == "llm":
+                segments_data = await self._assign_roles_windowed(chapter_id, chapter_text, char_dicts, llm_service)
+            else:
+                segments_data = await self._segment_with_rules(
+                    chapter_id, chapter_text, char_dicts, llm_service if mode == "hybrid" else None
+                )
             
             print(f"[DEBUG] LLM returned {len(segments_data)} segments")
             
@@ -234,17 +567,17 @@ class Orchestrator:
                     text = seg_data.get("text", "")
                     
                     speaker_id = None
-                    if speaker_name.lower() != "narrator":
-                        # Find character ID from our detached list or re-query? 
-                        # We have char_dicts with IDs now.
-                        char = next((c for c in char_dicts if c["name"].lower() == speaker_name.lower()), None)
-                        if char:
-                            speaker_id = char["id"]
+                    # Exact name, or an unambiguous alias ("Potter" for "Harry Potter")
+                    char = resolve_character(speaker_name, char_dicts)
+                    if char:
+                        speaker_id = char["id"]
                     
                     segment = Segment(
                         chapter_id=chapter.id,
                         text=text,
-                        speaker_id=speaker_id
+                        speaker_id=speaker_id,
+                        char_start=seg_data.get("start"),
+                        char_end=seg_data.get("end")
                     )
                     session.add(segment)
                 
@@ -252,23 +585,130 @@ class Orchestrator:
                 session.add(chapter)
                 session.commit()
                 print(f"Segmentation complete for chapter {chapter_id}. Created {len(segments_data)} segments.")
+        except LLMRateLimitError:
+            # Fail the job so it is retried later instead of falling back to a Narrator-only chapter
+            raise
         except Exception as e:
             print(f"[ERROR] segment_chapter failed: {e}")
             import traceback
             traceback.print_exc()
 
-    async def generate_audio(self, chapter_id: int, tts_service):
+    async def _assign_roles_windowed(self, chapter_id: int, chapter_text: str, char_dicts: List[dict], llm_service) -> List[dict]:
+        """Run assign_roles on overlapping windows of the chapter concurrently and stitch the results."""
+        windows = make_windows(chapter_text, settings.ROLE_WINDOW_CHARS, settings.ROLE_WINDOW_OVERLAP_CHARS)
+        semaphore = asyncio.Semaphore(max(1, settings.ROLE_WINDOW_CONCURRENCY))
+
+        async def assign(window):
+            async with semaphore:
+                return await llm_service.assign_roles(chapter_text[window.start:window.end], char_dicts)
+
+        if len(windows) > 1:
+            print(f"[DEBUG] Chapter {chapter_id}: assigning roles over {len(windows)} windows")
+        results = await asyncio.gather(*(assign(window) for window in windows))
+        segments_data, coverage = await run_cpu(stitch_windows, chapter_text, windows, results)
+
+        print(f"[DEBUG] Chapter {chapter_id}: LLM segments cover {coverage:.0%} of the text")
+        if coverage < 0.9:
+            print(f"[WARN] Chapter {chapter_id}: LLM returned only {coverage:.0%} of the text; "
+                  f"missing passages were kept with the preceding segment")
+        return segments_data
+
+    async def _segment_with_rules(self, chapter_id: int, chapter_text: str, char_dicts: List[dict], llm_service=None) -> List[dict]:
+        """Split narration from dialogue by punctuation and attribute the dialogue.
+
+        Quotes with a dialogue tag naming a known character ("dit Harry") are
+        attributed directly. The others are marked in excerpts of the chapter
+        sent concurrently to ``llm_service.attribute_speakers``; without an LLM
+        they are read by the Narrator.
+        """
+        spans = await run_cpu(split_dialogue, chapter_text, settings.TTS_MAX_SEGMENT_CHARS)
+        names = [c["name"] for c in char_dicts if c["name"].lower() != "narrator"]
+        speakers = {}
+        untagged = []
+        for i, span in enumerate(spans):
+            if span.kind != "dialogue":
+                continue
+            speakers[i] = guess_speaker(chapter_text, span, names)
+            if speakers[i] is None:
+                untagged.append((i, span))
+
+        if llm_service and untagged:
+            excerpts = attribution_excerpts(chapter_text, untagged, max_quotes=settings.ATTRIBUTION_BATCH_SIZE)
+            semaphore = asyncio.Semaphore(max(1, settings.ROLE_WINDOW_CONCURRENCY))
+
+            async def attribute(excerpt):
+                async with semaphore:
+                    return await llm_service.attribute_speakers(excerpt, char_dicts)
+
+            for result in await asyncio.gather(*(attribute(excerpt) for excerpt in excerpts)):
+                for quote_id, speaker in result.items():
+                    quote_id = quote_id.lstrip("#")
+                    if quote_id.isdigit() and int(quote_id) in speakers:
+                        speakers[int(quote_id)] = speaker
+
+            sent = sum(len(excerpt) for excerpt in excerpts)
+            print(f"[DEBUG] Chapter {chapter_id}: sent {len(untagged)} untagged quotes in {len(excerpts)} excerpts "
+                  f"({sent} chars, {sent / max(1, len(chapter_text)):.0%} of the chapter) to the LLM")
+
+        print(f"[DEBUG] Chapter {chapter_id}: {len(spans)} spans, {len(speakers)} dialogue, "
+              f"{len(speakers) - len(untagged)} attributed from dialogue tags")
+        return [{"text": span.text, "speaker": speakers.get(i) or "Narrator", "start": span.start, "end": span.end}
+                for i, span in enumerate(spans)]
+
+    def _resolve_voice(self, speaker_id, narrator_id, character_map) -> str:
+        # Use French voice by default
+        voice_id = "fr-FR-DeniseNeural"  # Female French voice
+
+        # Determine effective speaker ID (use Narrator if None)
+        if speaker_id is None and narrator_id:
+            speaker_id = narrator_id
+
+        if speaker_id:
+            char_data = character_map.get(speaker_id)
+            if char_data:
+                if char_data["assigned_voice_id"]:
+                    voice_id = char_data["assigned_voice_id"]
+                elif char_data["gender"]:
+                    if char_data["gender"].lower() == "female":
+                        voice_id = "fr-FR-DeniseNeural"
+                    elif char_data["gender"].lower() == "male":
+                        voice_id = "fr-FR-HenriNeural"
+            else:
+                print(f"[VOICE DEBUG] No character data found for speaker_id={speaker_id}")
+
+        return voice_id
+
+    async def generate_audio(self, chapter_id: int, tts_service, resume: bool = False):
+        """Synthesize every segment of a chapter and assemble chapter.mp3.
+
+        With ``resume``, segments whose audio file is already on disk (written
+        by an interrupted earlier run) are kept instead of synthesized again.
+        """
         # 1. Fetch all necessary data in a short-lived session
         with Session(engine) as session:
             chapter = session.get(Chapter, chapter_id)
             if not chapter:
                 raise ValueError("Chapter not found")
             
-            # Set status to PROCESSING immediately
+            # Set status to PROCESSING immediately; a fresh run starts progress over
             chapter.status = ChapterStatus.PROCESSING
+            if not resume:
+                chapter.progress = 0
             session.add(chapter)
+
+            # Audio of an earlier run must not be streamed as this run's: chapter.mp3 is rebuilt
+            # at the end, and a fresh run also replaces every segment file
+            chapter_file = self._chapter_audio_file(f"data/audio/book_{chapter.book_id}/chapter_{chapter.position}")
+            stale = Segment.audio_file == chapter_file if resume else Segment.audio_file.is_not(None)
+            session.exec(
+                update(Segment)
+                .where(Segment.chapter_id == chapter_id, stale)
+                .values(audio_file=None, start_time=None, end_time=None)
+            )
             session.commit()
             session.refresh(chapter)
+            if os.path.exists(chapter_file):
+                os.remove(chapter_file)
             
             segments = session.exec(select(Segment).where(Segment.chapter_id == chapter_id).order_by(Segment.id)).all()
             
@@ -277,7 +717,7 @@ class Orchestrator:
                 print(f"No segments found for chapter {chapter_id}. Creating fallback segment with full text.")
                 fallback_segment = Segment(
                     chapter_id=chapter.id,
-                    text=chapter.content_text,
+                    text=read_text(session, chapter.id),
                     speaker_id=None
                 )
                 session.add(fallback_segment)
@@ -287,7 +727,7 @@ class Orchestrator:
             
             # Detach data needed for generation
             segments_data = [
-                {"id": s.id, "text": s.text, "speaker_id": s.speaker_id} 
+                {"id": s.id, "text": s.text, "speaker_id": s.speaker_id, "audio_file": s.audio_file}
                 for s in segments
             ]
             book_id = chapter.book_id
@@ -316,80 +756,67 @@ class Orchestrator:
         chapter_audio_dir = f"data/audio/book_{book_id}/chapter_{chapter_position}"
         os.makedirs(chapter_audio_dir, exist_ok=True)
         
+        limiter = get_synthesis_limiter()
+        adapter_name = type(tts_service).__name__
+        total_segments = len(segments_data)
         successful_segments = 0
-        
-        for i, segment_data in enumerate(segments_data):
-            # Use French voice by default
-            voice_id = "fr-FR-DeniseNeural"  # Female French voice
-            
-            # Determine effective speaker ID (use Narrator if None)
-            speaker_id = segment_data["speaker_id"]
-            
-            print(f"[VOICE DEBUG] Segment {i}: speaker_id={speaker_id}, narrator_id={narrator_id}")
-            
-            if speaker_id is None and narrator_id:
-                speaker_id = narrator_id
-                print(f"[VOICE DEBUG] Segment {i}: Using narrator_id as speaker")
-            
-            if speaker_id:
-                char_data = character_map.get(speaker_id)
-                print(f"[VOICE DEBUG] Segment {i}: char_data={char_data}")
-                
-                if char_data:
-                    if char_data["assigned_voice_id"]:
-                        voice_id = char_data["assigned_voice_id"]
-                        print(f"[VOICE DEBUG] Segment {i}: Using assigned voice: {voice_id}")
-                    elif char_data["gender"]:
-                        if char_data["gender"].lower() == "female":
-                            voice_id = "fr-FR-DeniseNeural"
-                        elif char_data["gender"].lower() == "male":
-                            voice_id = "fr-FR-HenriNeural"
-                        print(f"[VOICE DEBUG] Segment {i}: Using gender fallback: {voice_id}")
-                else:
-                    print(f"[VOICE DEBUG] Segment {i}: No character data found for speaker_id={speaker_id}")
-            else:
-                print(f"[VOICE DEBUG] Segment {i}: No speaker_id, using default: {voice_id}")
-            
+        produced_files = {}
+
+        async def synthesize(i: int, segment_data: dict, writer: ProgressWriter):
+            nonlocal successful_segments
+
+            voice_id = self._resolve_voice(segment_data["speaker_id"], narrator_id, character_map)
+            # File names follow segment order, not completion order
             filename = f"segment_{i:04d}.mp3"
             output_path = os.path.join(chapter_audio_dir, filename)
-            
+            audio_file = None
+
             try:
                 if not segment_data["text"].strip():
-                    continue
-                    
-                print(f"Generating segment {i+1}/{len(segments_data)} with voice {voice_id}...")
-                # This is the long-running task. No DB connection is held here.
-                await tts_service.generate_audio(segment_data["text"], voice_id, output_path)
-                
+                    return
+
+                existing = segment_data["audio_file"]
+                # chapter.mp3 is rebuilt from the segment files, so it never counts as a checkpoint
+                if resume and existing and existing != self._chapter_audio_file(chapter_audio_dir) and os.path.exists(existing):
+                    successful_segments += 1
+                    produced_files[i] = existing
+                    return
+
+                chunks = split_text(segment_data["text"], settings.TTS_MAX_SEGMENT_CHARS)
+                if len(chunks) > 1:
+                    print(f"Generating segment {i+1}/{total_segments} with voice {voice_id} in {len(chunks)} chunks...")
+                    await self._synthesize_chunks(tts_service, limiter, adapter_name, voice_id, chunks, output_path)
+                else:
+                    async with limiter.slot(adapter_name, voice_id):
+                        print(f"Generating segment {i+1}/{total_segments} with voice {voice_id}...")
+                        # This is the long-running task. No DB connection is held here.
+                        await tts_service.generate_audio(segment_data["text"], voice_id, output_path)
+
                 # Verify the file was actually created
                 if not os.path.exists(output_path):
                     print(f"[ERROR] Audio file was not created: {output_path}")
-                    continue
-                
+                    return
+
                 successful_segments += 1
-                
-                # Update DB with result in a NEW short-lived session
-                with Session(engine) as update_session:
-                    segment = update_session.get(Segment, segment_data["id"])
-                    if segment:
-                        # Convert backslashes to forward slashes for web URLs
-                        segment.audio_file = output_path.replace('\\', '/')
-                        update_session.add(segment)
-                    
-                    # Update chapter progress
-                    chapter_update = update_session.get(Chapter, chapter_id)
-                    if chapter_update:
-                        progress_pct = int(((i + 1) / len(segments_data)) * 100)
-                        chapter_update.progress = progress_pct
-                        update_session.add(chapter_update)
-                    
-                    update_session.commit()
-                
+                # Convert backslashes to forward slashes for web URLs
+                audio_file = output_path.replace('\\', '/')
+                produced_files[i] = audio_file
+
             except Exception as e:
                 print(f"Error generating audio for segment {segment_data['id']}: {e}")
                 import traceback
                 traceback.print_exc()
-        
+            finally:
+                # Results are batched; the writer keeps progress monotonic across out-of-order completions
+                writer.segment_done(segment_data["id"], audio_file)
+
+        async with ProgressWriter(chapter_id, total_segments) as writer:
+            await asyncio.gather(*(synthesize(i, segment_data, writer) for i, segment_data in enumerate(segments_data)))
+
+        timings = []
+        if successful_segments > 0:
+            timings = await self._assemble_chapter_audio(chapter_audio_dir, segments_data, produced_files)
+
         # Final update for chapter status - only mark COMPLETED if we have audio files
         with Session(engine) as final_session:
             chapter = final_session.get(Chapter, chapter_id)
@@ -406,4 +833,67 @@ class Orchestrator:
                     print(f"Audio generation FAILED for chapter {chapter_id}. No segments were generated.")
                 
                 final_session.add(chapter)
+
+                if timings:
+                    chapter_file = self._chapter_audio_file(chapter_audio_dir)
+                    updates = []
+                    for segment_id, start_time, end_time in timings:
+                        values = {"id": segment_id, "start_time": start_time, "end_time": end_time}
+                        if not settings.AUDIO_KEEP_SEGMENT_FILES:
+                            values["audio_file"] = chapter_file
+                        updates.append(values)
+                    final_session.execute(update(Segment), updates)
+
                 final_session.commit()
+
+    async def _synthesize_chunks(self, tts_service, limiter, adapter_name: str, voice_id: str,
+                                 chunks: List[str], output_path: str):
+        """Synthesize an oversized segment as parallel chunks joined into ``output_path``.
+
+        Each chunk takes its own limiter slot, so a long segment spreads over
+        the free slots instead of being one slow request.
+        """
+        base, ext = os.path.splitext(output_path)
+        part_paths = [f"{base}.part{n:03d}{ext}" for n in range(len(chunks))]
+
+        async def synthesize_chunk(text: str, part_path: str):
+            async with limiter.slot(adapter_name, voice_id):
+                await tts_service.generate_audio(text, voice_id, part_path)
+
+        try:
+            await asyncio.gather(*(synthesize_chunk(text, path) for text, path in zip(chunks, part_paths)))
+            missing = [path for path in part_paths if not os.path.exists(path)]
+            if missing:
+                raise RuntimeError(f"{len(missing)} of {len(chunks)} chunks produced no audio")
+            await asyncio.to_thread(assemble_chapter, list(enumerate(part_paths)), output_path)
+        finally:
+            for path in part_paths:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    @staticmethod
+    def _chapter_audio_file(chapter_audio_dir: str) -> str:
+        return f"{chapter_audio_dir}/{CHAPTER_AUDIO_FILENAME}"
+
+    async def _assemble_chapter_audio(self, chapter_audio_dir: str, segments_data: List[dict], produced_files: dict):
+        """Join the chapter's segment files into chapter.mp3 and return segment timings.
+
+        Runs in a thread since it is pure file I/O. On failure the segment files
+        are left untouched and an empty timing list is returned.
+        """
+        ordered = [(segment_data["id"], produced_files.get(i)) for i, segment_data in enumerate(segments_data)]
+        chapter_file = self._chapter_audio_file(chapter_audio_dir)
+
+        try:
+            timings = await asyncio.to_thread(assemble_chapter, ordered, chapter_file)
+        except Exception as e:
+            print(f"[ERROR] Chapter assembly failed for {chapter_audio_dir}: {e}")
+            return []
+
+        if not settings.AUDIO_KEEP_SEGMENT_FILES:
+            for _, path in ordered:
+                if path and os.path.exists(path):
+                    os.remove(path)
+
+        print(f"Assembled {len(timings)} segments into {chapter_file}")
+        return timings
@@ -0,0 +1,111 @@
+"""Batched write-behind of segment results and chapter progress."""
+
+import asyncio
+from typing import Dict, Optional
+
+from sqlalchemy import update
+from sqlmodel import Session
+
+from ..core.config import settings
+from ..core.database import engine
+from ..models.models import Chapter, Segment
+
+
+class ProgressWriter:
+    """Collects per-segment results in memory and writes them in batches.
+
+    Each flush is a single transaction holding every pending ``audio_file``
+    and the latest chapter progress. A flush happens every ``flush_interval``
+    seconds, as soon as ``flush_every`` results are pending, and always when
+    the ``async with`` block exits, whether it succeeded or failed.
+
+    Progress is derived from the number of completed segments and is only
+    ever raised, so out-of-order completions cannot move it backwards.
+    """
+
+    def __init__(
+        self,
+        chapter_id: int,
+        total_segments: int,
+        flush_interval: Optional[float] = None,
+        flush_every: Optional[int] = None,
+    ):
+        self.chapter_id = chapter_id
+        self.total_segments = max(1, total_segments)
+        self.flush_interval = flush_interval if flush_interval is not None else settings.PROGRESS_FLUSH_INTERVAL
+        self.flush_every = max(1, flush_every if flush_every is not None else settings.PROGRESS_FLUSH_SEGMENTS)
+        self.completed = 0
+        self._pending_files: Dict[int, str] = {}
+        self._written_progress = 0
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def progress(self) -> int:
+        return int((self.completed / self.total_segments) * 100)
+
+    def segment_done(self, segment_id: int, audio_file: Optional[str] = None):
+        """Record a finished segment; ``audio_file`` is None when it produced no audio."""
+        self.completed += 1
+        if audio_file:
+            self._pending_files[segment_id] = audio_file
+        if len(self._pending_files) >= self.flush_every:
+            self._wakeup.set()
+
+    async def flush(self):
+        progress = self.progress
+        if not self._pending_files and progress <= self._written_progress:
+            return
+
+        # Entries are only dropped once committed; a failed flush leaves them for the next one.
+        # The transaction runs in a thread so a busy database does not stall synthesis.
+        pending = dict(self._pending_files)
+        await asyncio.to_thread(self._write, pending, progress)
+        for segment_id, audio_file in pending.items():
+            if self._pending_files.get(segment_id) == audio_file:
+                del self._pending_files[segment_id]
+        self._written_progress = max(self._written_progress, progress)
+
+    def _write(self, pending: Dict[int, str], progress: int):
+        with Session(engine) as session:
+            if pending:
+                session.execute(
+                    update(Segment),
+                    [{"id": segment_id, "audio_file": audio_file} for segment_id, audio_file in pending.items()],
+                )
+            if progress > self._written_progress:
+                session.execute(
+                    update(Chapter)
+                    .where(Chapter.id == self.chapter_id, Chapter.progress < progress)
+                    .values(progress=progress)
+                )
+            session.commit()
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._closing:
+                return
+            try:
+                await self.flush()
+            except Exception as e:
+                # Results stay pending and are retried on the next flush
+                print(f"[ERROR] Progress flush failed for chapter {self.chapter_id}: {e}")
+
+    async def __aenter__(self):
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # Stop the loop through a flag rather than cancel(): wait_for() may
+        # swallow a cancellation that races with the wakeup event.
+        self._closing = True
+        self._wakeup.set()
+        await self._task
+        await self.flush()
+        return False
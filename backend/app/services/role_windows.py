@@ -0,0 +1,144 @@
+"""Splits a chapter into overlapping windows for role assignment and stitches the results.
+
+Each window owns a contiguous, paragraph-aligned range of the chapter and is
+sent to the LLM with the tail of the previous window as leading context. The
+LLM output is only used to decide *where* segments start and *who* speaks:
+segment text is always cut from the source chapter, so stitched segments
+cover the chapter exactly once even if the model rewrites, drops or repeats
+text.
+"""
+
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+_QUOTES = str.maketrans({"«": '"', "»": '"', "“": '"', "”": '"', "„": '"', "‘": "'", "’": "'", "—": "-", "–": "-"})
+_ANCHOR_LENGTHS = (40, 20, 10)
+
+
+@dataclass
+class RoleWindow:
+    start: int  # first character sent to the LLM (includes overlap context)
+    own_start: int  # first character this window is responsible for
+    end: int
+
+
+def make_windows(text: str, window_chars: int, overlap_chars: int) -> List[RoleWindow]:
+    """Cut ``text`` into windows of whole paragraphs of about ``window_chars``."""
+    if len(text) <= window_chars:
+        return [RoleWindow(0, 0, len(text))]
+
+    # Paragraph boundaries: the offset right after each newline
+    boundaries = [m.end() for m in re.finditer(r"\n+", text)] + [len(text)]
+    windows: List[RoleWindow] = []
+    own_start = 0
+    while own_start < len(text):
+        end = next((b for b in boundaries if b - own_start >= window_chars), len(text))
+        # A single paragraph longer than a window is still sent whole
+        if windows:
+            previous = [b for b in boundaries if own_start - overlap_chars <= b < own_start]
+            start = previous[0] if previous else own_start
+        else:
+            start = 0
+        windows.append(RoleWindow(start, own_start, end))
+        own_start = end
+    return windows
+
+
+def _normalize(text: str) -> Tuple[str, List[int]]:
+    """Comparable form of ``text`` (no whitespace, unified quotes) and its index map."""
+    chars, positions = [], []
+    for i, ch in enumerate(text):
+        if ch.isspace():
+            continue
+        ch = unicodedata.normalize("NFKC", ch).translate(_QUOTES).lower()
+        for c in ch:
+            chars.append(c)
+            positions.append(i)
+    return "".join(chars), positions
+
+
+def locate_segments(window_text: str, segments: List[Dict]) -> List[Tuple[int, str, int]]:
+    """Find where each LLM segment starts in ``window_text``.
+
+    Returns [(offset, speaker, length)] with the normalized length of the
+    text the model returned. Segments are searched in order from the
+    previous match; a segment whose start cannot be found is dropped and its
+    text stays with the segment before it.
+    """
+    haystack, positions = _normalize(window_text)
+    cuts: List[Tuple[int, str, int]] = []
+    cursor = 0
+
+    for segment in segments:
+        needle, _ = _normalize(str(segment.get("text", "")))
+        if not needle:
+            continue
+        found = -1
+        for length in _ANCHOR_LENGTHS:
+            found = haystack.find(needle[:length], cursor)
+            if found >= 0:
+                break
+        if found < 0:
+            continue
+        cuts.append((positions[found], segment.get("speaker") or "Narrator", len(needle)))
+        cursor = found + 1
+    return cuts
+
+
+def stitch_windows(text: str, windows: List[RoleWindow], results: List[List[Dict]]) -> Tuple[List[Dict], float]:
+    """Merge per-window LLM segments into segments of ``text``.
+
+    Returns (segments, coverage). Each segment carries its ``start``/``end``
+    offsets in ``text``; coverage is the share of the chapter the model
+    actually returned; text it left out is kept anyway, attached to
+    the preceding segment.
+    """
+    cuts: List[Tuple[int, str]] = []
+    seams = set()
+    matched = 0
+
+    for window, segments in zip(windows, results):
+        located = [
+            (window.start + offset, speaker, length)
+            for offset, speaker, length in locate_segments(text[window.start:window.end], segments or [])
+        ]
+
+        # The segment covering the start of the owned range continues into it
+        speaker_at_start: Optional[str] = None
+        for offset, speaker, _ in located:
+            if offset <= window.own_start:
+                speaker_at_start = speaker
+        if speaker_at_start is None:
+            speaker_at_start = located[0][1] if located else "Narrator"
+
+        cuts.append((window.own_start, speaker_at_start))
+        if not any(offset == window.own_start for offset, _, _ in located):
+            seams.add(window.own_start)
+        for offset, speaker, length in located:
+            if window.own_start <= offset < window.end:
+                matched += length
+                if offset > window.own_start:
+                    cuts.append((offset, speaker))
+
+    cuts.sort(key=lambda cut: cut[0])
+    ranges: List[List] = []
+    for index, (offset, speaker) in enumerate(cuts):
+        end = cuts[index + 1][0] if index + 1 < len(cuts) else len(text)
+        if ranges and offset in seams and ranges[-1][2] == speaker:
+            # A window seam inside a segment is not a real boundary
+            ranges[-1][1] = end
+        else:
+            ranges.append([offset, end, speaker])
+
+    stitched = []
+    for start, end, speaker in ranges:
+        piece = text[start:end]
+        stripped = piece.strip()
+        if stripped:
+            start += len(piece) - len(piece.lstrip())
+            stitched.append({"text": stripped, "speaker": speaker, "start": start, "end": start + len(stripped)})
+    source_chars = len(_normalize(text)[0])
+    coverage = min(1.0, matched / source_chars) if source_chars else 1.0
+    return stitched, coverage
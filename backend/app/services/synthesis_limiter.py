@@ -0,0 +1,50 @@
+"""Concurrency limits for TTS synthesis shared by every chapter in the process."""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from ..core.config import settings
+
+
+class SynthesisLimiter:
+    """Bounds concurrent TTS calls globally and per (adapter, voice) pair.
+
+    The global limit protects the host and the provider account as a whole,
+    the per-voice limit keeps one busy voice from starving the others.
+    """
+
+    def __init__(self, max_concurrency: int, max_per_voice: int):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_per_voice = max(1, max_per_voice)
+        self._global = asyncio.Semaphore(self.max_concurrency)
+        self._per_voice: Dict[str, asyncio.Semaphore] = {}
+
+    def _voice_semaphore(self, key: str) -> asyncio.Semaphore:
+        semaphore = self._per_voice.get(key)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_per_voice)
+            self._per_voice[key] = semaphore
+        return semaphore
+
+    @asynccontextmanager
+    async def slot(self, adapter_name: str, voice_id: str):
+        """Hold one global slot and one slot for this adapter/voice."""
+        # Take the per-voice slot first so a saturated voice does not sit on global slots.
+        async with self._voice_semaphore(f"{adapter_name}:{voice_id}"):
+            async with self._global:
+                yield
+
+
+_limiter: Optional[SynthesisLimiter] = None
+
+
+def get_synthesis_limiter() -> SynthesisLimiter:
+    """Return the process-wide limiter, created lazily inside the running loop."""
+    global _limiter
+    if _limiter is None:
+        _limiter = SynthesisLimiter(
+            settings.TTS_MAX_CONCURRENCY,
+            settings.TTS_MAX_CONCURRENCY_PER_VOICE,
+        )
+    return _limiter
@@ -0,0 +1,62 @@
+"""Splits long text into TTS-sized chunks at natural boundaries."""
+
+import re
+from typing import List
+
+_CLOSERS = "»”\"’)\\]"
+
+# Tried in order: paragraphs, sentences, clauses, words. A piece that is
+# still too long after the last level is cut at max_chars.
+_BOUNDARIES = [
+    re.compile(r"\n\s*\n"),
+    # After . ! ? … optionally followed by a closing quote, also French "! »";
+    # never right before a closing quote so it stays with its sentence.
+    re.compile(
+        rf"(?:(?<=[.!?…])|(?<=[.!?…][{_CLOSERS}])|(?<=[.!?…]\s»))\s+(?=[^\s{_CLOSERS}])"
+    ),
+    # After ; : , and before an em/en dash (dialogue turns in French text)
+    re.compile(r"(?<=[;:,])\s+|\s+(?=[—–])"),
+    re.compile(r"\s+"),
+]
+
+
+def _split(text: str, max_chars: int, level: int) -> List[str]:
+    if len(text) <= max_chars:
+        return [text]
+    if level == len(_BOUNDARIES):
+        return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+    pieces = []
+    for part in _BOUNDARIES[level].split(text):
+        part = part.strip()
+        if part:
+            pieces.extend(_split(part, max_chars, level + 1))
+    return pieces
+
+
+def split_text(text: str, max_chars: int) -> List[str]:
+    """Return ``text`` as chunks of at most ``max_chars`` characters.
+
+    Short text comes back as a single chunk. Longer text is cut at the
+    coarsest boundary that makes pieces fit, and neighbouring pieces are
+    packed back together up to the limit so there are as few requests as
+    possible.
+    """
+    text = text.strip()
+    if not text:
+        return []
+    if len(text) <= max_chars:
+        return [text]
+
+    chunks: List[str] = []
+    current = ""
+    for piece in _split(text, max_chars, 0):
+        if current and len(current) + 1 + len(piece) <= max_chars:
+            current = f"{current} {piece}"
+        else:
+            if current:
+                chunks.append(current)
+            current = piece
+    if current:
+        chunks.append(current)
+    return chunks
@@ -0,0 +1,375 @@
+"""Content-addressed store of uploaded EPUBs and of their parse results."""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import zipfile
+from dataclasses import asdict, dataclass
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from python_multipart import MultipartParser
+from python_multipart.multipart import parse_options_header
+
+from .ebook_parser import ParsedBook, ParsedChapter
+
+CHUNK_SIZE = 1024 * 1024
+HEAD_SIZE = 128  # Bytes given to a stream's head check
+MULTIPART_OVERHEAD = 64 * 1024  # Allowance for the form's other fields and part headers
+
+_ZIP_MAGIC = b"PK\x03\x04"
+_EPUB_MIMETYPE = b"application/epub+zip"
+_IMAGE_MAGIC = (
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+
+
+class UploadRejected(ValueError):
+    """An upload that is too large or not of the expected type; ``status_code`` is the HTTP status to answer."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def check_epub_head(head: bytes):
+    """Reject a stream that does not start like an EPUB (a zip whose first entry, if ``mimetype``, says EPUB)."""
+    if not head.startswith(_ZIP_MAGIC):
+        raise UploadRejected("Not an EPUB file (no zip signature)", 415)
+    if len(head) < 30:
+        return
+    method, = struct.unpack_from("<H", head, 8)
+    name_len, extra_len = struct.unpack_from("<HH", head, 26)
+    if head[30:30 + name_len] == b"mimetype" and method == 0:
+        start = 30 + name_len + extra_len
+        content = head[start:start + len(_EPUB_MIMETYPE)]
+        if len(content) == len(_EPUB_MIMETYPE) and content != _EPUB_MIMETYPE:
+            raise UploadRejected("Not an EPUB file (wrong mimetype entry)", 415)
+
+
+def check_epub_archive(path: str):
+    """Reject a complete file whose zip directory is unreadable or has no EPUB container."""
+    try:
+        with zipfile.ZipFile(path) as zf:
+            if "META-INF/container.xml" not in zf.namelist():
+                raise UploadRejected("Not an EPUB file (no META-INF/container.xml)", 415)
+    except zipfile.BadZipFile as e:
+        raise UploadRejected(f"Corrupt EPUB file: {e}", 400)
+
+
+def image_extension(head: bytes) -> Optional[str]:
+    """File extension of a JPEG, PNG, GIF or WebP stream from its first bytes, None otherwise."""
+    for magic, extension in _IMAGE_MAGIC:
+        if head.startswith(magic):
+            return extension
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def check_image_head(head: bytes):
+    if image_extension(head) is None:
+        raise UploadRejected("Only JPEG, PNG, GIF and WebP images are supported", 415)
+
+
+@dataclass
+class StreamedFile:
+    tmp_path: str
+    content_hash: str
+    size: int
+    head: bytes
+
+
+class MultipartFile:
+    """The file field of a ``multipart/form-data`` request, parsed while the body arrives.
+
+    FastAPI's ``UploadFile`` parameters are only filled once Starlette has
+    spooled the whole body to its own temp file, so a size limit checked
+    afterwards comes too late. This reads ``request.stream()`` instead:
+    ``await open()`` parses up to the file part's headers (``filename``,
+    ``content_type``), then ``await read()`` returns the file bytes received
+    so far, ``b""`` at the end, like ``UploadFile.read``.
+    """
+
+    def __init__(self, request, field_name: str = "file", max_size: int = 0):
+        content_type, params = parse_options_header(request.headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise UploadRejected("Expected a multipart/form-data upload", 400)
+        declared = request.headers.get("content-length")
+        if max_size and declared and declared.isdigit() and int(declared) > max_size + MULTIPART_OVERHEAD:
+            # Refused before a single body byte is read
+            raise UploadRejected(f"File is larger than {max_size // (1024 * 1024)} MB", 413)
+
+        self.field_name = field_name
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+        self.size = None  # Unknown until the part ends
+        self._stream = request.stream().__aiter__()
+        self._data: List[bytes] = []
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._in_file = False
+        self._file_done = False
+        self._eof = False
+        self._parser = MultipartParser(params[b"boundary"], callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        if name == self.field_name and b"filename" in options and self.filename is None:
+            self.filename = options[b"filename"].decode("utf-8", "replace")
+            self.content_type = self._headers.get(b"content-type", b"").decode("latin-1") or None
+            self._in_file = True
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_file:
+            self._data.append(data[start:end])
+
+    def _on_part_end(self):
+        if self._in_file:
+            self._in_file = False
+            self._file_done = True
+
+    async def _pump(self):
+        try:
+            chunk = await self._stream.__anext__()
+        except StopAsyncIteration:
+            self._parser.finalize()
+            self._eof = True
+            return
+        if chunk:
+            self._parser.write(chunk)
+
+    async def open(self) -> "MultipartFile":
+        while self.filename is None and not self._eof:
+            await self._pump()
+        if self.filename is None:
+            raise UploadRejected(f"Missing file field '{self.field_name}'", 422)
+        return self
+
+    async def read(self, size: int = -1) -> bytes:
+        # ``size`` is a hint: whatever the last network chunk carried is returned at once
+        while not self._data and not self._file_done and not self._eof:
+            await self._pump()
+        data = b"".join(self._data)
+        self._data = []
+        return data
+
+
+def _write_chunk(out: BinaryIO, digest, chunk: bytes):
+    # hashlib releases the GIL on large buffers, so this runs well in a thread
+    digest.update(chunk)
+    out.write(chunk)
+
+
+async def stream_upload(source, directory: str, max_size: int,
+                        check_head: Optional[Callable[[bytes], None]] = None) -> StreamedFile:
+    """Copy an async upload (``await source.read(n)``, e.g. a ``MultipartFile``) to a temp file in ``directory``.
+
+    Chunks are hashed and written in a worker thread so the event loop keeps
+    serving other clients. The copy stops as soon as the stream exceeds
+    ``max_size`` bytes (413) or its first bytes fail ``check_head``, and the
+    temp file is removed. On success the caller renames ``tmp_path`` into
+    place, so partial files never appear under their final name.
+    """
+    declared = getattr(source, "size", None)
+    if max_size and declared and declared > max_size:
+        raise UploadRejected(f"File is larger than {max_size // (1024 * 1024)} MB", 413)
+
+    digest = hashlib.sha256()
+    size = 0
+    head = b""
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await source.read(CHUNK_SIZE):
+                size += len(chunk)
+                if max_size and size > max_size:
+                    raise UploadRejected(f"File is larger than {max_size // (1024 * 1024)} MB", 413)
+                if len(head) < HEAD_SIZE:
+                    head += chunk[:HEAD_SIZE - len(head)]
+                    if check_head and len(head) == HEAD_SIZE:
+                        check_head(head)
+                await asyncio.to_thread(_write_chunk, out, digest, chunk)
+        if check_head and len(head) < HEAD_SIZE:
+            check_head(head)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return StreamedFile(tmp_path, digest.hexdigest(), size, head)
+
+
+@dataclass
+class StoredUpload:
+    content_hash: str
+    file_path: str
+    size: int
+    already_stored: bool
+
+
+class UploadStore:
+    """Keeps each distinct EPUB once as ``<sha256>.epub`` and its parsed text as ``<sha256>.jsonl.gz``.
+
+    Uploads are hashed and checked while they are copied, so a file is read
+    only once and a rejected one is never stored.
+    Parse results are stored as gzipped JSON lines (book metadata first, then
+    one chapter per line) and only become visible once complete, so a reader
+    never sees half a book.
+    """
+
+    def __init__(self, upload_dir: str, parsed_dir: str):
+        self.upload_dir = upload_dir
+        self.parsed_dir = parsed_dir
+        os.makedirs(upload_dir, exist_ok=True)
+        os.makedirs(parsed_dir, exist_ok=True)
+
+    def upload_path(self, content_hash: str) -> str:
+        return os.path.join(self.upload_dir, f"{content_hash}.epub")
+
+    def save(self, source: BinaryIO) -> StoredUpload:
+        """Copy ``source`` into the store, hashing it on the way."""
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.upload_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while chunk := source.read(CHUNK_SIZE):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    out.write(chunk)
+            return self._publish(tmp_path, digest.hexdigest(), size)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    async def save_upload(self, upload, max_size: int) -> StoredUpload:
+        """Stream an uploaded EPUB into the store without blocking the event loop.
+
+        The stream is rejected with ``UploadRejected`` if it is larger than
+        ``max_size``, does not start like an EPUB, or is not a readable zip
+        with an EPUB container.
+        """
+        streamed = await stream_upload(upload, self.upload_dir, max_size, check_head=check_epub_head)
+        try:
+            await asyncio.to_thread(check_epub_archive, streamed.tmp_path)
+            return self._publish(streamed.tmp_path, streamed.content_hash, streamed.size)
+        except BaseException:
+            if os.path.exists(streamed.tmp_path):
+                os.remove(streamed.tmp_path)
+            raise
+
+    def _publish(self, tmp_path: str, content_hash: str, size: int) -> StoredUpload:
+        """Move a complete temp file to ``<sha256>.epub``, or drop it if that content is already stored."""
+        final_path = self.upload_path(content_hash)
+        already_stored = os.path.exists(final_path)
+        if already_stored:
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, final_path)
+        return StoredUpload(content_hash, final_path, size, already_stored)
+
+    def save_file(self, path: str) -> StoredUpload:
+        """Store a local file, copying it only if its content is not stored yet."""
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                digest.update(chunk)
+                size += len(chunk)
+        content_hash = digest.hexdigest()
+        final_path = self.upload_path(content_hash)
+        if os.path.exists(final_path):
+            return StoredUpload(content_hash, final_path, size, True)
+        with open(path, "rb") as f:
+            return self.save(f)
+
+    # Parse results
+
+    def parsed_path(self, content_hash: str) -> str:
+        return os.path.join(self.parsed_dir, f"{content_hash}.jsonl.gz")
+
+    def has_parsed(self, content_hash: str) -> bool:
+        return bool(content_hash) and os.path.exists(self.parsed_path(content_hash))
+
+    def read_parsed(self, content_hash: str) -> Tuple[ParsedBook, Iterator[ParsedChapter]]:
+        """Book metadata (``chapters`` empty) and a lazy iterator over the stored chapters."""
+        f = gzip.open(self.parsed_path(content_hash), "rt", encoding="utf-8")
+        try:
+            meta = json.loads(f.readline())
+        except BaseException:
+            f.close()
+            raise
+        book = ParsedBook(title=meta["title"], author=meta["author"], cover_path=meta.get("cover_path"), chapters=[])
+
+        def chapters() -> Iterator[ParsedChapter]:
+            with f:
+                for line in f:
+                    if line.strip():
+                        yield ParsedChapter(**json.loads(line))
+
+        return book, chapters()
+
+    def parsed_writer(self, content_hash: str) -> "ParsedBookWriter":
+        return ParsedBookWriter(self.parsed_path(content_hash))
+
+
+class ParsedBookWriter:
+    """Appends one book's parse result; ``commit()`` publishes it, ``discard()`` drops it."""
+
+    def __init__(self, path: str):
+        self.path = path
+        # Unique per writer: two books of the same EPUB may be parsed at once
+        fd, self._tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".part")
+        self._raw = os.fdopen(fd, "wb")
+        self._file = gzip.open(self._raw, "wt", encoding="utf-8")
+
+    def write_book(self, book: ParsedBook):
+        self._file.write(json.dumps({"title": book.title, "author": book.author, "cover_path": book.cover_path},
+                                    ensure_ascii=False) + "\n")
+
+    def write_chapter(self, chapter: ParsedChapter):
+        self._file.write(json.dumps(asdict(chapter), ensure_ascii=False) + "\n")
+
+    def _close(self):
+        self._file.close()
+        self._raw.close()
+
+    def commit(self):
+        self._close()
+        os.replace(self._tmp_path, self.path)
+
+    def discard(self):
+        self._close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
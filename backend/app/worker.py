@@ -0,0 +1,103 @@
+"""Standalone generation worker (the ``scriptvox-worker`` command).
+
+Runs job runners outside the API process so generation can scale across
+cores and hosts. Every worker needs the same DATABASE_URL and the same
+``data/`` volume as the API, and is started from the backend directory:
+
+    python -m app.worker --processes 4 --concurrency 2
+
+Combine with RUN_EMBEDDED_WORKER=false so the API only serves requests.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import signal
+import sys
+import time
+from typing import List, Optional
+
+from .core.config import settings
+from .core.database import create_db_and_tables
+
+
+async def run_worker(concurrency: int):
+    from .adapters.factory import create_services
+    from .services.job_queue import JobRunner
+    from .services.cpu_pool import shutdown_cpu_pool
+
+    tts_service, llm_service = create_services()
+    runner = JobRunner(llm_service, tts_service, concurrency=concurrency)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            signal.signal(sig, lambda *_: loop.call_soon_threadsafe(stop.set))
+
+    await runner.start()
+    await stop.wait()
+    print(f"Worker {runner.owner} stopping, releasing running jobs...")
+    # Running jobs are handed back to the queue without using up an attempt
+    await runner.stop()
+    await llm_service.close()
+    await tts_service.close()
+    shutdown_cpu_pool()
+
+
+def _worker_process(concurrency: int):
+    asyncio.run(run_worker(concurrency))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="scriptvox-worker", description="Run ScriptVox generation workers.")
+    parser.add_argument("--processes", type=int, default=settings.WORKER_PROCESSES,
+                        help="worker processes to start on this host")
+    parser.add_argument("--concurrency", type=int, default=settings.JOB_WORKER_CONCURRENCY,
+                        help="jobs each process runs at the same time")
+    args = parser.parse_args(argv)
+
+    create_db_and_tables()
+
+    if args.processes <= 1:
+        asyncio.run(run_worker(args.concurrency))
+        return
+
+    # Spawn keeps children independent of the parent's DB connections and event loop
+    context = multiprocessing.get_context("spawn")
+    stopping = False
+
+    def start_process():
+        process = context.Process(target=_worker_process, args=(args.concurrency,), daemon=False)
+        process.start()
+        return process
+
+    def request_stop(*_):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    processes = [start_process() for _ in range(args.processes)]
+    print(f"Started {len(processes)} worker processes")
+
+    while not stopping:
+        time.sleep(1)
+        for index, process in enumerate(processes):
+            if not process.is_alive() and not stopping:
+                # Its jobs are re-queued by the surviving workers' heartbeat check
+                print(f"[WARN] Worker process {process.pid} exited ({process.exitcode}), restarting")
+                processes[index] = start_process()
+
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+"""Test setup: every test session runs against a scratch directory and SQLite database.
+
+The app reads its settings and creates its engine at import time, so the
+environment is prepared here, before any ``app`` module is imported.
+"""
+
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+_WORK_DIR = tempfile.mkdtemp(prefix="scriptvox-tests-")
+os.chdir(_WORK_DIR)
+os.makedirs("data", exist_ok=True)
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(_WORK_DIR, 'data', 'test.db')}",
+    "RUN_EMBEDDED_WORKER": "false",
+    "CPU_POOL_WORKERS": "0",
+    "LLM_CACHE_ENABLED": "false",
+    "TTS_CACHE_ENABLED": "false",
+})
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    """A freshly created, empty schema; yields the engine."""
+    from sqlmodel import SQLModel
+    from app.core.database import create_db_and_tables, engine
+    from app.models import models  # noqa: F401
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE IF EXISTS schema_migration")
+    SQLModel.metadata.drop_all(engine)
+    create_db_and_tables()
+    yield engine
+
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, no padding: 417-byte frames of 1152 samples
+MP3_FRAME_HEADER = b"\xff\xfb\x90\x00"
+MP3_FRAME_LENGTH = 417
+MP3_FRAME_DURATION = 1152 / 44100
+
+
+@pytest.fixture
+def mp3_frames():
+    """``mp3_frames(n, fill)``: ``n`` valid MP3 frames whose payload bytes are ``fill``."""
+    def make(n: int, fill: int = 0) -> bytes:
+        return (MP3_FRAME_HEADER + bytes([fill]) * (MP3_FRAME_LENGTH - 4)) * n
+    return make
@@ -0,0 +1,62 @@
+import io
+
+from app.services import audio_assembler
+from app.services.audio_assembler import assemble_chapter, iter_mp3_frames, parse_frame_header
+from conftest import MP3_FRAME_DURATION, MP3_FRAME_HEADER, MP3_FRAME_LENGTH
+
+ID3_TAG = b"ID3\x03\x00\x00\x00\x00\x00\x05" + b"\x00" * 5
+
+
+def frames(data: bytes):
+    return list(iter_mp3_frames(io.BytesIO(data)))
+
+
+def test_parse_frame_header():
+    assert parse_frame_header(MP3_FRAME_HEADER) == (MP3_FRAME_LENGTH, MP3_FRAME_DURATION)
+    # Padding bit adds one byte
+    assert parse_frame_header(b"\xff\xfb\x92\x00")[0] == MP3_FRAME_LENGTH + 1
+    assert parse_frame_header(b"\xff\xfb\xf0\x00") is None  # Bad bitrate index
+    assert parse_frame_header(b"ID3\x03") is None
+    assert parse_frame_header(b"\xff\xfb") is None
+
+
+def test_tags_and_info_frame_are_dropped(mp3_frames):
+    info = MP3_FRAME_HEADER + b"\x00" * 32 + b"Info" + b"\x00" * (MP3_FRAME_LENGTH - 40)
+    data = ID3_TAG + info + mp3_frames(3, 1) + b"TAG" + b"\x00" * 125
+    assert [frame for frame, _ in frames(data)] == [mp3_frames(1, 1)] * 3
+
+
+def test_garbage_between_frames_is_skipped(mp3_frames):
+    data = mp3_frames(1, 1) + b"\x00\xff\x12junk" + mp3_frames(1, 2)
+    assert [frame for frame, _ in frames(data)] == [mp3_frames(1, 1), mp3_frames(1, 2)]
+
+
+def test_truncated_last_frame_is_dropped(mp3_frames):
+    data = mp3_frames(2, 1) + mp3_frames(1, 2)[:200]
+    assert [frame for frame, _ in frames(data)] == [mp3_frames(1, 1)] * 2
+
+
+def test_frames_spanning_read_chunks(monkeypatch, mp3_frames):
+    monkeypatch.setattr(audio_assembler, "READ_CHUNK", 100)
+    data = ID3_TAG + mp3_frames(5, 7)
+    result = frames(data)
+    assert len(result) == 5 and all(frame == mp3_frames(1, 7) for frame, _ in result)
+
+
+def test_chapter_is_the_concatenation_with_segment_offsets(tmp_path, mp3_frames):
+    first, second, broken = tmp_path / "1.mp3", tmp_path / "2.mp3", tmp_path / "3.mp3"
+    first.write_bytes(ID3_TAG + mp3_frames(10, 1))
+    second.write_bytes(mp3_frames(20, 2) + mp3_frames(1, 3)[:100])
+    broken.write_bytes(b"not audio")
+    output = tmp_path / "chapter.mp3"
+
+    offsets = assemble_chapter(
+        [(1, str(first)), (2, None), (3, str(second)), (4, str(broken)), (5, str(tmp_path / "missing.mp3"))],
+        str(output),
+    )
+    assert output.read_bytes() == mp3_frames(10, 1) + mp3_frames(20, 2)
+    assert offsets == [
+        (1, 0.0, round(10 * MP3_FRAME_DURATION, 3)),
+        (3, round(10 * MP3_FRAME_DURATION, 3), round(30 * MP3_FRAME_DURATION, 3)),
+    ]
+    assert not (tmp_path / "chapter.mp3.tmp").exists()
@@ -0,0 +1,133 @@
+import asyncio
+import os
+
+from app.services.audio_cache import AudioCache
+
+
+def producer(data: bytes, calls: list):
+    async def produce(path):
+        calls.append(path)
+        with open(path, "wb") as f:
+            f.write(data)
+    return produce
+
+
+def fetch(cache, key, output_path, data=b"x" * 100, calls=None):
+    return asyncio.run(cache.fetch(key, str(output_path), producer(data, calls if calls is not None else [])))
+
+
+def test_second_fetch_is_a_hit_and_skips_synthesis(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"), max_bytes=10_000)
+    key = AudioCache.make_key("edge", "voice", "Bonjour  le\nmonde")
+    calls = []
+    assert not fetch(cache, key, tmp_path / "a.mp3", calls=calls)
+    # Whitespace differences share the entry
+    assert AudioCache.make_key("edge", "voice", "Bonjour le monde") == key
+    assert fetch(cache, key, tmp_path / "b.mp3", calls=calls)
+    assert len(calls) == 1
+    assert (tmp_path / "b.mp3").read_bytes() == b"x" * 100
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"), max_bytes=250)
+    keys = [AudioCache.make_key("edge", "voice", text) for text in ("one", "two", "three")]
+    fetch(cache, keys[0], tmp_path / "1.mp3")
+    fetch(cache, keys[1], tmp_path / "2.mp3")
+    # Using the first entry makes the second one the oldest
+    assert fetch(cache, keys[0], tmp_path / "1b.mp3")
+    fetch(cache, keys[2], tmp_path / "3.mp3")
+
+    assert cache.evictions == 1
+    assert cache.stats()["size_bytes"] == 200
+    calls = []
+    assert fetch(cache, keys[0], tmp_path / "1c.mp3", calls=calls)
+    assert not fetch(cache, keys[1], tmp_path / "2b.mp3", calls=calls)
+    assert len(calls) == 1
+    # Materialized copies outlive the eviction of their entry
+    assert (tmp_path / "2.mp3").read_bytes() == b"x" * 100
+
+
+def test_an_entry_larger_than_the_cache_is_kept_alone(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"), max_bytes=50)
+    key = AudioCache.make_key("edge", "voice", "long")
+    fetch(cache, key, tmp_path / "a.mp3")
+    assert cache.stats()["entries"] == 1
+    assert fetch(cache, key, tmp_path / "b.mp3")
+
+
+def test_recency_survives_a_restart(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    cache = AudioCache(cache_dir, max_bytes=10_000)
+    old, recent = (AudioCache.make_key("edge", "voice", text) for text in ("old", "recent"))
+    fetch(cache, old, tmp_path / "1.mp3")
+    fetch(cache, recent, tmp_path / "2.mp3")
+    os.utime(cache._entry_path(old, ".mp3"), (1_000, 1_000))
+    os.utime(cache._entry_path(recent, ".mp3"), (2_000, 2_000))
+    # Leftover of an interrupted synthesis
+    leftover = cache._entry_path(old, ".mp3") + ".abc.tmp.mp3"
+    open(leftover, "wb").close()
+
+    # The limit was lowered: the oldest entry goes at startup
+    reopened = AudioCache(cache_dir, max_bytes=150)
+    assert reopened.evictions == 1
+    assert not os.path.exists(cache._entry_path(old, ".mp3"))
+    assert os.path.exists(cache._entry_path(recent, ".mp3"))
+    assert not os.path.exists(leftover)
+
+
+def test_concurrent_misses_synthesize_once(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"), max_bytes=10_000)
+    key = AudioCache.make_key("edge", "voice", "same")
+    calls = []
+
+    async def slow(path):
+        calls.append(path)
+        await asyncio.sleep(0.05)
+        with open(path, "wb") as f:
+            f.write(b"audio")
+
+    async def run():
+        return await asyncio.gather(*(cache.fetch(key, str(tmp_path / f"{n}.mp3"), slow) for n in range(3)))
+
+    assert sorted(asyncio.run(run())) == [False, True, True]
+    assert len(calls) == 1
+    assert all((tmp_path / f"{n}.mp3").read_bytes() == b"audio" for n in range(3))
+
+
+def test_failed_synthesis_is_not_cached(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"), max_bytes=10_000)
+    key = AudioCache.make_key("edge", "voice", "empty")
+    try:
+        fetch(cache, key, tmp_path / "a.mp3", data=b"")
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("an empty synthesis must fail")
+    assert cache.stats()["entries"] == 0
+    assert not fetch(cache, key, tmp_path / "a.mp3")
+
+
+def test_entries_are_shared_by_processes_using_the_same_directory(tmp_path):
+    # Two caches on one directory stand for two worker processes
+    cache_dir = str(tmp_path / "cache")
+    first, second = AudioCache(cache_dir, max_bytes=10_000), AudioCache(cache_dir, max_bytes=10_000)
+    key = AudioCache.make_key("edge", "voice", "shared")
+    calls = []
+    assert not fetch(first, key, tmp_path / "a.mp3", calls=calls)
+    assert fetch(second, key, tmp_path / "b.mp3", calls=calls)
+    assert len(calls) == 1
+    assert second.stats()["entries"] == 1 and second.stats()["size_bytes"] == 100
+
+    # Evicted by the other process: a miss, and the stale size is dropped
+    os.remove(first._entry_path(key, ".mp3"))
+    assert not fetch(second, key, tmp_path / "c.mp3", calls=calls)
+    assert second.stats()["size_bytes"] == 100 and len(calls) == 2
+
+
+def test_copy_mode_materializes_an_independent_file(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"), max_bytes=10_000, materialize="copy")
+    key = AudioCache.make_key("edge", "voice", "copy")
+    fetch(cache, key, tmp_path / "a.mp3")
+    assert fetch(cache, key, tmp_path / "b.mp3")
+    assert os.stat(tmp_path / "b.mp3").st_ino != os.stat(cache._entry_path(key, ".mp3")).st_ino
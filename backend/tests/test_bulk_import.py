@@ -0,0 +1,45 @@
+import asyncio
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app import importer
+from app.core.config import settings
+from app.models.models import Book, BookStatus, UploadedFile
+from app.services.bulk_import import BulkImporter
+from app.services.cpu_pool import cpu_pool_size
+
+
+def add_book(db, status, content_hash):
+    with Session(db) as session:
+        book = Book(title=content_hash, author="Author", status=status)
+        session.add(book)
+        session.commit()
+        session.add(UploadedFile(book_id=book.id, content_hash=content_hash, file_path=f"{content_hash}.epub",
+                                 original_filename=f"{content_hash}.epub", size=1))
+        session.commit()
+
+
+def test_books_still_processing_are_not_imported_again(db):
+    add_book(db, BookStatus.READY, "ready")
+    add_book(db, BookStatus.PROCESSING, "processing")
+    add_book(db, BookStatus.NEW, "new")
+    add_book(db, BookStatus.PROCESSING, "failed")
+    with db.begin() as conn:
+        # How a failed parse is stored
+        conn.execute(text("UPDATE book SET status = 'failed' WHERE title = 'failed'"))
+    assert BulkImporter._imported_hashes() == {"ready", "processing", "new"}
+
+
+def test_concurrency_flag_sizes_the_parser_pool(db, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "CPU_POOL_WORKERS", 2)
+    seen = []
+
+    async def run(self, paths, on_progress=None):
+        seen.append((self.concurrency, cpu_pool_size()))
+        return await original(self, paths, on_progress)
+
+    original = BulkImporter.run
+    monkeypatch.setattr(BulkImporter, "run", run)
+    assert asyncio.run(importer.run_import(str(tmp_path), True, False, 8)) == 0
+    assert seen == [(8, 8)]
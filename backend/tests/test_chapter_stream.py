@@ -0,0 +1,129 @@
+import asyncio
+import os
+
+from sqlmodel import Session, select
+
+from app.adapters.base import BaseTTS
+from app.models.models import Book, Chapter, ChapterStatus, Segment
+from app.services.chapter_stream import stream_chapter_audio
+from app.services.orchestrator import Orchestrator
+
+
+def add_chapter(engine, status, texts):
+    with Session(engine) as session:
+        book = Book(title="Book", author="Author")
+        session.add(book)
+        session.commit()
+        chapter = Chapter(book_id=book.id, position=1, title="One", status=status)
+        session.add(chapter)
+        session.commit()
+        segments = [Segment(chapter_id=chapter.id, text=text) for text in texts]
+        session.add_all(segments)
+        session.commit()
+        return chapter.id, book.id, [segment.id for segment in segments]
+
+
+def set_segment(engine, segment_id, **values):
+    with Session(engine) as session:
+        segment = session.get(Segment, segment_id)
+        for key, value in values.items():
+            setattr(segment, key, value)
+        session.add(segment)
+        session.commit()
+
+
+def set_status(engine, chapter_id, status):
+    with Session(engine) as session:
+        chapter = session.get(Chapter, chapter_id)
+        chapter.status = status
+        session.add(chapter)
+        session.commit()
+
+
+async def collect(stream):
+    return b"".join([chunk async for chunk in stream])
+
+
+def test_segments_are_sent_in_order_as_they_finish(db, tmp_path, mp3_frames):
+    chapter_id, _, (first, second, empty, third) = add_chapter(
+        db, ChapterStatus.PROCESSING, ["One.", "Two.", "  ", "Three."])
+    paths = []
+    for n, fill in enumerate([1, 2, 3]):
+        path = tmp_path / f"segment_{n}.mp3"
+        path.write_bytes(b"ID3\x03\x00\x00\x00\x00\x00\x00" + mp3_frames(200, fill))
+        paths.append(str(path))
+    set_segment(db, first, audio_file=paths[0])
+
+    async def run():
+        task = asyncio.create_task(collect(stream_chapter_audio(chapter_id, poll_interval=0.01)))
+        await asyncio.sleep(0.05)
+        # Third finishes before second: it must still come after it
+        set_segment(db, third, audio_file=paths[2])
+        await asyncio.sleep(0.05)
+        assert not task.done()
+        set_segment(db, second, audio_file=paths[1])
+        set_status(db, chapter_id, ChapterStatus.COMPLETED)
+        return await asyncio.wait_for(task, 5)
+
+    # Tags are dropped; frames are sent as they are
+    assert asyncio.run(run()) == mp3_frames(200, 1) + mp3_frames(200, 2) + mp3_frames(200, 3)
+
+
+def test_assembled_chapter_is_read_from_the_next_segment_start(db, tmp_path, mp3_frames):
+    chapter_id, _, (first, second) = add_chapter(db, ChapterStatus.COMPLETED, ["One.", "Two."])
+    chapter_file = tmp_path / "chapter.mp3"
+    chapter_file.write_bytes(mp3_frames(100, 1) + mp3_frames(50, 2))
+    duration = 100 * 1152 / 44100
+    set_segment(db, first, audio_file=str(chapter_file), start_time=0.0, end_time=duration)
+    set_segment(db, second, audio_file=str(chapter_file), start_time=duration, end_time=duration * 1.5)
+
+    assert asyncio.run(collect(stream_chapter_audio(chapter_id, poll_interval=0.01))) == \
+        mp3_frames(100, 1) + mp3_frames(50, 2)
+
+
+class GatedTTS(BaseTTS):
+    """Writes MP3 frames once ``release`` is set, so a test can look at a generation in progress."""
+
+    def __init__(self, frames: bytes):
+        self.frames = frames
+        self.release = asyncio.Event()
+
+    async def list_voices(self):
+        return []
+
+    async def generate_audio(self, text, voice_id, output_path):
+        await self.release.wait()
+        with open(output_path, "wb") as f:
+            f.write(self.frames)
+        return output_path
+
+
+def test_regeneration_never_streams_the_previous_chapter_file(db, mp3_frames):
+    chapter_id, book_id, segment_ids = add_chapter(db, ChapterStatus.COMPLETED, ["One.", "Two."])
+    chapter_dir = f"data/audio/book_{book_id}/chapter_1"
+    os.makedirs(chapter_dir, exist_ok=True)
+    old_file = f"{chapter_dir}/chapter.mp3"
+    with open(old_file, "wb") as f:
+        f.write(mp3_frames(20, 9))
+    for n, segment_id in enumerate(segment_ids):
+        set_segment(db, segment_id, audio_file=old_file, start_time=n * 0.26, end_time=(n + 1) * 0.26)
+
+    async def run():
+        tts = GatedTTS(mp3_frames(10, 5))
+        generation = asyncio.create_task(Orchestrator().generate_audio(chapter_id, tts))
+        await asyncio.sleep(0.2)
+        # Generation has started: the old audio is gone before any new segment exists
+        assert not os.path.exists(old_file)
+        with Session(db) as session:
+            assert session.get(Chapter, chapter_id).status == ChapterStatus.PROCESSING
+            assert all(s.audio_file is None for s in session.exec(select(Segment)
+                       .where(Segment.chapter_id == chapter_id)).all())
+
+        stream = asyncio.create_task(collect(stream_chapter_audio(chapter_id, poll_interval=0.01)))
+        await asyncio.sleep(0.05)
+        tts.release.set()
+        await generation
+        return await asyncio.wait_for(stream, 5)
+
+    streamed = asyncio.run(run())
+    assert streamed == mp3_frames(20, 5)
@@ -0,0 +1,76 @@
+from app.services.dialogue_splitter import attribution_excerpts, guess_speaker, split_dialogue
+
+
+def spans(text, **options):
+    result = split_dialogue(text, **options)
+    # Offsets always point back at the source text
+    assert all(text[s.start:s.end] == s.text for s in result)
+    return [(s.kind, s.text) for s in result]
+
+
+def test_guillemets_split_narration_and_dialogue():
+    assert spans("Il entra. « Bonjour, dit-il. » Puis il sortit.") == [
+        ("narration", "Il entra."),
+        ("dialogue", "« Bonjour, dit-il. »"),
+        ("narration", "Puis il sortit."),
+    ]
+
+
+def test_nested_guillemets_stay_in_one_quote():
+    assert spans("« Il a crié « non » puis rien », dit Ron.") == [
+        ("dialogue", "« Il a crié « non » puis rien »"),
+        ("narration", ", dit Ron."),
+    ]
+    assert spans("« Il m'a dit “ viens “ toi ” hier ” », dit Ron.")[0] == \
+        ("dialogue", "« Il m'a dit “ viens “ toi ” hier ” »")
+
+
+def test_quote_continued_over_paragraphs():
+    text = "« Le début d'un long discours\n\n« qui continue ici\n\n» et finit là », conclut-il. Il partit."
+    assert spans(text) == [
+        ("dialogue", "« Le début d'un long discours\n\n« qui continue ici\n\n» et finit là »"),
+        ("narration", ", conclut-il. Il partit."),
+    ]
+
+
+def test_nested_quote_closing_a_paragraph_does_not_end_the_speech():
+    text = "« Il a crié « non »\n\n« et encore « oui » », dit Ron. Fin."
+    assert spans(text)[0] == ("dialogue", "« Il a crié « non »\n\n« et encore « oui » »")
+
+
+def test_dash_lines_are_separate_turns():
+    assert spans("— Bonjour, dit Harry.\n— Salut, répondit Ron.") == [
+        ("dialogue", "— Bonjour, dit Harry."),
+        ("dialogue", "— Salut, répondit Ron."),
+    ]
+
+
+def test_hard_wrapped_narration_is_merged_up_to_the_limit():
+    text = "Le soleil se levait\nsur la ville. Il dormait.\n\nLe lendemain, rien."
+    assert spans(text) == [("narration", text)]
+    assert len(spans(text, max_narration_chars=20)) == 2
+
+
+def test_unclosed_straight_quote_is_narration():
+    assert spans('Il mesurait 6" de haut.') == [("narration", 'Il mesurait 6" de haut.')]
+
+
+def test_guess_speaker_from_incises():
+    names = ["Harry Potter", "Ron Weasley"]
+    after = "« Viens ici », dit Harry. Ron rit."
+    assert guess_speaker(after, split_dialogue(after)[0], names) == "Harry Potter"
+    before = "Ron demanda : « Pourquoi ? »"
+    assert guess_speaker(before, split_dialogue(before)[-1], names) == "Ron Weasley"
+    dash = "— Oui, répondit Ron.\n— Non, dit Harry."
+    assert [guess_speaker(dash, s, names) for s in split_dialogue(dash)] == ["Ron Weasley", "Harry Potter"]
+    unknown = "« Bonjour », dit Hermione."
+    assert guess_speaker(unknown, split_dialogue(unknown)[0], names) is None
+
+
+def test_close_quotes_share_an_excerpt():
+    text = "A. « un » B. « deux »" + " " * 400 + "« trois »"
+    quotes = [(n, s) for n, s in enumerate(s for s in split_dialogue(text) if s.kind == "dialogue")]
+    excerpts = attribution_excerpts(text, quotes, context_chars=50)
+    assert len(excerpts) == 2
+    assert "[#0] « un »" in excerpts[0] and "[#1] « deux »" in excerpts[0]
+    assert excerpts[1].strip() == "[#2] « trois »"
@@ -0,0 +1,227 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+from sqlmodel import Session
+
+from app.models.models import Job, JobKind, JobStatus, Worker, WorkerStatus
+from app.services.job_queue import JobCheckpoint, JobQueue, JobRunner
+
+
+def get_job(db, job_id) -> Job:
+    with Session(db) as session:
+        return session.get(Job, job_id)
+
+
+def expire_lease(db, job_id):
+    with Session(db) as session:
+        session.execute(update(Job).where(Job.id == job_id)
+                        .values(lease_expires_at=datetime.utcnow() - timedelta(seconds=1)))
+        session.commit()
+
+
+def test_jobs_are_claimed_once_in_order(db):
+    queue = JobQueue(lease_seconds=60)
+    first = queue.enqueue(JobKind.ANALYZE, book_id=1)
+    second = queue.enqueue(JobKind.ANALYZE, book_id=2)
+
+    assert queue.claim("a").id == first.id
+    assert queue.claim("b").id == second.id
+    assert queue.claim("c") is None
+    job = get_job(db, first.id)
+    assert job.status == JobStatus.RUNNING and job.lease_owner == "a" and job.attempts == 1
+
+
+def test_concurrent_claims_never_share_a_job(db):
+    queue = JobQueue(lease_seconds=60)
+    ids = {queue.enqueue(JobKind.SEGMENT, chapter_id=n).id for n in range(10)}
+
+    def claim_all(owner):
+        claimed = []
+        while (job := queue.claim(owner)) is not None:
+            claimed.append(job.id)
+        return claimed
+
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(claim_all, ["w1", "w2", "w3", "w4"]))
+    claimed = [job_id for result in results for job_id in result]
+    assert sorted(claimed) == sorted(ids)
+
+
+def test_expired_lease_passes_the_job_to_another_worker(db):
+    queue = JobQueue(lease_seconds=60)
+    job = queue.enqueue(JobKind.GENERATE, chapter_id=1)
+    assert queue.claim("old").id == job.id
+    assert queue.claim("new") is None
+
+    expire_lease(db, job.id)
+    assert queue.claim("new").id == job.id
+    assert get_job(db, job.id).attempts == 2
+
+    # The previous owner lost it: it can neither renew nor finish the job
+    assert not queue.renew_lease(job.id, "old")
+    assert not queue.complete(job.id, "old")
+    assert not queue.fail(job.id, "old", "late failure")
+    assert queue.renew_lease(job.id, "new")
+    assert queue.complete(job.id, "new")
+    assert get_job(db, job.id).status == JobStatus.COMPLETED
+
+
+def test_renewed_lease_is_not_claimable(db):
+    queue = JobQueue(lease_seconds=60)
+    job = queue.enqueue(JobKind.GENERATE, chapter_id=1)
+    queue.claim("owner")
+    expire_lease(db, job.id)
+    # Renewed just before the other worker looks: the job stays with its owner
+    assert queue.renew_lease(job.id, "owner")
+    assert queue.claim("other") is None
+
+
+def test_failure_retries_with_backoff_then_fails(db):
+    queue = JobQueue(lease_seconds=60)
+    job = queue.enqueue(JobKind.ANALYZE, book_id=1)
+    for attempt in range(1, job.max_attempts + 1):
+        with Session(db) as session:
+            session.execute(update(Job).where(Job.id == job.id).values(available_at=datetime.utcnow()))
+            session.commit()
+        assert queue.claim("w").id == job.id
+        assert queue.fail(job.id, "w", f"error {attempt}")
+        stored = get_job(db, job.id)
+        if attempt < job.max_attempts:
+            assert stored.status == JobStatus.QUEUED
+            assert stored.available_at > datetime.utcnow()
+            assert queue.claim("w") is None  # Still backing off
+    assert stored.status == JobStatus.FAILED
+    assert stored.last_error == f"error {job.max_attempts}"
+
+
+def test_release_does_not_use_up_an_attempt(db):
+    queue = JobQueue(lease_seconds=60)
+    job = queue.enqueue(JobKind.ANALYZE, book_id=1)
+    queue.claim("w")
+    assert queue.release(job.id, "w")
+    stored = get_job(db, job.id)
+    assert stored.status == JobStatus.QUEUED and stored.attempts == 0
+
+
+def test_released_job_resumes_on_its_next_claim(db):
+    queue = JobQueue(lease_seconds=60)
+    job = queue.enqueue(JobKind.ANALYZE, book_id=1)
+    first = queue.claim("w")
+    assert not JobCheckpoint(queue, first, "w").resuming
+    JobCheckpoint(queue, first, "w").save(stage="generating", completed_chapters=[1])
+    queue.release(job.id, "w")
+
+    again = queue.claim("w")
+    assert again.attempts == 1
+    checkpoint = JobCheckpoint(queue, again, "w")
+    assert checkpoint.resuming
+    assert checkpoint.get("completed_chapters") == [1]
+
+
+def test_expired_final_attempt_is_reaped(db):
+    queue = JobQueue(lease_seconds=60)
+    job = queue.enqueue(JobKind.ANALYZE, book_id=1)
+    with Session(db) as session:
+        session.execute(update(Job).where(Job.id == job.id).values(max_attempts=1))
+        session.commit()
+    queue.claim("w")
+    expire_lease(db, job.id)
+    assert queue.claim("other") is None
+    assert queue.reap_expired() == 1
+    assert get_job(db, job.id).status == JobStatus.FAILED
+
+
+def test_dead_worker_jobs_are_requeued(db):
+    queue = JobQueue(lease_seconds=600)
+    job = queue.enqueue(JobKind.GENERATE, chapter_id=1)
+    queue.register_worker("dead", 1)
+    queue.claim("dead")
+    with Session(db) as session:
+        session.execute(update(Worker).where(Worker.id == "dead")
+                        .values(last_heartbeat=datetime.utcnow() - timedelta(minutes=5)))
+        session.commit()
+
+    assert queue.requeue_dead_workers(dead_after=60) == 1
+    assert get_job(db, job.id).status == JobStatus.QUEUED
+    with Session(db) as session:
+        assert session.get(Worker, "dead").status == WorkerStatus.DEAD
+    assert queue.claim("alive").id == job.id
+
+
+def test_cancel_for_book_fails_queued_and_running_jobs(db):
+    queue = JobQueue(lease_seconds=60)
+    running = queue.enqueue(JobKind.ANALYZE, book_id=7)
+    queued = queue.enqueue(JobKind.ANALYZE, book_id=7)
+    other = queue.enqueue(JobKind.ANALYZE, book_id=8)
+    assert queue.claim("w").id == running.id
+
+    assert queue.cancel_for_book(7) == 2
+    for job_id in (running.id, queued.id):
+        job = get_job(db, job_id)
+        assert job.status == JobStatus.FAILED and job.last_error == "Book deleted"
+    # The running job's worker finds out on its next renewal
+    assert not queue.renew_lease(running.id, "w")
+    assert not queue.complete(running.id, "w")
+    assert get_job(db, running.id).status == JobStatus.FAILED
+    assert get_job(db, other.id).status == JobStatus.QUEUED
+
+
+class SlowOrchestrator:
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.cancelled = False
+        self.resuming = []
+
+    async def run_job(self, job, llm_service, tts_service, checkpoint):
+        self.resuming.append(checkpoint.resuming)
+        self.started.set()
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+def test_runner_stops_a_job_whose_book_is_deleted(db):
+    queue = JobQueue(lease_seconds=3)
+    job = queue.enqueue(JobKind.ANALYZE, book_id=5)
+
+    async def run():
+        runner = JobRunner(None, None, queue=queue, owner="runner")
+        runner.orchestrator = SlowOrchestrator()
+        await runner.start()
+        try:
+            await asyncio.wait_for(runner.orchestrator.started.wait(), 5)
+            queue.cancel_for_book(5)
+            # The lease heartbeat (every second here) notices and cancels the task
+            for _ in range(50):
+                if runner.orchestrator.cancelled:
+                    break
+                await asyncio.sleep(0.1)
+            return runner.orchestrator.cancelled
+        finally:
+            await runner.stop()
+
+    assert asyncio.run(run())
+    stored = get_job(db, job.id)
+    assert stored.status == JobStatus.FAILED and stored.last_error == "Book deleted"
+
+
+def test_job_interrupted_by_a_runner_stop_resumes_in_the_next_runner(db):
+    queue = JobQueue(lease_seconds=60)
+    job = queue.enqueue(JobKind.ANALYZE, book_id=5)
+
+    async def run_once():
+        runner = JobRunner(None, None, queue=queue, owner="runner")
+        runner.orchestrator = SlowOrchestrator()
+        await runner.start()
+        await asyncio.wait_for(runner.orchestrator.started.wait(), 5)
+        # A graceful restart of the API or the worker
+        await runner.stop()
+        return runner.orchestrator.resuming
+
+    assert asyncio.run(run_once()) == [False]
+    assert get_job(db, job.id).status == JobStatus.QUEUED
+    assert asyncio.run(run_once()) == [True]
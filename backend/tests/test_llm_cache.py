@@ -0,0 +1,68 @@
+import pytest
+
+from app.services import llm_cache
+from app.services.llm_cache import LLMResponseCache, bypass_llm_cache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    class Clock:
+        now = 1_000_000.0
+
+        @classmethod
+        def time(cls):
+            return cls.now
+
+    monkeypatch.setattr(llm_cache, "time", Clock)
+    return Clock
+
+
+def put(cache, key, response):
+    cache.put(key, "ollama", "model", "v1", "assign_roles", response)
+
+
+def test_key_covers_the_prompt_inputs():
+    key = LLMResponseCache.make_key("ollama", "model", "v1", "assign_roles", "Some  text", ["Harry"])
+    assert key == LLMResponseCache.make_key("ollama", "model", "v1", "assign_roles", "Some text", ["Harry"])
+    assert key != LLMResponseCache.make_key("ollama", "model", "v2", "assign_roles", "Some text", ["Harry"])
+    assert key != LLMResponseCache.make_key("ollama", "model", "v1", "assign_roles", "Some text", ["Ron"])
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = LLMResponseCache(str(tmp_path / "llm.db"), max_entries=2)
+    put(cache, "a", [1])
+    clock.now += 1
+    put(cache, "b", [2])
+    clock.now += 1
+    assert cache.get("a") == [1]  # "b" is now the oldest
+    clock.now += 1
+    put(cache, "c", [3])
+
+    assert cache.get("b") is None
+    assert cache.get("a") == [1] and cache.get("c") == [3]
+    assert cache.stats()["entries"] == 2
+
+
+def test_expired_entries_are_ignored_and_purged(tmp_path, clock):
+    path = str(tmp_path / "llm.db")
+    cache = LLMResponseCache(path, ttl_seconds=60)
+    put(cache, "old", {"x": 1})
+    clock.now += 30
+    put(cache, "new", {"x": 2})
+    clock.now += 45
+    assert cache.get("old") is None
+    assert cache.get("new") == {"x": 2}
+    # Reopening purges what expired meanwhile
+    clock.now += 60
+    assert LLMResponseCache(path, ttl_seconds=60).stats()["entries"] == 0
+
+
+def test_bypass_skips_lookups_but_stores_the_fresh_response(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.db"))
+    put(cache, "key", "stale")
+    with bypass_llm_cache():
+        assert cache.get("key") is None
+        put(cache, "key", "fresh")
+    assert cache.get("key") == "fresh"
+    assert cache.stats()["bypassed"] == 1
+    assert cache.clear() == 1
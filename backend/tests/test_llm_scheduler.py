@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+from app.services import llm_scheduler
+from app.services.llm_scheduler import LLMRateLimitError, LLMScheduler, is_throttled
+
+
+class Throttled(Exception):
+    code = 429
+
+
+def make_scheduler(db, **overrides):
+    options = dict(requests_per_minute=2, tokens_per_minute=1000, max_concurrency=4,
+                   max_retries=2, base_delay=0.01, max_delay=0.02, engine=db)
+    options.update(overrides)
+    return LLMScheduler("Test", **options)
+
+
+async def ok():
+    return "ok"
+
+
+@pytest.fixture
+def frozen_clock(monkeypatch):
+    """Stops bucket refills, so levels can be compared exactly."""
+    class Clock:
+        now = 1_000_000.0
+
+        @classmethod
+        def time(cls):
+            return cls.now
+
+        monotonic = time
+
+    monkeypatch.setattr(llm_scheduler, "time", Clock)
+    return Clock
+
+
+def test_budget_is_shared_by_schedulers_in_other_processes(db, frozen_clock):
+    # Two schedulers with the same name stand for the same provider used by two processes
+    api, worker = make_scheduler(db), make_scheduler(db)
+    assert api._take(10) is None
+    assert worker._take(10) is None
+    # The minute's two requests are spent: a third caller in either process has to wait ~30s
+    assert api._take(10) == pytest.approx(30)
+    assert worker.stats()["requests_available"] == 0
+    # Refills are shared too
+    frozen_clock.now += 30
+    assert worker._take(10) is None
+    assert api._take(10) == pytest.approx(30)
+
+
+def test_token_budget_is_taken_with_the_request(db, frozen_clock):
+    scheduler = make_scheduler(db, requests_per_minute=100)
+    assert scheduler._take(900) is None
+    # Not enough tokens left: the request is not spent either
+    assert scheduler._take(500) == pytest.approx(24)
+    stats = scheduler.stats()
+    assert stats["requests_available"] == 99
+    assert stats["tokens_available"] == 100
+
+
+def test_reported_usage_corrects_the_estimate(db, frozen_clock):
+    scheduler = make_scheduler(db, requests_per_minute=100)
+    asyncio.run(scheduler.run(ok, "x" * 40, expected_output_tokens=89, usage=lambda result: 600))
+    # 100 tokens were estimated, 600 reported
+    assert scheduler.stats()["tokens_available"] == 400
+
+
+def test_throttling_drains_the_shared_budget_and_retries(db, monkeypatch):
+    monkeypatch.setattr(llm_scheduler.TokenBucket, "wait_time", lambda self, conn, amount: 0.0)
+    scheduler, other = make_scheduler(db, requests_per_minute=60), make_scheduler(db, requests_per_minute=60)
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise Throttled()
+        return "ok"
+
+    assert asyncio.run(scheduler.run(flaky, "prompt")) == "ok"
+    assert len(attempts) == 2
+    assert scheduler.throttled == 1
+    # The other process sees the drained budget too
+    assert other.stats()["requests_available"] < 2
+
+
+def test_persistent_throttling_raises_rate_limit_error(db, monkeypatch):
+    monkeypatch.setattr(llm_scheduler.TokenBucket, "take", lambda self, conn, amount: True)
+
+    async def always_throttled():
+        raise Throttled()
+
+    scheduler = make_scheduler(db)
+    with pytest.raises(LLMRateLimitError):
+        asyncio.run(scheduler.run(always_throttled, "prompt"))
+    assert scheduler.throttled == 3
+    assert scheduler.in_flight == 0
+
+
+def test_other_errors_are_not_retried(db):
+    scheduler = make_scheduler(db)
+    calls = []
+
+    async def broken():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        asyncio.run(scheduler.run(broken, "prompt"))
+    assert calls == [1] and scheduler.in_flight == 0
+
+
+def test_is_throttled():
+    assert is_throttled(Throttled())
+    assert not is_throttled(ValueError())
@@ -0,0 +1,89 @@
+from sqlalchemy import create_engine, inspect, text
+from sqlmodel import SQLModel
+
+from app.core.migrations import MIGRATIONS, run_migrations
+from app.models import models  # noqa: F401  (registers the tables)
+
+# The schema as created by the first release, before any migration existed
+BASELINE_SCHEMA = [
+    "CREATE TABLE book (id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, author VARCHAR NOT NULL, "
+    "cover_path VARCHAR, status VARCHAR(10) NOT NULL, created_at DATETIME NOT NULL)",
+    "CREATE TABLE character (id INTEGER PRIMARY KEY, book_id INTEGER NOT NULL REFERENCES book (id), "
+    "name VARCHAR NOT NULL, gender VARCHAR, age_category VARCHAR, tone VARCHAR, voice_quality VARCHAR, "
+    "description VARCHAR, assigned_voice_id VARCHAR)",
+    "CREATE TABLE chapter (id INTEGER PRIMARY KEY, book_id INTEGER NOT NULL REFERENCES book (id), "
+    "position INTEGER NOT NULL, title VARCHAR NOT NULL, content_text VARCHAR NOT NULL, audio_path VARCHAR, "
+    "status VARCHAR(10) NOT NULL, progress INTEGER NOT NULL)",
+    "CREATE TABLE segment (id INTEGER PRIMARY KEY, chapter_id INTEGER NOT NULL REFERENCES chapter (id), "
+    "text VARCHAR NOT NULL, speaker_id INTEGER REFERENCES character (id), audio_file VARCHAR, "
+    "start_time FLOAT, end_time FLOAT)",
+]
+
+
+def baseline_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        for statement in BASELINE_SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(text("INSERT INTO book VALUES (1, 'Book', 'Author', NULL, 'READY', '2024-01-01')"))
+        conn.execute(text("INSERT INTO chapter VALUES (1, 1, 1, 'One', 'First line\nSecond line\n', NULL, 'PENDING', 0)"))
+        conn.execute(text("INSERT INTO chapter VALUES (2, 1, 2, 'Two', '', NULL, 'PENDING', 0)"))
+    return engine
+
+
+def test_versions_are_consecutive():
+    assert [m.version for m in MIGRATIONS] == list(range(1, len(MIGRATIONS) + 1))
+    assert len({m.name for m in MIGRATIONS}) == len(MIGRATIONS)
+
+
+def test_baseline_database_is_brought_to_the_current_schema(tmp_path):
+    engine = baseline_engine(tmp_path)
+    assert run_migrations(engine) == [m.version for m in MIGRATIONS]
+
+    inspector = inspect(engine)
+    for table in SQLModel.metadata.sorted_tables:
+        assert inspector.has_table(table.name), table.name
+        # Every column of the models exists, added ones included
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        assert {c.name for c in table.columns} <= existing, table.name
+    indexes = {i["name"] for t in ("chapter", "character", "segment", "job") for i in inspector.get_indexes(t)}
+    assert {"ix_chapter_book_id_position", "ix_character_book_id", "ix_segment_chapter_id_id",
+            "ix_job_book_id", "ix_job_status_available_at"} <= indexes
+
+    with engine.connect() as conn:
+        paragraphs = conn.execute(text(
+            "SELECT ordinal, char_offset, text FROM paragraph WHERE chapter_id = 1 ORDER BY ordinal"
+        )).all()
+        assert [tuple(p) for p in paragraphs] == [(0, 0, "First line"), (1, 11, "Second line"), (2, 23, "")]
+        assert conn.execute(text("SELECT content_text FROM chapter WHERE id = 1")).scalar_one() == ""
+        # An empty legacy chapter has nothing to move
+        assert conn.execute(text("SELECT COUNT(*) FROM paragraph WHERE chapter_id = 2")).scalar_one() == 0
+        recorded = conn.execute(text("SELECT version, name FROM schema_migration ORDER BY version")).all()
+    assert [tuple(r) for r in recorded] == [(m.version, m.name) for m in MIGRATIONS]
+
+
+def test_migrations_run_once(tmp_path):
+    engine = baseline_engine(tmp_path)
+    run_migrations(engine)
+    assert run_migrations(engine) == []
+
+
+def test_new_database_records_every_migration(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'new.db'}")
+    SQLModel.metadata.create_all(engine)
+    assert run_migrations(engine) == [m.version for m in MIGRATIONS]
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM paragraph")).scalar_one() == 0
+
+
+def test_partially_migrated_database_gets_only_the_missing_ones(tmp_path):
+    engine = baseline_engine(tmp_path)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE schema_migration (version INTEGER PRIMARY KEY, name VARCHAR NOT NULL, "
+            "applied_at TIMESTAMP NOT NULL)"
+        ))
+        conn.execute(text("INSERT INTO schema_migration VALUES (1, 'job_table', '2024-01-01')"))
+    # As at startup: create_all first, then the migrations
+    SQLModel.metadata.create_all(engine)
+    assert run_migrations(engine) == [m.version for m in MIGRATIONS[1:]]
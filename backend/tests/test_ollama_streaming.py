@@ -0,0 +1,131 @@
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+
+from app.adapters.json_stream import JsonArrayStream
+from app.adapters.llm_adapters import OllamaLLMAdapter
+
+
+def feed_all(text: str, size: int):
+    parser = JsonArrayStream()
+    items = []
+    for i in range(0, len(text), size):
+        items.extend(parser.feed(text[i:i + size]))
+    return parser, items
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_elements_come_out_whatever_the_fragment_size(size):
+    text = '[{"text": "He said \\"hi\\", [then] left.", "speaker": "Narrator"}, {"text": "}{", "speaker": "Ann"}]'
+    _, items = feed_all(text, size)
+    assert items == [
+        {"text": 'He said "hi", [then] left.', "speaker": "Narrator"},
+        {"text": "}{", "speaker": "Ann"},
+    ]
+
+
+def test_each_element_is_emitted_as_soon_as_it_closes():
+    parser = JsonArrayStream()
+    assert parser.feed('```json\n{"segments": [{"a": 1}') == [{"a": 1}]
+    assert parser.feed(', {"b": [2, 3]') == []
+    assert parser.feed('}, 4, true, "x"') == [{"b": [2, 3]}, 4, True]
+    assert parser.feed(']}\n```') == ["x"]
+    assert parser.done
+    assert parser.finish() == {"segments": [{"a": 1}, {"b": [2, 3]}, 4, True, "x"]}
+
+
+def test_malformed_element_is_skipped():
+    _, items = feed_all('[{"a": 1}, {"a": nope}, {"a": 3}]', 5)
+    assert items == [{"a": 1}, {"a": 3}]
+
+
+def test_no_array_falls_back_to_finish():
+    parser, items = feed_all('{"text": "Hello", "speaker": "Narrator"}', 4)
+    assert items == [] and parser.count == 0
+    assert parser.finish() == {"text": "Hello", "speaker": "Narrator"}
+
+
+class FakeOllama:
+    """A local server answering /api/generate with NDJSON chunks, pausing between them."""
+
+    def __init__(self, fragments, delay=0.05):
+        self.fragments = fragments
+        self.delay = delay
+        self.requests = []
+
+    async def generate(self, request):
+        self.requests.append(await request.json())
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        for fragment in self.fragments:
+            await response.write(json.dumps({"response": fragment, "done": False}).encode() + b"\n")
+            await asyncio.sleep(self.delay)
+        await response.write(json.dumps({"response": "", "done": True}).encode() + b"\n")
+        return response
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/api/generate", self.generate)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+def test_stream_roles_yields_segments_before_the_response_ends():
+    fragments = ['[{"text": "The door', ' opened.", "speaker": "Narrator"},', ' {"text": "Hi!", ',
+                 '"speaker": "Jane"}', ']']
+    server = FakeOllama(fragments, delay=0.2)
+
+    async def run():
+        base_url = await server.start()
+        adapter = OllamaLLMAdapter(model_name="test-model", base_url=base_url)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        arrivals = []
+        try:
+            async for segment in adapter.stream_roles("The door opened. Hi!", [{"name": "Jane", "gender": "female"}]):
+                arrivals.append((loop.time() - started, segment))
+        finally:
+            await adapter.close()
+            await server.stop()
+        return arrivals
+
+    arrivals = asyncio.run(run())
+    assert [segment for _, segment in arrivals] == [
+        {"text": "The door opened.", "speaker": "Narrator"},
+        {"text": "Hi!", "speaker": "Jane"},
+    ]
+    # The first segment arrived while the server was still sending the rest
+    assert arrivals[0][0] < arrivals[1][0] - 0.3
+    assert server.requests[0]["stream"] is True
+    assert server.requests[0]["model"] == "test-model"
+
+
+def test_assign_roles_reuses_one_session_and_close_releases_it():
+    server = FakeOllama(['{"text": "Alone.", "speaker": "Narrator"}'], delay=0)
+
+    async def run():
+        base_url = await server.start()
+        adapter = OllamaLLMAdapter(model_name="test-model", base_url=base_url)
+        try:
+            first = await adapter.assign_roles("Alone.", [])
+            session = adapter._session
+            second = await adapter.assign_roles("Alone.", [])
+            assert adapter._session is session
+            await adapter.close()
+            assert session.closed
+            return first, second
+        finally:
+            await server.stop()
+
+    first, second = asyncio.run(run())
+    # A single object instead of an array is accepted as one segment
+    assert first == second == [{"text": "Alone.", "speaker": "Narrator"}]
@@ -0,0 +1,32 @@
+import asyncio
+
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models.models import Book, Chapter, Segment
+from app.services.ebook_parser import ParsedBook, ParsedChapter
+from app.services.orchestrator import Orchestrator
+
+
+def test_parsing_again_removes_the_old_chapters_segments(db, monkeypatch):
+    with Session(db) as session:
+        book = Book(title="Book", author="Author")
+        session.add(book)
+        session.commit()
+        chapter = Chapter(book_id=book.id, position=1, title="Old")
+        session.add(chapter)
+        session.commit()
+        session.add(Segment(chapter_id=chapter.id, text="Old segment."))
+        session.commit()
+        book_id = book.id
+
+    orchestrator = Orchestrator()
+    parsed = ParsedBook("New", "Author", None, [ParsedChapter("One", "Text.", 1)])
+    monkeypatch.setattr(settings, "EPUB_PARSER_MODE", "full")
+    monkeypatch.setattr(orchestrator.parser, "parse_epub", lambda path: parsed)
+    asyncio.run(orchestrator._parse_and_save(book_id, "book.epub"))
+
+    with Session(db) as session:
+        chapters = session.exec(select(Chapter).where(Chapter.book_id == book_id)).all()
+        assert [c.title for c in chapters] == ["One"]
+        assert session.exec(select(Segment)).all() == []
@@ -0,0 +1,121 @@
+import asyncio
+import time
+
+import pytest
+from sqlmodel import Session, select
+
+from app.models.models import Book, Chapter, Segment
+from app.services import progress_writer
+from app.services.progress_writer import ProgressWriter
+
+
+@pytest.fixture
+def chapter(db):
+    with Session(db) as session:
+        book = Book(title="t", author="a")
+        session.add(book)
+        session.commit()
+        chapter = Chapter(book_id=book.id, position=1, title="c")
+        session.add(chapter)
+        session.commit()
+        for i in range(4):
+            session.add(Segment(chapter_id=chapter.id, text=f"s{i}"))
+        session.commit()
+        segment_ids = list(session.exec(select(Segment.id).order_by(Segment.id)).all())
+        return chapter.id, segment_ids
+
+
+def _stored(engine, chapter_id):
+    with Session(engine) as session:
+        files = {s.id: s.audio_file for s in session.exec(select(Segment)).all()}
+        return files, session.get(Chapter, chapter_id).progress
+
+
+def test_flush_writes_files_and_progress(db, chapter):
+    chapter_id, segment_ids = chapter
+    writer = ProgressWriter(chapter_id, total_segments=4, flush_interval=60, flush_every=100)
+    writer.segment_done(segment_ids[0], "a.mp3")
+    writer.segment_done(segment_ids[1], None)
+    asyncio.run(writer.flush())
+
+    files, progress = _stored(db, chapter_id)
+    assert files[segment_ids[0]] == "a.mp3"
+    assert files[segment_ids[1]] is None
+    assert progress == 50
+    assert writer._pending_files == {}
+
+
+def test_failed_flush_keeps_results_for_the_next_one(db, chapter, monkeypatch):
+    chapter_id, segment_ids = chapter
+    writer = ProgressWriter(chapter_id, total_segments=4, flush_interval=60, flush_every=100)
+    writer.segment_done(segment_ids[0], "a.mp3")
+    writer.segment_done(segment_ids[1], "b.mp3")
+
+    class FailingSession(progress_writer.Session):
+        def commit(self):
+            raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(progress_writer, "Session", FailingSession)
+    with pytest.raises(RuntimeError):
+        asyncio.run(writer.flush())
+    assert len(writer._pending_files) == 2
+
+    monkeypatch.undo()
+    asyncio.run(writer.flush())
+    files, progress = _stored(db, chapter_id)
+    assert files[segment_ids[0]] == "a.mp3" and files[segment_ids[1]] == "b.mp3"
+    assert progress == 50
+
+
+def test_context_manager_flushes_on_exit(db, chapter):
+    chapter_id, segment_ids = chapter
+
+    async def run():
+        async with ProgressWriter(chapter_id, total_segments=4, flush_interval=60, flush_every=100) as writer:
+            for segment_id in segment_ids:
+                writer.segment_done(segment_id, f"{segment_id}.mp3")
+
+    asyncio.run(run())
+    files, progress = _stored(db, chapter_id)
+    assert all(files[i] == f"{i}.mp3" for i in segment_ids)
+    assert progress == 100
+
+
+def test_progress_is_never_lowered_within_a_run(db, chapter):
+    chapter_id, segment_ids = chapter
+    writer = ProgressWriter(chapter_id, total_segments=4, flush_interval=60, flush_every=100)
+    for segment_id in segment_ids[:3]:
+        writer.segment_done(segment_id)
+    asyncio.run(writer.flush())
+    writer.completed = 1
+    asyncio.run(writer.flush())
+    assert _stored(db, chapter_id)[1] == 75
+
+
+def test_flush_does_not_block_the_event_loop(db, chapter, monkeypatch):
+    chapter_id, segment_ids = chapter
+    writer = ProgressWriter(chapter_id, total_segments=4, flush_interval=60, flush_every=100)
+    write = writer._write
+
+    def slow_write(pending, progress):
+        time.sleep(0.2)  # A busy database
+        write(pending, progress)
+
+    monkeypatch.setattr(writer, "_write", slow_write)
+
+    async def run():
+        writer.segment_done(segment_ids[0], "a.mp3")
+        flush = asyncio.create_task(writer.flush())
+        ticks = 0
+        while not flush.done():
+            ticks += 1
+            if ticks == 2:
+                # Finished while the transaction is running: kept for the next flush
+                writer.segment_done(segment_ids[1], "b.mp3")
+            await asyncio.sleep(0.01)
+        await flush
+        return ticks
+
+    assert asyncio.run(run()) > 5
+    assert writer._pending_files == {segment_ids[1]: "b.mp3"}
+    assert _stored(db, chapter_id)[0][segment_ids[0]] == "a.mp3"
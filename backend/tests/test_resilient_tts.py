@@ -0,0 +1,184 @@
+import asyncio
+
+import aiohttp
+import pytest
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+from app.adapters.base import BaseTTS
+from app.adapters.resilient_tts import CircuitBreaker, ResilientTTSAdapter, is_retryable
+
+
+def response_error(status: int) -> aiohttp.ClientResponseError:
+    url = URL("https://tts.example/synthesize")
+    request_info = aiohttp.RequestInfo(url, "POST", CIMultiDictProxy(CIMultiDict()), url)
+    return aiohttp.ClientResponseError(request_info, (), status=status)
+
+
+class FlakyTTS(BaseTTS):
+    """Raises the queued errors in order, then succeeds; counts calls."""
+
+    def __init__(self, errors=(), delay: float = 0.0):
+        self.errors = list(errors)
+        self.delay = delay
+        self.calls = 0
+
+    async def list_voices(self):
+        return []
+
+    async def generate_audio(self, text, voice_id, output_path):
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        # Leave a partial file behind, as an interrupted download would
+        with open(output_path, "wb") as f:
+            f.write(b"partial")
+        if self.errors:
+            raise self.errors.pop(0)
+        return output_path
+
+
+class LocalTTS(FlakyTTS):
+    remote = False
+    request_timeout = 5.0
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (response_error(429), True),
+    (response_error(503), True),
+    (response_error(408), True),
+    (response_error(400), False),
+    (response_error(404), False),
+    (asyncio.TimeoutError(), True),
+    (ConnectionResetError(), True),
+    (aiohttp.ServerDisconnectedError(), True),
+    (ValueError("unknown voice"), False),
+    (RuntimeError("XTTS synthesis failed"), False),
+])
+def test_retryable_classification(error, retryable):
+    assert is_retryable(error) is retryable
+
+
+def test_transient_failures_are_retried_with_bounded_backoff(tmp_path, monkeypatch):
+    sleeps = []
+    real_sleep = asyncio.sleep
+
+    async def record_sleep(delay):
+        sleeps.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr("app.adapters.resilient_tts.asyncio.sleep", record_sleep)
+    inner = FlakyTTS([response_error(503), ConnectionResetError(), asyncio.TimeoutError()])
+    tts = ResilientTTSAdapter(inner, max_attempts=4, base_delay=1.0, max_delay=3.0, timeout=1.0,
+                              breaker=CircuitBreaker(10, 1.0))
+    output = str(tmp_path / "out.mp3")
+
+    assert asyncio.run(tts.generate_audio("Hello", "voice", output)) == output
+    assert inner.calls == 4
+    # Full jitter: attempt n waits at most min(max_delay, base_delay * 2 ** (n - 1))
+    assert len(sleeps) == 3
+    for delay, cap in zip(sleeps, [1.0, 2.0, 3.0]):
+        assert 0 <= delay <= cap
+
+
+def test_permanent_error_is_raised_at_once_and_partial_file_removed(tmp_path):
+    inner = FlakyTTS([ValueError("unknown voice")])
+    tts = ResilientTTSAdapter(inner, max_attempts=4, base_delay=0.01, breaker=CircuitBreaker(1, 60))
+    output = tmp_path / "out.mp3"
+
+    with pytest.raises(ValueError):
+        asyncio.run(tts.generate_audio("Hello", "voice", str(output)))
+    assert inner.calls == 1
+    assert not output.exists()
+    # A request error says nothing about the provider's health
+    assert tts.breaker.state == "closed" and tts.breaker.failures == 0
+
+
+def test_last_attempt_error_propagates(tmp_path):
+    inner = FlakyTTS([response_error(502)] * 3)
+    tts = ResilientTTSAdapter(inner, max_attempts=3, base_delay=0.001, breaker=CircuitBreaker(10, 60))
+    with pytest.raises(aiohttp.ClientResponseError):
+        asyncio.run(tts.generate_audio("Hello", "voice", str(tmp_path / "out.mp3")))
+    assert inner.calls == 3
+
+
+def test_breaker_opens_probes_and_closes():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.1)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        breaker.record_failure()
+        assert breaker.state == "closed"
+        breaker.record_failure()
+        assert breaker.state == "open"
+
+        # Callers wait for the reset timeout, then one of them probes
+        started = loop.time()
+        await breaker.acquire()
+        assert loop.time() - started >= 0.09
+        assert breaker.state == "half-open"
+
+        # Other callers wait for the probe's outcome
+        waiter = asyncio.create_task(breaker.acquire())
+        await asyncio.sleep(0.02)
+        assert not waiter.done()
+        breaker.record_success()
+        await asyncio.wait_for(waiter, 1)
+        assert breaker.state == "closed" and breaker.failures == 0
+
+    asyncio.run(run())
+
+
+def test_failed_probe_opens_the_circuit_again():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+
+    async def run():
+        breaker.record_failure()
+        await breaker.acquire()
+        assert breaker.state == "half-open"
+        breaker.record_failure()
+        assert breaker.state == "open"
+        # A released probe (non-transient error) lets the next caller probe instead
+        await breaker.acquire()
+        breaker.release_probe()
+        await asyncio.wait_for(breaker.acquire(), 1)
+        assert breaker.state == "half-open"
+
+    asyncio.run(run())
+
+
+def test_open_circuit_pauses_requests(tmp_path):
+    inner = FlakyTTS([response_error(503), response_error(503)])
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+    tts = ResilientTTSAdapter(inner, max_attempts=3, base_delay=0.0, breaker=breaker)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await tts.generate_audio("Hello", "voice", str(tmp_path / "out.mp3"))
+        return loop.time() - started
+
+    # Two failures open the circuit; the third attempt is the probe after the reset timeout
+    assert asyncio.run(run()) >= 0.19
+    assert inner.calls == 3
+    assert breaker.state == "closed"
+
+
+def test_local_engine_uses_its_own_timeout_and_no_breaker(tmp_path):
+    inner = LocalTTS([asyncio.TimeoutError()] * 10)
+    tts = ResilientTTSAdapter(inner, max_attempts=3, base_delay=0.0)
+    assert tts.timeout == 5.0
+    assert tts.breaker is None
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(tts.generate_audio("Hello", "voice", str(tmp_path / "out.mp3")))
+    assert inner.calls == 3
+
+
+def test_slow_call_times_out_and_is_retried(tmp_path):
+    inner = FlakyTTS(delay=0.2)
+    tts = ResilientTTSAdapter(inner, max_attempts=2, base_delay=0.0, timeout=0.05, breaker=CircuitBreaker(10, 60))
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(tts.generate_audio("Hello", "voice", str(tmp_path / "out.mp3")))
+    assert inner.calls == 2
+    assert tts.breaker.failures == 2
@@ -0,0 +1,80 @@
+from app.services.role_windows import make_windows, stitch_windows
+
+TEXT = "".join(f"Paragraphe {n}. « Réplique {n} », dit Harry.\n" for n in range(10))
+
+
+def model_output(text):
+    """What a well-behaved model returns for ``text``: narration, quote, incise."""
+    segments = []
+    for line in text.splitlines():
+        open_at, close_at = line.index("«"), line.index("»") + 1
+        segments += [
+            {"text": line[:open_at], "speaker": "Narrator"},
+            {"text": line[open_at:close_at], "speaker": "Harry"},
+            {"text": line[close_at:], "speaker": "Narrator"},
+        ]
+    return segments
+
+
+def test_windows_are_paragraph_aligned_with_overlap():
+    windows = make_windows(TEXT, 100, 50)
+    assert windows[0].start == windows[0].own_start == 0
+    assert windows[-1].end == len(TEXT)
+    for previous, window in zip(windows, windows[1:]):
+        assert window.own_start == previous.end
+        assert TEXT[window.own_start - 1] == "\n" and TEXT[window.start - 1] == "\n"
+        assert window.own_start - 50 <= window.start < window.own_start
+    assert make_windows("court", 100, 50) == [make_windows("court", 100, 50)[0]]
+
+
+def test_stitched_segments_cover_the_chapter_once():
+    windows = make_windows(TEXT, 100, 50)
+    segments, coverage = stitch_windows(TEXT, windows, [model_output(TEXT[w.start:w.end]) for w in windows])
+    assert coverage == 1.0
+    assert len(segments) == 30
+    assert [s["speaker"] for s in segments[:3]] == ["Narrator", "Harry", "Narrator"]
+    for segment, following in zip(segments, segments[1:]):
+        assert TEXT[segment["start"]:segment["end"]] == segment["text"]
+        assert segment["end"] <= following["start"]
+        assert TEXT[segment["end"]:following["start"]].strip() == ""
+
+
+def test_rewritten_and_dropped_text_is_kept_from_the_source():
+    text = "Il entra. « Bonjour », dit Harry. Il sortit."
+    results = [[
+        {"text": "il   entra.", "speaker": "Narrator"},
+        {"text": '"Bonjour"', "speaker": "Harry"},  # Quotes normalized by the model
+        {"text": "Une phrase que le texte ne contient pas.", "speaker": "Ron"},
+    ]]
+    segments, coverage = stitch_windows(text, make_windows(text, 1000, 0), results)
+    assert [(s["text"], s["speaker"]) for s in segments] == [
+        ("Il entra.", "Narrator"),
+        ("« Bonjour », dit Harry. Il sortit.", "Harry"),
+    ]
+    assert coverage < 1.0
+
+
+def test_seam_inside_a_segment_is_not_a_boundary():
+    text = "Narration un.\nHarry parla longtemps\net encore.\n"
+    windows = make_windows(text, 30, 30)
+    assert len(windows) == 2 and windows[1].start < windows[1].own_start
+    results = [
+        [{"text": "Narration un.", "speaker": "Narrator"}, {"text": "Harry parla longtemps", "speaker": "Harry"}],
+        # The overlap shows the model the whole speech, which runs over the seam
+        [{"text": "Harry parla longtemps et encore.", "speaker": "Harry"}],
+    ]
+    segments, _ = stitch_windows(text, windows, results)
+    assert [(s["text"], s["speaker"]) for s in segments] == [
+        ("Narration un.", "Narrator"),
+        ("Harry parla longtemps\net encore.", "Harry"),
+    ]
+
+
+def test_window_without_results_keeps_its_text():
+    windows = make_windows(TEXT, 100, 50)
+    results = [model_output(TEXT[w.start:w.end]) for w in windows]
+    results[1] = []
+    segments, coverage = stitch_windows(TEXT, windows, results)
+    assert 0 < coverage < 1
+    joined = "".join(TEXT[s["start"]:s["end"]] for s in segments)
+    assert "".join(joined.split()) == "".join(TEXT.split())
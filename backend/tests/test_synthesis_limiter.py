@@ -0,0 +1,50 @@
+import asyncio
+from collections import Counter
+
+from app.services.synthesis_limiter import SynthesisLimiter
+
+
+def run_calls(limiter, voices, duration=0.02):
+    """Run one fake synthesis per voice in ``voices``; returns the peak global and per-voice concurrency."""
+    active = Counter()
+    peaks = Counter()
+
+    async def synthesize(voice):
+        async with limiter.slot("edge", voice):
+            active[voice] += 1
+            active["*"] += 1
+            peaks[voice] = max(peaks[voice], active[voice])
+            peaks["*"] = max(peaks["*"], active["*"])
+            await asyncio.sleep(duration)
+            active[voice] -= 1
+            active["*"] -= 1
+
+    async def run():
+        await asyncio.gather(*(synthesize(voice) for voice in voices))
+
+    asyncio.run(run())
+    return peaks
+
+
+def test_global_limit():
+    peaks = run_calls(SynthesisLimiter(3, 10), [f"voice-{n}" for n in range(12)])
+    assert peaks["*"] == 3
+
+
+def test_per_voice_limit():
+    peaks = run_calls(SynthesisLimiter(10, 2), ["a"] * 6 + ["b"] * 6)
+    assert peaks["a"] == 2 and peaks["b"] == 2
+    assert peaks["*"] == 4
+
+
+def test_busy_voice_does_not_hold_global_slots():
+    # Queued calls for "a" wait for their voice slot, leaving the other global slots to "b" and "c"
+    peaks = run_calls(SynthesisLimiter(3, 1), ["a"] * 5 + ["b", "c"])
+    assert peaks["a"] == 1
+    assert peaks["*"] == 3
+
+
+def test_limits_are_at_least_one():
+    limiter = SynthesisLimiter(0, 0)
+    assert (limiter.max_concurrency, limiter.max_per_voice) == (1, 1)
+    assert run_calls(limiter, ["a", "b"])["*"] == 1
@@ -0,0 +1,157 @@
+import asyncio
+import io
+import os
+import zipfile
+
+import pytest
+from starlette.requests import Request
+
+from app.services.upload_store import (
+    MultipartFile, UploadRejected, UploadStore, check_image_head, stream_upload,
+)
+
+BOUNDARY = "scriptvoxboundary"
+
+
+def make_epub() -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        archive.writestr("META-INF/container.xml", "<container/>")
+    return buffer.getvalue()
+
+
+def multipart_body(data: bytes, filename: str = "book.epub", content_type: str = "application/epub+zip",
+                   field: str = "file") -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="note"\r\n\r\nhello\r\n'
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + data + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def make_request(body: bytes, chunk_size: int = 1000, content_length: int = None):
+    """A Starlette request whose body arrives in ``chunk_size`` pieces; ``received`` counts them."""
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)] or [b""]
+    received = []
+
+    async def receive():
+        if len(received) < len(chunks):
+            index = len(received)
+            received.append(index)
+            return {"type": "http.request", "body": chunks[index], "more_body": index < len(chunks) - 1}
+        return {"type": "http.disconnect"}
+
+    length = len(body) if content_length is None else content_length
+    scope = {"type": "http", "method": "POST", "path": "/", "query_string": b"", "headers": [
+        (b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode()),
+        (b"content-length", str(length).encode()),
+    ]}
+    return Request(scope, receive), received, len(chunks)
+
+
+def leftovers(directory):
+    return [name for name in os.listdir(directory) if name.endswith(".part")]
+
+
+def test_multipart_file_reads_the_file_part(tmp_path):
+    data = os.urandom(50_000)
+    request, _, _ = make_request(multipart_body(data))
+
+    async def run():
+        file = await MultipartFile(request).open()
+        assert file.filename == "book.epub"
+        assert file.content_type == "application/epub+zip"
+        parts = []
+        while chunk := await file.read(4096):
+            parts.append(chunk)
+        return b"".join(parts)
+
+    assert asyncio.run(run()) == data
+
+
+def test_content_length_over_limit_is_refused_before_reading(tmp_path):
+    request, received, _ = make_request(multipart_body(b"x" * 10), content_length=10 * 1024 * 1024)
+    with pytest.raises(UploadRejected) as e:
+        MultipartFile(request, max_size=1024)
+    assert e.value.status_code == 413
+    assert received == []
+
+
+def test_oversized_file_is_rejected_mid_stream(tmp_path):
+    # Content-Length is within the allowance, so only the per-chunk limit can catch it
+    request, received, total = make_request(multipart_body(b"PK\x03\x04" + b"x" * 300_000), chunk_size=8192)
+
+    async def run():
+        file = await MultipartFile(request, max_size=100_000).open()
+        await stream_upload(file, str(tmp_path), 100_000)
+
+    with pytest.raises(UploadRejected) as e:
+        asyncio.run(run())
+    assert e.value.status_code == 413
+    assert len(received) < total
+    assert leftovers(tmp_path) == []
+
+
+def test_missing_file_field():
+    request, _, _ = make_request(multipart_body(b"data", field="other"))
+    with pytest.raises(UploadRejected) as e:
+        asyncio.run(MultipartFile(request).open())
+    assert e.value.status_code == 422
+
+
+def test_not_multipart():
+    scope = {"type": "http", "method": "POST", "path": "/", "query_string": b"",
+             "headers": [(b"content-type", b"application/json")]}
+    with pytest.raises(UploadRejected) as e:
+        MultipartFile(Request(scope))
+    assert e.value.status_code == 400
+
+
+def test_save_upload_stores_a_valid_epub(tmp_path):
+    epub = make_epub()
+    store = UploadStore(str(tmp_path / "uploads"), str(tmp_path / "parsed"))
+
+    async def upload():
+        request, _, _ = make_request(multipart_body(epub), chunk_size=97)
+        file = await MultipartFile(request).open()
+        return await store.save_upload(file, max_size=1024 * 1024)
+
+    first = asyncio.run(upload())
+    assert not first.already_stored
+    with open(first.file_path, "rb") as f:
+        assert f.read() == epub
+    assert asyncio.run(upload()).already_stored
+    assert leftovers(tmp_path / "uploads") == []
+
+
+@pytest.mark.parametrize("data, status", [
+    (b"%PDF-1.7 not a zip" * 10, 415),
+    (None, 415),  # a zip without META-INF/container.xml
+])
+def test_save_upload_rejects_non_epub(tmp_path, data, status):
+    if data is None:
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            archive.writestr("hello.txt", "hi")
+        data = buffer.getvalue()
+    store = UploadStore(str(tmp_path / "uploads"), str(tmp_path / "parsed"))
+
+    async def upload():
+        request, _, _ = make_request(multipart_body(data))
+        file = await MultipartFile(request).open()
+        return await store.save_upload(file, max_size=1024 * 1024)
+
+    with pytest.raises(UploadRejected) as e:
+        asyncio.run(upload())
+    assert e.value.status_code == status
+    assert os.listdir(tmp_path / "uploads") == []
+
+
+def test_image_head_check(tmp_path):
+    check_image_head(b"\x89PNG\r\n\x1a\n" + b"\x00" * 20)
+    with pytest.raises(UploadRejected) as e:
+        check_image_head(b"<svg xmlns=...")
+    assert e.value.status_code == 415
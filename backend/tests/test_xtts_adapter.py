@@ -0,0 +1,84 @@
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app.adapters import tts_adapters, xtts_engine
+from app.adapters.tts_adapters import XTTSAdapter
+
+
+class FakePool(ThreadPoolExecutor):
+    """Stands in for the XTTS process pool; ``broken`` pools fail every batch like a pool whose worker died."""
+
+    created = []
+
+    def __init__(self, max_workers=None, mp_context=None, initializer=None, initargs=()):
+        super().__init__(max_workers=1)
+        self.broken = not FakePool.created  # Only the first pool crashes
+        self.shutdown_calls = []
+        FakePool.created.append(self)
+
+    def submit(self, fn, *args, **kwargs):
+        if fn is xtts_engine.list_speakers:
+            return super().submit(lambda: ["Ana Florence"])
+        future = Future()
+        if self.broken:
+            future.set_exception(BrokenProcessPool("A process in the process pool was terminated abruptly"))
+        else:
+            items = args[0]
+            future.set_result([None] * len(items))
+        return future
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        self.shutdown_calls.append((wait, cancel_futures))
+        super().shutdown(wait=False, cancel_futures=cancel_futures)
+
+
+@pytest.fixture
+def fake_pool(monkeypatch):
+    FakePool.created = []
+    monkeypatch.setattr(tts_adapters, "ProcessPoolExecutor", FakePool)
+    monkeypatch.setattr(tts_adapters.importlib.util, "find_spec", lambda name: object())
+    monkeypatch.setattr(tts_adapters.settings, "XTTS_BATCH_WINDOW", 0.01)
+    return FakePool
+
+
+def test_broken_pool_is_shut_down_and_replaced(fake_pool, tmp_path):
+    adapter = XTTSAdapter()
+
+    async def run():
+        # Two batches hit the broken pool at once
+        results = await asyncio.gather(
+            adapter.generate_audio("One", "Ana Florence", str(tmp_path / "1.mp3")),
+            adapter.generate_audio("Two", "xx-other", str(tmp_path / "2.mp3")),
+            return_exceptions=True,
+        )
+        assert all(isinstance(r, RuntimeError) and "BrokenProcessPool" in str(r) for r in results)
+        assert adapter._pool is None
+        # The next request starts a fresh pool instead of running in-process
+        path = await adapter.generate_audio("Three", "Ana Florence", str(tmp_path / "3.mp3"))
+        await adapter.close()
+        return path
+
+    assert asyncio.run(run()) == str(tmp_path / "3.mp3")
+    first, second = fake_pool.created
+    assert first.shutdown_calls == [(False, True)]
+    assert second.shutdown_calls == [(False, True)]
+
+
+def test_batch_never_runs_on_the_default_executor(fake_pool, tmp_path):
+    adapter = XTTSAdapter()
+
+    async def run():
+        pool = await adapter._ensure_pool()
+        pool.broken = False
+        # A crash elsewhere left no pool: the batch must create one, not use run_in_executor(None, ...)
+        adapter._pool = None
+        future = asyncio.get_running_loop().create_future()
+        await adapter._run_batch(("fr", "Ana Florence", None), [("Hi", str(tmp_path / "a.mp3"), future)])
+        await adapter.close()
+        return await future
+
+    assert asyncio.run(run()) is None
+    assert len(fake_pool.created) == 2
@@ -133,14 +133,16 @@ export default function BookDetailPage() {
                 play(
                     { id: book.id, title: book.title, author: book.author, cover_path: book.cover_path },
                     { id: firstCompleted.id, title: firstCompleted.title, position: firstCompleted.position },
-                    `http://localhost:8000/${firstCompleted.audio_path}/segment_0000.mp3`
+                    `http://localhost:8000/books/chapters/${firstCompleted.id}/stream`
                 );
             }
         }
     };
 
     const playChapter = (chapter: Chapter) => {
-        if (!book || !chapter.audio_path) {
+        // Chapters still generating are streamed as their segments finish
+        const isProcessing = chapter.status.toUpperCase() === 'PROCESSING';
+        if (!book || (!chapter.audio_path && !isProcessing)) {
             showToast('Audio not available', 'error');
             return;
         }
@@ -148,7 +150,7 @@ export default function BookDetailPage() {
         play(
             { id: book.id, title: book.title, author: book.author, cover_path: book.cover_path },
             { id: chapter.id, title: chapter.title, position: chapter.position },
-            `http://localhost:8000/${chapter.audio_path}/segment_0000.mp3`
+            `http://localhost:8000/books/chapters/${chapter.id}/stream`
         );
         showToast(`Now playing: ${chapter.title}`, 'success');
     };
@@ -367,10 +369,15 @@ export default function BookDetailPage() {
                                             </button>
                                         </>
                                     ) : isProcessing ? (
-                                        <button onClick={cancelGeneration} className="flex items-center gap-2 bg-red-500 hover:bg-red-600 text-white px-4 py-2 rounded-lg font-semibold transition-all">
-                                            <Loader2 className="animate-spin" size={18} />
-                                            Generating...
-                                        </button>
+                                        <>
+                                            <button onClick={() => playChapter(chapter)} title="Listen while generating" className="p-2 bg-[#1a1a2e] hover:bg-[#2d2d44] text-gray-400 hover:text-white rounded-lg transition-all border border-[#2d2d44]">
+                                                <Play size={18} />
+                                            </button>
+                                            <button onClick={cancelGeneration} className="flex items-center gap-2 bg-red-500 hover:bg-red-600 text-white px-4 py-2 rounded-lg font-semibold transition-all">
+                                                <Loader2 className="animate-spin" size={18} />
+                                                Generating...
+                                            </button>
+                                        </>
                                     ) : (
                                         <button onClick={() => generateAudio(chapter.id)} className="flex items-center gap-2 bg-green-600 hover:bg-green-700 text-white px-4 py-2 rounded-lg font-semibold transition-all shadow-lg shadow-green-900/20">
                                             <Volume2 size={18} />
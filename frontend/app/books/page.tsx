@@ -100,6 +100,7 @@ export default function BooksPage() {
                                 <div className="aspect-[2/3] bg-gradient-to-br from-gray-800 to-gray-900 flex items-center justify-center overflow-hidden relative">
                                     <CoverProgress
                                         src={book.cover_path}
+                                        size="medium"
                                         alt={book.title}
                                         progress={0}
                                         isGenerating={book.status === 'PROCESSING'}
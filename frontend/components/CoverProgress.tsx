@@ -6,9 +6,21 @@ interface CoverProgressProps {
     progress: number; // 0 to 100
     isGenerating: boolean;
     className?: string;
+    size?: CoverSize;
 }
 
-export default function CoverProgress({ src, alt, progress, isGenerating, className = "" }: CoverProgressProps) {
+export type CoverSize = 'small' | 'medium' | 'large';
+
+// Covers stored as data/covers/<sha256>/large.jpg also exist as small/medium/large WebP variants
+const HASHED_COVER = /^(data\/covers\/[0-9a-f]{64})\/[a-z]+\.(jpg|webp)$/;
+
+export function coverUrl(src: string, size: CoverSize = 'large'): string {
+    const match = src.match(HASHED_COVER);
+    const path = match ? `${match[1]}/${size}.webp` : src;
+    return `http://localhost:8000/${path}`;
+}
+
+export default function CoverProgress({ src, alt, progress, isGenerating, className = "", size = 'large' }: CoverProgressProps) {
     if (!src) {
         return (
             <div className={`w-full h-full bg-gradient-to-br from-[#1a1a2e] to-[#2d2d44] flex items-center justify-center ${className}`}>
@@ -17,7 +29,7 @@ export default function CoverProgress({ src, alt, progress, isGenerating, classN
         );
     }
 
-    const imageUrl = `http://localhost:8000/${src}`;
+    const imageUrl = coverUrl(src, size);
 
     return (
         <div className={`relative w-full h-full overflow-hidden bg-[#1a1a2e] ${className}`}>
@@ -3,6 +3,7 @@
 import { useAudioPlayer } from '@/contexts/AudioPlayerContext';
 import { Play, Pause, SkipBack, SkipForward, Volume2, List, X } from 'lucide-react';
 import { useRouter } from 'next/navigation';
+import { coverUrl } from '@/components/CoverProgress';
 import { useState, useEffect } from 'react';
 
 export default function PersistentPlayer() {
@@ -130,7 +131,7 @@ export default function PersistentPlayer() {
                             <div className="w-14 h-14 bg-gradient-to-br from-[#1a1a2e] to-[#2d2d44] rounded-lg flex items-center justify-center overflow-hidden">
                                 {currentBook.cover_path ? (
                                     <img
-                                        src={`http://localhost:8000/${currentBook.cover_path}`}
+                                        src={coverUrl(currentBook.cover_path, 'small')}
                                         alt={currentBook.title}
                                         className="w-full h-full object-cover"
                                     />